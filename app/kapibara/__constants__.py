@@ -2,15 +2,18 @@
 # -*- coding: utf-8 -*-
 """Package-wide constant definitions.
 
+Constants come, in order of preference, from:
+
+- the ``__build__`` module generated by ``setup.py`` when the package is built
+  _(a plain module load: no file to look for, nothing to parse)_
+- the ``setup.cfg`` file of the source checkout the package is imported from
+  _(newer than the metadata of a distribution installed from an older checkout)_
+- the metadata of the installed distribution _(``importlib.metadata``)_
+- the first ``setup.cfg`` file found in the configuration search path
+
 """
 
-from os import path as os_path
-from configparser import ConfigParser
-from errno import EINVAL
-from re import search
-from sys import exit as sys_exit
-from typing import NamedTuple
-from .shared.useful import find_config_path
+from typing import NamedTuple, Optional
 
 
 __all__ = (
@@ -23,32 +26,102 @@ __all__ = (
 )
 
 
-config = ConfigParser()
-pkg_setup_cfg = os_path.join(
-    find_config_path("setup.cfg",
-                     os_path.basename(os_path.dirname(__file__))),
-    "setup.cfg")
-config.read(pkg_setup_cfg)
+class VersionInfo(NamedTuple):
+    """Components of the package version _(like ``sys.version_info``)_.
+
+    """
+    major: int
+    minor: int
+    micro: int
+    releaselevel: str
+    serial: int
+
+
+def _version_info(version: str) -> VersionInfo:
+    """Split a version string into its components.
+
+    """
+    from re import search   # pylint: disable=import-outside-toplevel
+    _v = search(
+        r"^([0-9]+)\.([0-9]+)(\.([0-9]+))*(([a-zA-z]+)([0-9]*))*$", version)
+    return VersionInfo(int(_v.group(1)) if _v.group(1) else 0,
+                       int(_v.group(2)) if _v.group(2) else 0,
+                       int(_v.group(4)) if _v.group(4) else 0,
+                       str(_v.group(6)),
+                       int(_v.group(7)) if _v.group(7) else 0)
+
+
+def _from_distribution(name: str) -> tuple:   #pragma: no cover
+    """Constants from the metadata of the installed distribution.
+
+    :raises importlib.metadata.PackageNotFoundError: when the distribution is not installed
+    """
+    from importlib.metadata import metadata     # pylint: disable=import-outside-toplevel
+    meta = metadata(name)
+    return (meta["Version"], meta.get("Author") or "Unknown", meta.get("Author-email") or "",
+            meta["Name"], meta.get("Summary") or "")
+
+
+def _from_setup_cfg(pkg_setup_cfg: str) -> Optional[tuple]:
+    """Constants from the ``setup.cfg`` file of a source checkout.
+
+    :param pkg_setup_cfg: path to the ``setup.cfg`` file
+    :type pkg_setup_cfg: str
+
+    :return: The constants, or ``None`` when the file is missing or has no ``metadata`` section
+    :rtype: Optional[tuple]
+    """
+    from configparser import ConfigParser   # pylint: disable=import-outside-toplevel
+
+    config = ConfigParser()
+    if not config.read(pkg_setup_cfg) or "metadata" not in config.sections():
+        return None
+    return (config["metadata"].get("version", "0.0.0alpha0"),
+            config["metadata"].get("author", "Unknown"),
+            config["metadata"].get("author_email", ""),
+            config["metadata"].get("name", ""),
+            config["metadata"].get("description", ""))
+
+
+def _from_search_path(name: str) -> tuple:   #pragma: no cover
+    """Constants from the first ``setup.cfg`` file found in the configuration search path.
+
+    """
+    # pylint: disable=import-outside-toplevel
+    from errno import EINVAL
+    from os import path as os_path
+    from sys import exit as sys_exit
+    from .shared.useful import find_config_path
 
-for s in ["metadata"]:
-    if s not in config.sections():  #pragma: no cover
+    pkg_setup_cfg = os_path.join(find_config_path("setup.cfg", name), "setup.cfg")
+    constants = _from_setup_cfg(pkg_setup_cfg)
+    if constants is None:
         print(
-            f"[ERROR] The '{pkg_setup_cfg}' configuration file does not contain a '{s}' section.")
+            f"[ERROR] The '{pkg_setup_cfg}' configuration file does not contain a 'metadata' section.")
         sys_exit(EINVAL)
+    return constants
 
 
-__version__ = config["metadata"].get("version", "0.0.0alpha0")
-_v = search(
-    r"^([0-9]+)\.([0-9]+)(\.([0-9]+))*(([a-zA-z]+)([0-9]*))*$", __version__)
-VersionInfo = NamedTuple("VersionInfo", [("major", int), ("minor", int),
-                                         ("micro", int), ("releaselevel", str),
-                                         ("serial", int)])
-__version_info__ = VersionInfo(int(_v.group(1)) if _v.group(1) else 0,
-                               int(_v.group(2)) if _v.group(2) else 0,
-                               int(_v.group(4)) if _v.group(4) else 0,
-                               str(_v.group(6)),
-                               int(_v.group(7)) if _v.group(7) else 0)
-__author__ = config["metadata"].get("author", "Unknown")
-__email__ = config["metadata"].get("author_email", "")
-__app_name__ = config["metadata"].get("name", "")
-__description__ = config["metadata"].get("description", "")
+try:
+    from .__build__ import (    # pylint: disable=unused-import
+        __version__,
+        __version_info__ as _build_version_info,
+        __author__,
+        __email__,
+        __app_name__,
+        __description__,
+    )
+    __version_info__ = VersionInfo(*_build_version_info)
+except ImportError:
+    from os import path as _os_path
+    _pkg_name = __name__.split(".")[-2]
+    # the checkout root is the parent of the directory holding the package
+    _constants = _from_setup_cfg(_os_path.join(
+        _os_path.dirname(_os_path.dirname(_os_path.dirname(_os_path.abspath(__file__)))), "setup.cfg"))
+    if _constants is None:  #pragma: no cover
+        try:
+            _constants = _from_distribution(_pkg_name)
+        except ImportError:     # importlib.metadata.PackageNotFoundError is an ImportError too
+            _constants = _from_search_path(_pkg_name)
+    __version__, __author__, __email__, __app_name__, __description__ = _constants
+    __version_info__ = _version_info(__version__)
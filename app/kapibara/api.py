@@ -4,8 +4,11 @@
 
 """
 
+from copy import (
+    deepcopy,
+)
 from os import (
-    getenv as os_getenv,
+    environ as os_environ,
     getcwd as os_getcwd,
     path as os_path,
 )
@@ -15,17 +18,47 @@ from sys import (
     version_info as sys_version_info,
 )
 from typing import (
+    AsyncIterator,
     Dict,
+    List,
+    Mapping,
     Optional,
+    Tuple,
 )
 from errno import (
     EINVAL,
     ENOTRECOVERABLE,
 )
+from asyncio import (
+    AbstractEventLoop,
+    get_event_loop,
+    sleep as asyncio_sleep,
+    wrap_future,
+)
+from concurrent.futures import Future
+from threading import Lock
 from datetime import (
     timedelta as t_timedelta,
     datetime as t_datetime,
 )
+from functools import (
+    lru_cache,
+)
+from json import (
+    dumps as json_dumps,
+)
+from math import (
+    ceil,
+    floor,
+    log2,
+)
+from tempfile import (
+    gettempdir,
+)
+from time import (
+    perf_counter,
+    time,
+)
 from logging import (
     getLogger as l_getLogger,
     Formatter as l_Formatter,
@@ -34,41 +67,25 @@ from logging import (
     DEBUG as l_DEBUG,
     ERROR as l_ERROR,
     INFO as l_INFO,
+    NOTSET as l_NOTSET,
 )
+#
+#   Only what every request needs is imported here: token signing backends,
+#   password hashing, configuration parsing and colored logging are
+#   imported where they are first used, keeping the import of this module
+#   (and so the cold start of every worker) cheap.
+#
 from jose import (
-    jwt,
-)
-from passlib.context import (
-    CryptContext,
-)
-from colorlog import (
-    ColoredFormatter as l_ColorFormatter,
+    JWTError,
 )
 from pydantic import (
     BaseModel,
+    conlist,
 )
-from schema import (
-    Schema,
-    SchemaError,
-    And as SchemaAnd,
-    Optional as SchemaOpt,
-)
-from dotenv import (
-    load_dotenv as dotenv_load,
-)
-try:
-    from yaml import (
-        load as yml_load,
-        CLoader as yml_Loader,
-    )
-except ImportError: #pragma: no cover
-    from yaml import (
-        load as yml_load,
-        yml_Loader,
-    )
 from fastapi import (
     Depends,
     FastAPI,
+    Header,
     HTTPException,
     Request,
     status,
@@ -76,6 +93,8 @@ from fastapi import (
 from fastapi.responses import (
     JSONResponse,
     PlainTextResponse,
+    Response,
+    StreamingResponse,
 )
 from fastapi.security import (
     OAuth2PasswordBearer,
@@ -90,16 +109,72 @@ from .__constants__ import (
     __description__,
     __version__,
 )
+from .shared.cache import (
+    CredentialCache,
+    LRUCache,
+)
+from .shared.conditional import (
+    ConditionalGetMiddleware,
+    etag_matches,
+    make_etag,
+)
+from .shared.credentials import (
+    CredentialStore,
+)
+from .shared.items import (
+    ItemRepository,
+    ItemStore,
+)
+from .shared.logqueue import (
+    DROP_POLICIES,
+    QueuedLogging,
+)
+from .shared.loopmonitor import (
+    LoopMonitor,
+)
+from .shared.httpcache import (
+    ResponseCache,
+    ResponseCacheMiddleware,
+)
+from .shared.metrics import (
+    Metrics,
+    MetricsMiddleware,
+    PROMETHEUS_CONTENT_TYPE,
+)
+from .shared.pool import (
+    PoolSaturatedError,
+    WorkerPool,
+)
+from .shared.profiling import (
+    ProfilingMiddleware,
+)
+from .shared.ratelimit import (
+    RateLimiter,
+)
+from .shared.responses import (
+    error_key,
+    ResponseCatalog,
+)
+from .shared.supervisor import (
+    available_cpus,
+)
 from .shared.useful import (
     find_config_path,
+    invalidate_config_paths,
+    merge_dicts,
+)
+from .shared.watcher import (
+    FileWatcher,
 )
 
 
 __all__ = (
     "asgi",
+    "get_token_claims",
     "Kapibara",
     "Kauthbara",
     "Msgbara",
+    "reload_configuration",
     "Tokenbara",
 )
 
@@ -111,22 +186,119 @@ if sys_version_info < (3, 6, 0):    #pragma: no cover
 
 
 #
-# Expected schema for the configuration dictionary
+# Supported algorithms to sign the access tokens
 #
-_CONFIG_SCHEMA_ = Schema(
-    {
-        "server": {
-            "addr": SchemaAnd(str),
-            "port": SchemaAnd(int),
-        },
-        "crypt": {
-            "key": SchemaAnd(str),
-        },
-        SchemaOpt("debug"): SchemaAnd(bool),
-    },
-    ignore_extra_keys=True
+_HMAC_ALGORITHMS_ = ("HS256", "HS384", "HS512")
+_TOKEN_ALGORITHMS_ = (
+    *_HMAC_ALGORITHMS_,
+    "RS256", "RS384", "RS512",
+    "ES256", "ES384", "ES512",
 )
 
+#
+# Passwords hashing context (serialized, see ``passlib.context.CryptContext.to_string()``)
+#
+# Every scheme is listed, so that hashes of any of them can be verified (and updated, see
+# ``Kauthbara.authenticate()``): new hashes use the default one (see ``_pwd_context_conf()``)
+#
+_PWD_SCHEMES_ = ("bcrypt", "scrypt", "pbkdf2_sha256", "argon2")
+_PWD_CONTEXT_ = "[passlib]\nschemes = bcrypt, scrypt, pbkdf2_sha256, argon2\ndefault = bcrypt\ndeprecated = auto\n"
+
+#
+# Configuration keys applied while running (see ``Kapibara.reload_configuration()``),
+# changes to any other key take effect on restart
+#
+_LIVE_CONFIG_KEYS_ = ("crypt.cache", "crypt.token_cache", "crypt.users", "response_cache", "log", "debug")
+
+#
+# Environment variables set from the environment file (see ``load_environment_file()``)
+#
+_dotenv_keys = set()
+
+
+@lru_cache(maxsize=1)
+def _config_schema():
+    """Expected schema for the configuration dictionary
+
+    :return: The schema
+    :rtype: schema.Schema
+    """
+    # pylint: disable=import-outside-toplevel
+    from schema import (
+        Schema,
+        And as SchemaAnd,
+        Optional as SchemaOpt,
+        Or as SchemaOr,
+    )
+    return Schema(
+        {
+            "server": {
+                "addr": SchemaAnd(str),
+                "port": SchemaAnd(int),
+                SchemaOpt("workers"): SchemaOr(SchemaAnd(int, lambda n: n >= 1), "auto"),
+                SchemaOpt("preload"): SchemaAnd(bool),
+            },
+            "crypt": {
+                "key": SchemaAnd(str),
+                SchemaOpt("algorithm"): SchemaOr(*_TOKEN_ALGORITHMS_),
+                SchemaOpt("private_key"): SchemaAnd(str),
+                SchemaOpt("public_key"): SchemaAnd(str),
+                SchemaOpt("pool"): {
+                    SchemaOpt("kind"): SchemaOr("thread", "process"),
+                    SchemaOpt("workers"): SchemaAnd(int, lambda n: n >= 0),
+                    SchemaOpt("queue"): SchemaAnd(int, lambda n: n >= 0),
+                },
+                SchemaOpt("cache"): {
+                    SchemaOpt("size"): SchemaAnd(int, lambda n: n >= 0),
+                    SchemaOpt("ttl"): SchemaAnd(SchemaOr(int, float), lambda n: n > 0),
+                },
+                SchemaOpt("token_cache"): SchemaAnd(int, lambda n: n >= 0),
+                SchemaOpt("users"): SchemaAnd(str),
+                SchemaOpt("scheme"): SchemaOr(*_PWD_SCHEMES_),
+                SchemaOpt("target_ms"): SchemaAnd(SchemaOr(int, float), lambda n: n >= 0),
+            },
+            SchemaOpt("rate_limit"): {
+                SchemaOpt("client"): {
+                    SchemaOpt("rate"): SchemaAnd(SchemaOr(int, float), lambda n: n >= 0),
+                    SchemaOpt("burst"): SchemaAnd(int, lambda n: n >= 1),
+                },
+                SchemaOpt("username"): {
+                    SchemaOpt("rate"): SchemaAnd(SchemaOr(int, float), lambda n: n >= 0),
+                    SchemaOpt("burst"): SchemaAnd(int, lambda n: n >= 1),
+                },
+                SchemaOpt("account"): {
+                    SchemaOpt("rate"): SchemaAnd(SchemaOr(int, float), lambda n: n >= 0),
+                    SchemaOpt("burst"): SchemaAnd(int, lambda n: n >= 1),
+                },
+                SchemaOpt("size"): SchemaAnd(int, lambda n: n >= 1),
+            },
+            SchemaOpt("response_cache"): {
+                SchemaOpt("size"): SchemaAnd(int, lambda n: n >= 0),
+                SchemaOpt("memory"): SchemaAnd(int, lambda n: n > 0),
+                SchemaOpt("ttl"): SchemaAnd(SchemaOr(int, float), lambda n: n > 0),
+            },
+            SchemaOpt("items"): {
+                SchemaOpt("path"): SchemaAnd(str),
+                SchemaOpt("seed"): SchemaAnd(str),
+            },
+            SchemaOpt("log"): {
+                SchemaOpt("queue_size"): SchemaAnd(int, lambda n: n >= 0),
+                SchemaOpt("drop_policy"): SchemaOr(*DROP_POLICIES),
+            },
+            SchemaOpt("loop_monitor"): {
+                SchemaOpt("enabled"): SchemaAnd(bool),
+                SchemaOpt("interval"): SchemaAnd(SchemaOr(int, float), lambda n: n > 0),
+                SchemaOpt("threshold"): SchemaAnd(SchemaOr(int, float), lambda n: n > 0),
+            },
+            SchemaOpt("watch"): {
+                SchemaOpt("enabled"): SchemaAnd(bool),
+                SchemaOpt("interval"): SchemaAnd(SchemaOr(int, float), lambda n: n > 0),
+            },
+            SchemaOpt("debug"): SchemaAnd(bool),
+        },
+        ignore_extra_keys=True
+    )
+
 
 #
 # Logging configuration
@@ -137,13 +309,50 @@ _log_disk_handler = l_FileHandler(os_path.join(os_getcwd(), f"{__app_name__}.log
 _log_disk_handler.setLevel(l_ERROR)
 _log_disk_format = l_Formatter("%(asctime)s - [%(levelname)s] %(message)s")
 _log_disk_handler.setFormatter(_log_disk_format)
-log.addHandler(_log_disk_handler)
 # Logging on STDOUT (INFO)
 _log_console_handler = l_StreamHandler()
 _log_console_handler.setLevel(l_INFO)
-_log_console_format = l_ColorFormatter("%(log_color)s[%(levelname)-8s] %(message)s%(reset)s")
+if _log_console_handler.stream.isatty():   #pragma: no cover
+    from colorlog import ColoredFormatter as l_ColorFormatter  # pylint: disable=ungrouped-imports
+    _log_console_format = l_ColorFormatter("%(log_color)s[%(levelname)-8s] %(message)s%(reset)s")
+else:
+    _log_console_format = l_Formatter("[%(levelname)-8s] %(message)s")
 _log_console_handler.setFormatter(_log_console_format)
-log.addHandler(_log_console_handler)
+# Both handlers are fed by a background thread: logging only enqueues records
+_log_queue = QueuedLogging(log, (_log_disk_handler, _log_console_handler))
+
+
+def _set_debug(debug: bool):
+    """Switch the logging levels to (or back from) DEBUG
+
+    """
+    _log_console_handler.setLevel(l_DEBUG if debug else l_INFO)
+    _log_disk_handler.setLevel(l_DEBUG if debug else l_ERROR)
+    log.setLevel(l_DEBUG if debug else l_NOTSET)
+
+
+def _flatten_conf(conf: Dict, prefix: Optional[str] = "") -> Dict[str, object]:
+    """Flatten a configuration dictionary into dotted keys _(e.g. ``crypt.cache.size``)_
+
+    :return: The values by dotted key
+    :rtype: Dict[str, object]
+    """
+    flat = {}
+    for key, value in conf.items():
+        if isinstance(value, dict):
+            flat.update(_flatten_conf(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _is_live_key(key: str) -> bool:
+    """Whether a dotted configuration key is applied while running
+
+    :return: True/False
+    :rtype: bool
+    """
+    return any(key == live or key.startswith(f"{live}.") for live in _LIVE_CONFIG_KEYS_)
 
 
 #
@@ -166,6 +375,163 @@ app = FastAPI(title=__app_name__,
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Responses with a constant payload are encoded once, when the module is loaded
+_responses = ResponseCatalog()
+_responses.add("root", JSONResponse(content={"msg": ["Hello World!", __app_name__, __version__]}))
+_responses.add("plaintext", PlainTextResponse(content="nothing more than text..."))
+for _status_code, _detail, _headers in (
+        (status.HTTP_401_UNAUTHORIZED, "Not authenticated", {"WWW-Authenticate": "Bearer"}),
+        (status.HTTP_401_UNAUTHORIZED, "Invalid or expired token", {"WWW-Authenticate": "Bearer"}),
+        (status.HTTP_401_UNAUTHORIZED, "Incorrect username or password", {"WWW-Authenticate": "Bearer"}),
+        (status.HTTP_404_NOT_FOUND, "Not Found", None),
+        (status.HTTP_405_METHOD_NOT_ALLOWED, "Method Not Allowed", None),
+        (status.HTTP_503_SERVICE_UNAVAILABLE, "Too many authentication requests, retry later", {"Retry-After": "1"}),
+    ):
+    _responses.add(error_key(_status_code, _detail, _headers),
+                   JSONResponse(status_code=_status_code, content={"msg": _detail}, headers=_headers))
+
+# Entity tags of the routes whose content never changes (the OpenAPI schema is added on startup)
+_etags = {
+    "/": make_etag(_responses.get("root").body),
+    "/plaintext": make_etag(_responses.get("plaintext").body),
+}
+app.add_middleware(ConditionalGetMiddleware, etags=_etags)
+
+
+def _token_principal(scope: Dict) -> Optional[str]:
+    """Subject of the valid bearer token of a request, if any
+
+    :return: The `sub` claim of the token or `None`
+    :rtype: str, optional
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                return scope["app"].kauth.verify_access_token(token).get("sub")
+            except JWTError:
+                return None
+    return None
+
+
+# Responses of the routes turned on here are cached per token subject (disabled until configured)
+_response_cache = ResponseCache(principal=_token_principal)
+_response_cache.add_route("/items/{item_id}", generation=lambda: app.items.generation)
+app.add_middleware(ResponseCacheMiddleware, cache=_response_cache)
+app.response_cache = _response_cache
+
+def _is_debug() -> bool:
+    """Whether the app is configured and in DEBUG mode
+
+    :return: True/False
+    :rtype: bool
+    """
+    kapi = getattr(app, "kapi", None)
+    return kapi is not None and kapi.is_debug
+
+
+# Attempts to get a token are limited by client address, by username from each client address and,
+# more loosely, by username alone (disabled until configured)
+_token_limiters = {
+    "client": RateLimiter(),
+    "username": RateLimiter(),
+    "account": RateLimiter(),
+}
+app.token_limiters = _token_limiters
+
+# In DEBUG mode requests with the `X-Kapibara-Profile` header are profiled
+app.add_middleware(ProfilingMiddleware, enabled=_is_debug,
+                   directory=os_path.join(gettempdir(), f"{__app_name__}-profiles"))
+
+# Requests of every route (registered once all of them are declared) and the costly operations are timed
+_metrics = Metrics(operations=("password_verify", "token_encode", "serialization", "loop_lag"))
+app.add_middleware(MetricsMiddleware, metrics=_metrics)
+app.metrics = _metrics
+
+
+def _pool_stats() -> Dict:
+    """Counters of the worker pool verifying passwords in this worker
+
+    :return: The counters _(empty until the app is configured)_
+    :rtype: Dict
+    """
+    kauth = getattr(app, "kauth", None)
+    return kauth.pool.stats if kauth is not None else {}
+
+
+_metrics.add_stats("pool", _pool_stats, "Worker pool verifying passwords, in the worker answering",
+                   counters=("submitted", "completed", "failed", "rejected",
+                             "queue_wait_seconds_total", "run_seconds_total"))
+
+
+def _credential_cache_stats() -> Dict:
+    """Counters of the verified-credential cache of this worker
+
+    :return: The counters _(empty while the cache is disabled)_
+    :rtype: Dict
+    """
+    kauth = getattr(app, "kauth", None)
+    cache = kauth.credential_cache if kauth is not None else None
+    return cache.stats if cache is not None else {}
+
+
+_metrics.add_stats("credential_cache", _credential_cache_stats,
+                   "Verified-credential cache, in the worker answering",
+                   counters=("hits", "misses", "evictions", "expirations", "invalidations", "saved_seconds"))
+
+# Items served by the ``items`` endpoints (replaced by the configured store, see ``asgi()``)
+app.items = ItemStore()
+
+
+async def _export_items(items: ItemRepository, q: Optional[str], cursor: Optional[int],
+                        chunk: Optional[int] = 256) -> AsyncIterator[bytes]:
+    """NDJSON lines of the items, in ascending order of ID, a chunk at a time
+
+    Only one chunk of lines is in memory at any time, and the next one is
+    built only once the previous one was sent: the export proceeds at the
+    pace of the client. The event loop is released every ``chunk`` items
+    scanned, even when the filter drops all of them.
+
+    :param items: repository of the items
+    :type items: ItemRepository
+    :param q: keep only the items with this text in their name or description _(case insensitive)_
+    :type q: str, optional
+    :param cursor: keep only the items with an ID greater than this one
+    :type cursor: int, optional
+    :param chunk: number of items scanned between two chunks
+        defaults to `256`
+    :type chunk: int, optional
+
+    :return: The chunks of NDJSON lines
+    :rtype: AsyncIterator[bytes]
+    """
+    needle = q.casefold() if q else None
+    lines, scanned = [], 0
+    for item in items.items(after=cursor):
+        scanned += 1
+        if needle is None or needle in item.name.casefold() \
+                or (item.description is not None and needle in item.description.casefold()):
+            lines.append(json_dumps(item.as_dict(), ensure_ascii=False, separators=(",", ":")))
+        if scanned % chunk == 0:
+            if lines:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+                lines = []
+            else:
+                await asyncio_sleep(0)
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _item_etag(item_id: int, version: int, generation: int, q: Optional[str]) -> str:
+    """Weak entity tag of an item, derived from its version and the repository generation, not its content
+
+    :return: The entity tag
+    :rtype: str
+    """
+    return f'W/"{item_id}-{version}.{generation}-{make_etag(q.encode("utf-8"))[1:-1] if q is not None else ""}"'
+
 
 #pragma EXCEPTION: Exceptionbara
 class Exceptionbara(Exception): #pragma: no cover
@@ -201,24 +567,254 @@ class Msgbara(BaseModel):
     msg: str
 
 
+#pragma MODEL: Itembara
+class Itembara(BaseModel):
+    """Class representing the data model for an item.
+
+    """
+    item_id: int
+    name: str
+    description: Optional[str] = None
+    version: int
+
+
+#pragma MODEL: ItemBatchbara
+class ItemBatchbara(BaseModel):
+    """Class representing the data model for a batch of item IDs to retrieve.
+
+    """
+    ids: conlist(int, min_items=1, max_items=1000)
+
+
+#pragma MODEL: ItemBatchResultbara
+class ItemBatchResultbara(BaseModel):
+    """Class representing the data model for the items of a batch and the IDs not found.
+
+    """
+    items: List[Itembara]
+    missing: List[int]
+
+
+@lru_cache(maxsize=8)
+def _pwd_context(pwdctx_conf: str):
+    """Build (once per process) the CryptContext described by its serialized form
+
+    ``passlib`` _(and its hashing backend)_ is imported the first time a
+    password is hashed or verified.
+
+    :param pwdctx_conf: CryptContext serialized with ``CryptContext.to_string()``
+    :type pwdctx_conf: str
+
+    :return: The CryptContext
+    :rtype: passlib.context.CryptContext
+    """
+    from passlib.context import CryptContext    # pylint: disable=import-outside-toplevel
+    return CryptContext.from_string(pwdctx_conf)
+
+
+def _pwd_context_conf(scheme: Optional[str] = "bcrypt", rounds: Optional[int] = None) -> str:
+    """Serialized CryptContext hashing passwords with ``scheme``
+
+    Hashes of the other schemes in ``_PWD_SCHEMES_`` are still verified, and
+    reported as to be updated. So are hashes of ``scheme`` with a different
+    cost, when ``rounds`` is given.
+
+    :param scheme: scheme of new hashes _(one of ``_PWD_SCHEMES_``)_
+        defaults to `"bcrypt"`
+    :type scheme: str, optional
+    :param rounds: cost of new hashes
+        defaults to `None` _(the ``passlib`` default)_
+    :type rounds: int, optional
+
+    :return: The CryptContext serialized as ``CryptContext.to_string()`` does
+    :rtype: str
+    """
+    conf = _PWD_CONTEXT_.replace("default = bcrypt", f"default = {scheme}")
+    if rounds is not None:
+        conf += "".join(f"{scheme}__{limit}_rounds = {rounds}\n" for limit in ("default", "min", "max"))
+    return conf
+
+
+def _pwd_scheme_available(scheme: str) -> bool:
+    """Whether a backend of the password hashing scheme is installed
+
+    :param scheme: one of ``_PWD_SCHEMES_``
+    :type scheme: str
+
+    :return: `True` when the scheme can hash passwords
+    :rtype: bool
+    """
+    from passlib.registry import get_crypt_handler  # pylint: disable=import-outside-toplevel
+    if scheme not in _PWD_SCHEMES_:
+        return False
+    handler = get_crypt_handler(scheme)
+    return not hasattr(handler, "has_backend") or handler.has_backend()
+
+
+def _pwd_hash(pwdctx_conf: str, password: str) -> str:
+    """Hash a password in a worker of a :py:class:`WorkerPool`
+
+    :param pwdctx_conf: CryptContext serialized with ``CryptContext.to_string()``
+    :type pwdctx_conf: str
+    :param password: password in plain-text
+    :type password: str
+
+    :return: Hashed password
+    :rtype: str
+    """
+    return _pwd_context(pwdctx_conf).hash(password)
+
+
+def _pwd_verify(pwdctx_conf: str, plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash in a worker of a :py:class:`WorkerPool`
+
+    Only plain strings travel to the worker, so that it can also be a process.
+
+    :param pwdctx_conf: CryptContext serialized with ``CryptContext.to_string()``
+    :type pwdctx_conf: str
+    :param plain_password: password in plain-text as entered by the user
+    :type plain_password: str
+    :param hashed_password: password hash according to the CryptContext
+    :type hashed_password: str
+
+    :return: True/False
+    :rtype: bool
+    """
+    return _pwd_context(pwdctx_conf).verify(plain_password, hashed_password)
+
+
+def _pwd_verify_and_update(pwdctx_conf: str, plain_password: str,
+                           hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password against its hash, rehashing it when the hash is outdated
+
+    Meant to run in a worker of a :py:class:`WorkerPool` _(see :py:func:`_pwd_verify`)_.
+
+    :param pwdctx_conf: CryptContext serialized with ``CryptContext.to_string()``
+    :type pwdctx_conf: str
+    :param plain_password: password in plain-text as entered by the user
+    :type plain_password: str
+    :param hashed_password: password hash according to the CryptContext
+    :type hashed_password: str
+
+    :return: Whether the password is valid and its new hash _(`None` when up to date)_
+    :rtype: Tuple[bool, Optional[str]]
+    """
+    return _pwd_context(pwdctx_conf).verify_and_update(plain_password, hashed_password)
+
+
+def calibrate_bcrypt(target_ms: float, probe_rounds: Optional[int] = 8) -> Tuple[int, List[Tuple[int, float]]]:
+    """Pick the bcrypt cost whose hashes take at most ``target_ms`` on this host
+
+    Each cost doubles the hash time: a hash is timed at ``probe_rounds``
+    _(best of 3)_ to estimate the cost fitting the budget, which is then
+    timed as well _(and lowered while still over budget)_.
+
+    :param target_ms: time budget of a hash _(milliseconds)_
+    :type target_ms: float
+    :param probe_rounds: cost of the probe hashes
+        defaults to `8`
+    :type probe_rounds: int, optional
+
+    :return: The cost _(between `4` and `31`)_ and the timed costs with their milliseconds per hash
+    :rtype: Tuple[int, List[Tuple[int, float]]]
+    """
+    from passlib.hash import bcrypt     # pylint: disable=import-outside-toplevel
+
+    def timed(rounds: int) -> float:
+        handler = bcrypt.using(rounds=rounds)
+        started = perf_counter()
+        handler.hash("calibration")
+        return (perf_counter() - started) * 1000
+
+    timed(4)    # loads the backend
+    probe = min(timed(probe_rounds) for _ in range(3))
+    timings = [(probe_rounds, probe)]
+    rounds = max(4, min(31, probe_rounds + floor(log2(target_ms / probe)))) if target_ms > 0 else 4
+    while rounds != timings[-1][0]:
+        timings.append((rounds, timed(rounds)))
+        if timings[-1][1] <= target_ms or rounds == 4:
+            break
+        rounds -= 1
+    return rounds, timings
+
+
+@lru_cache(maxsize=16)
+def _token_keys(key: str, algorithm: str, public_key: Optional[str] = None) -> Tuple[object, object]:
+    """Parse (once) the key material to sign and verify tokens into key objects
+
+    :param key: HMAC secret or private key _(PEM)_ for asymmetric algorithms
+    :type key: str
+    :param algorithm: Token signing algorithm
+    :type algorithm: str
+    :param public_key: public key _(PEM)_ for asymmetric algorithms,
+        when missing it is derived from the private key
+    :type public_key: str, optional
+
+    :return: The signer and verifier key objects _(the same one for HMAC)_
+    :rtype: Tuple[jose.backends.base.Key, jose.backends.base.Key]
+    """
+    if algorithm not in _TOKEN_ALGORITHMS_:
+        raise JWTError(f"Unsupported token signing algorithm '{algorithm}'")
+    from jose import jwk    # pylint: disable=import-outside-toplevel
+    signer = jwk.construct(key, algorithm)
+    if algorithm in _HMAC_ALGORITHMS_:
+        return signer, signer
+    if public_key:
+        return signer, jwk.construct(public_key, algorithm)
+    return signer, signer.public_key()
+
+
 #pragma CLASS: Kauthbara
 class Kauthbara:
-    """Class to manage the Kapibara mocked authentication.
+    """Class to manage the Kapibara authentication.
+
+    Users and their password hashes come from a :py:class:`CredentialStore`.
+    Without a store it falls back to the mocked authentication of a single
+    user named ``name`` whose password is its own name _(hashed lazily the
+    first time it is needed)_.
 
     :param name: Instance name
         defaults to `__app_name__`
     :type name: str, optional
+    :param crypt_key: HMAC secret, or private key _(PEM)_ for asymmetric algorithms
+        defaults to `""`
+    :type crypt_key: str, optional
     :param token_expiration_interval: Time in minutes after which
         an auth token expires _(minutes)_
         defaults to `30`
     :type name: int, optional
+    :param pool: Worker pool used by :py:meth:`~Kauthbara.authenticate_async`
+        defaults to a thread pool with one worker per CPU
+    :type pool: WorkerPool, optional
+    :param credential_cache: Cache of recently verified credentials
+        defaults to `None` _(every login verifies the password hash)_
+    :type credential_cache: CredentialCache, optional
+    :param token_cache_size: Number of already verified tokens to remember
+        defaults to `1024`
+    :type token_cache_size: int, optional
+    :param store: Store of the users and their precomputed password hashes
+        defaults to `None` _(mocked single user authentication)_
+    :type store: CredentialStore, optional
+    :param public_key: Public key _(PEM)_ to verify tokens signed with asymmetric algorithms
+        defaults to `None` _(derived from ``crypt_key``)_
+    :type public_key: str, optional
+    :param pwd_context: CryptContext serialized with ``CryptContext.to_string()`` _(see :py:func:`_pwd_context_conf`)_
+        defaults to bcrypt with the ``passlib`` default cost
+    :type pwd_context: str, optional
 
     """
     __slots__ = {
-        "__crypt_key",
+        "credential_cache",
         "__token_encode",
+        "__token_signer",
+        "__token_verifier",
+        "__lock",
         "__pass",
-        "__pwdctx",
+        "__pass_hashing",
+        "__pwdctx_conf",
+        "pool",
+        "store",
+        "token_cache",
         "token_expiration",
         "__user",
     }
@@ -227,21 +823,63 @@ class Kauthbara:
                  name: Optional[str] = __app_name__,
                  crypt_key: Optional[str] = "",
                  token_expiration_interval: Optional[int] = 30,
-                 token_encode_algorithm: Optional[str] = "HS256"):
+                 token_encode_algorithm: Optional[str] = "HS256",
+                 pool: Optional[WorkerPool] = None,
+                 credential_cache: Optional[CredentialCache] = None,
+                 token_cache_size: Optional[int] = 1024,
+                 store: Optional[CredentialStore] = None,
+                 public_key: Optional[str] = None,
+                 pwd_context: Optional[str] = _PWD_CONTEXT_):
         """Constructor method
 
         """
-        self.__crypt_key = crypt_key
         self.__token_encode = token_encode_algorithm
+        self.__token_signer, self.__token_verifier = _token_keys(crypt_key, token_encode_algorithm, public_key)
         self.token_expiration = token_expiration_interval
-        self.__pwdctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.__pwdctx_conf = pwd_context
+        self.pool = pool if pool is not None else WorkerPool()
+        self.credential_cache = credential_cache
+        self.token_cache = LRUCache(maxsize=token_cache_size, clock=time)
+        self.store = store
         self.__user = name
-        self.__pass = self.get_password_hash(name)
+        self.__pass = None
+        self.__pass_hashing = None
+        self.__lock = Lock()
+
+    def __claim_pass_hashing(self) -> Tuple[Future, bool]:
+        """Future of the hash of the mocked user password, and whether the caller has to compute it
+
+        Only the first caller computes the hash, the concurrent ones wait
+        for it _(from a thread or from any event loop)_. When the first
+        caller fails, the next one tries again.
+        """
+        with self.__lock:
+            if self.__pass_hashing is None:
+                self.__pass_hashing = Future()
+                return self.__pass_hashing, True
+            return self.__pass_hashing, False
+
+    def __pass_hashed(self, hashing: Future, hashed_password: Optional[str] = None,
+                      error: Optional[BaseException] = None):
+        """Publish the outcome of the hashing claimed with :py:meth:`__claim_pass_hashing`
+
+        """
+        if error is None:
+            self.__pass = hashed_password
+            hashing.set_result(hashed_password)
+            return
+        with self.__lock:
+            self.__pass_hashing = None
+        hashing.set_exception(error)
 
     def authenticate(self, username: str, password: str) -> bool:
         """Authenticate a user
 
-        Provided `username` and `password` _(plain-text)_, it performs authentication
+        Provided `username` and `password` _(plain-text)_, it performs authentication.
+        When the password is valid but its hash was computed with other
+        settings _(e.g. a different bcrypt cost)_, the hash is updated.
+        It can run on any thread: the verification time is recorded by the
+        event loop of the worker.
 
         :param username: user ID
         :type username: str
@@ -252,12 +890,84 @@ class Kauthbara:
         :rtype: bool
 
         """
-        if username != self.__user:
+        hashed_password = self.get_stored_hash(username)
+        if hashed_password is None:
+            return False
+        if self.credential_cache is not None \
+                and self.credential_cache.check(username, password, hashed_password):
+            return True
+        started = perf_counter()
+        is_valid, new_hash = _pwd_verify_and_update(self.__pwdctx_conf, password, hashed_password)
+        elapsed = perf_counter() - started
+        _metrics.observe("password_verify", elapsed)
+        if not is_valid:
+            return False
+        if new_hash is not None:
+            hashed_password = self.update_stored_hash(username, new_hash)
+        if self.credential_cache is not None:
+            self.credential_cache.add(username, password, hashed_password, elapsed)
+        return True
+
+    async def authenticate_async(self, username: str, password: str) -> bool:
+        """Authenticate a user without blocking the event loop
+
+        Same as :py:meth:`~Kauthbara.authenticate`, but the password hash is
+        verified on the worker pool of the instance.
+
+        :param username: user ID
+        :type username: str
+        :param password: password in plain-text
+        :type password: str
+
+        :raises PoolSaturatedError: when the worker pool queue is full
+
+        :return: True/False
+        :rtype: bool
+
+        """
+        if self.store is None and username == self.__user and self.__pass is None:
+            hashing, owner = self.__claim_pass_hashing()
+            if not owner:
+                await wrap_future(hashing)
+            else:
+                try:
+                    hashed_password = await self.pool.run(_pwd_hash, self.__pwdctx_conf, self.__user)
+                except BaseException as err:
+                    self.__pass_hashed(hashing, error=err)
+                    raise
+                self.__pass_hashed(hashing, hashed_password)
+        hashed_password = self.get_stored_hash(username)
+        if hashed_password is None:
             return False
-        if not self.verify_password(password, self.__pass):
+        if self.credential_cache is not None \
+                and self.credential_cache.check(username, password, hashed_password):
+            return True
+        (is_valid, new_hash), elapsed = await self.pool.run_timed(
+            _pwd_verify_and_update, self.__pwdctx_conf, password, hashed_password)
+        _metrics.observe("password_verify", elapsed)
+        if not is_valid:
             return False
+        if new_hash is not None:
+            hashed_password = await get_event_loop().run_in_executor(
+                None, self.update_stored_hash, username, new_hash)
+        if self.credential_cache is not None:
+            self.credential_cache.add(username, password, hashed_password, elapsed)
         return True
 
+    def warm_up(self):
+        """Prepare upfront the state otherwise built by the first requests
+
+        Hashes the password of the mocked user, indexes the credential store
+        and loads the hashing backend. Meant to run before forking workers,
+        which then share the prepared state instead of building it each.
+
+        """
+        if self.store is not None:
+            len(self.store)
+            _pwd_context(self.__pwdctx_conf).dummy_verify()
+        else:
+            self.get_stored_hash(self.__user)
+
     def create_access_token(self, data: dict, expires_delta: Optional[t_timedelta] = None) -> str:
         """Create an access token in JWT format
 
@@ -277,14 +987,94 @@ class Kauthbara:
         else:   #pragma: no cover
             expire = now + t_timedelta(minutes=self.token_expiration)
         to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, self.__crypt_key, algorithm=self.__token_encode)
+        from jose import jwt    # pylint: disable=import-outside-toplevel
+        started = perf_counter()
+        encoded_jwt = jwt.encode(to_encode, self.__token_signer, algorithm=self.__token_encode)
+        _metrics.observe("token_encode", perf_counter() - started)
         return encoded_jwt
 
+    def verify_access_token(self, token: str) -> Dict:
+        """Verify an access token created by :py:meth:`~Kauthbara.create_access_token`
+
+        The claims of verified tokens are cached until the token expires, so that
+        verifying the same token again costs just a lookup.
+
+        :param token: Encoded JWT Token
+        :type token: str
+
+        :raises jose.JWTError: when the token is malformed, tampered or expired
+
+        :return: Claims of the token _(shared with the cache: do not modify them)_
+        :rtype: Dict
+
+        """
+        claims = self.token_cache.get(token)
+        if claims is None:
+            from jose import jwt    # pylint: disable=import-outside-toplevel
+            claims = jwt.decode(token, self.__token_verifier, algorithms=[self.__token_encode])
+            if "exp" not in claims:
+                raise JWTError("Token does not expire")
+            self.token_cache.set(token, claims, expires_at=claims["exp"])
+        return claims
+
+    def get_stored_hash(self, username: str) -> Optional[str]:
+        """Get the stored password hash of a user
+
+        :param username: user ID
+        :type username: str
+
+        :return: The password hash or `None` when the user does not exist
+        :rtype: str, optional
+
+        """
+        if self.store is not None:
+            return self.store.get(username)
+        if username != self.__user:
+            return None
+        if self.__pass is None:
+            hashing, owner = self.__claim_pass_hashing()
+            if not owner:
+                return hashing.result()
+            try:
+                hashed_password = self.get_password_hash(self.__user)
+            except BaseException as err:
+                self.__pass_hashed(hashing, error=err)
+                raise
+            self.__pass_hashed(hashing, hashed_password)
+        return self.__pass
+
+    def update_stored_hash(self, username: str, hashed_password: str) -> str:
+        """Store the updated password hash of a user
+
+        Failing to write the store _(e.g. read-only)_ is logged, and the
+        old hash keeps working.
+
+        :param username: user ID
+        :type username: str
+        :param hashed_password: new password hash
+        :type hashed_password: str
+
+        :return: The stored password hash _(the old one when it could not be updated)_
+        :rtype: str
+
+        """
+        if self.store is None:
+            if username == self.__user:
+                self.__pass = hashed_password
+            return hashed_password
+        try:
+            self.store.update(username, hashed_password)
+        except (KeyError, OSError) as err:
+            log.warning("Password hash of '%s' not updated: %s", username, err)
+            return self.store.get(username)
+        log.info("Password hash of '%s' updated", username)
+        return hashed_password
+
     def get_password_hash(self, password: str) -> str:
         """Calculate password hash
 
         Given a plain-text password, it returns an hashed one according to
-        the default CryptContext _(Leverages `bcrypt`)_
+        the CryptContext _(Leverages `bcrypt` unless another scheme is configured)_
 
         :param password: password in plain-text
         :type password: str
@@ -293,12 +1083,13 @@ class Kauthbara:
         :rtype: str
 
         """
-        return self.__pwdctx.hash(password)
+        return _pwd_context(self.__pwdctx_conf).hash(password)
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify user's password
 
-        Credentials are verified using the default CryptContext _(Leverages `bcrypt`)_
+        Credentials are verified using the CryptContext _(hashes of any of the
+        supported schemes are recognized: `bcrypt`, `scrypt`, `pbkdf2_sha256` and `argon2`)_
 
         :param plain_password: password in plain-text as entered by the user
         :type plain_password: str
@@ -309,7 +1100,10 @@ class Kauthbara:
         :rtype: bool
 
         """
-        return self.__pwdctx.verify(plain_password, hashed_password)
+        started = perf_counter()
+        is_valid = _pwd_context(self.__pwdctx_conf).verify(plain_password, hashed_password)
+        _metrics.observe("password_verify", perf_counter() - started)
+        return is_valid
 
 
 #pragma CLASS: Kapibara
@@ -326,6 +1120,8 @@ class Kapibara:
     """
     __slots__ = {
         "__conf",
+        "__conf_file",
+        "__defaults",
         "__name",
     }
 
@@ -356,25 +1152,80 @@ class Kapibara:
             #   NOT reused on an instance twice!
             #
             self.__name = name
-            self.__conf = {
+            self.__conf_file = ""
+            self.__defaults = {
                 "server": {
                     "addr": "localhost",
                     "port": 0,
+                    "workers": 1,
+                    "preload": False,
                 },
                 "crypt": {
                     "key": "",
+                    "algorithm": "HS256",
+                    "private_key": "",
+                    "public_key": "",
+                    "pool": {
+                        "kind": "thread",
+                        "workers": 0,
+                        "queue": 64,
+                    },
+                    "cache": {
+                        "size": 0,
+                        "ttl": 300,
+                    },
+                    "token_cache": 1024,
+                    "users": "",
+                    "scheme": "bcrypt",
+                    "target_ms": 0,
+                },
+                "rate_limit": {
+                    "client": {
+                        "rate": 0,
+                        "burst": 10,
+                    },
+                    "username": {
+                        "rate": 0,
+                        "burst": 5,
+                    },
+                    "account": {
+                        "rate": 0,
+                        "burst": 50,
+                    },
+                    "size": 65536,
+                },
+                "response_cache": {
+                    "size": 0,
+                    "memory": 16777216,
+                    "ttl": 30,
+                },
+                "items": {
+                    "path": "",
+                    "seed": "",
+                },
+                "log": {
+                    "queue_size": 10000,
+                    "drop_policy": "drop_new",
+                },
+                "loop_monitor": {
+                    "enabled": False,
+                    "interval": 0.1,
+                    "threshold": 0.1,
+                },
+                "watch": {
+                    "enabled": False,
+                    "interval": 1.0,
                 },
                 "debug": False,
             }
             self.__conf = self.load_configuration(self.__name)
             if self.__conf["debug"]:    #pragma: no cover
-                _log_console_handler.setLevel(l_DEBUG)
-                _log_disk_handler.setLevel(l_DEBUG)
-                log.setLevel(l_DEBUG)
+                _set_debug(True)
             self.sanitize_configuration()
+            _log_queue.configure(**self.__conf["log"])
 
     @staticmethod
-    def load_environment_variables(cnf: Dict) -> Dict:
+    def load_environment_variables(cnf: Dict, env: Optional[Mapping[str, str]] = None) -> Dict:
         """Load environment variables eventually present to overwrite a configuration.
 
         It expects and returns the configuration as a Dict with the following schema:
@@ -383,9 +1234,64 @@ class Kapibara:
                 "server": {
                     "addr": "localhost",
                     "port": 0,
+                    "workers": 1,
+                    "preload": False,
                 },
                 "crypt": {
                     "key": "",
+                    "algorithm": "HS256",
+                    "private_key": "",
+                    "public_key": "",
+                    "pool": {
+                        "kind": "thread",
+                        "workers": 0,
+                        "queue": 64,
+                    },
+                    "cache": {
+                        "size": 0,
+                        "ttl": 300,
+                    },
+                    "token_cache": 1024,
+                    "users": "",
+                    "scheme": "bcrypt",
+                    "target_ms": 0,
+                },
+                "rate_limit": {
+                    "client": {
+                        "rate": 0,
+                        "burst": 10,
+                    },
+                    "username": {
+                        "rate": 0,
+                        "burst": 5,
+                    },
+                    "account": {
+                        "rate": 0,
+                        "burst": 50,
+                    },
+                    "size": 65536,
+                },
+                "response_cache": {
+                    "size": 0,
+                    "memory": 16777216,
+                    "ttl": 30,
+                },
+                "items": {
+                    "path": "",
+                    "seed": "",
+                },
+                "log": {
+                    "queue_size": 10000,
+                    "drop_policy": "drop_new",
+                },
+                "loop_monitor": {
+                    "enabled": False,
+                    "interval": 0.1,
+                    "threshold": 0.1,
+                },
+                "watch": {
+                    "enabled": False,
+                    "interval": 1.0,
                 },
                 "debug": False,
             }
@@ -401,23 +1307,120 @@ class Kapibara:
 
         :param cnf: configuration dictionary
         :type cnf: Dict
+        :param env: environment variables
+            defaults to `None` _(those of the process)_
+        :type env: Mapping[str, str], optional
 
         :return: The configuration
             Following the schema above
         :rtype: Dict
         """
+        env = os_environ if env is None else env
         cnf["server"]["addr"] = \
-            os_getenv("SERVER_ADDR",
-                      default=cnf["server"]["addr"])
+            env.get("SERVER_ADDR",
+                    cnf["server"]["addr"])
         cnf["server"]["port"] = \
-            int(os_getenv("SERVER_PORT",
-                          default=cnf["server"]["port"]))
+            int(env.get("SERVER_PORT",
+                        cnf["server"]["port"]))
+        cnf["server"]["workers"] = \
+            env.get("SERVER_WORKERS",
+                    cnf["server"]["workers"])
+        if str(cnf["server"]["workers"]).isdigit():
+            cnf["server"]["workers"] = int(cnf["server"]["workers"])
+        cnf["server"]["preload"] = \
+            env.get("SERVER_PRELOAD",
+                    str(cnf["server"]["preload"])).lower() \
+            in ("true", "t", "1", "yes", "y")
         cnf["crypt"]["key"] = \
-            os_getenv("CRYPT_KEY",
-                      default=cnf["crypt"]["key"])
+            env.get("CRYPT_KEY",
+                    cnf["crypt"]["key"])
+        cnf["crypt"]["algorithm"] = \
+            env.get("CRYPT_ALGORITHM",
+                    cnf["crypt"]["algorithm"])
+        cnf["crypt"]["private_key"] = \
+            env.get("CRYPT_PRIVATE_KEY",
+                    cnf["crypt"]["private_key"])
+        cnf["crypt"]["public_key"] = \
+            env.get("CRYPT_PUBLIC_KEY",
+                    cnf["crypt"]["public_key"])
+        cnf["crypt"]["pool"]["kind"] = \
+            env.get("CRYPT_POOL_KIND",
+                    cnf["crypt"]["pool"]["kind"])
+        cnf["crypt"]["pool"]["workers"] = \
+            int(env.get("CRYPT_POOL_WORKERS",
+                        cnf["crypt"]["pool"]["workers"]))
+        cnf["crypt"]["pool"]["queue"] = \
+            int(env.get("CRYPT_POOL_QUEUE",
+                        cnf["crypt"]["pool"]["queue"]))
+        cnf["crypt"]["cache"]["size"] = \
+            int(env.get("CRYPT_CACHE_SIZE",
+                        cnf["crypt"]["cache"]["size"]))
+        cnf["crypt"]["cache"]["ttl"] = \
+            float(env.get("CRYPT_CACHE_TTL",
+                          cnf["crypt"]["cache"]["ttl"]))
+        cnf["crypt"]["token_cache"] = \
+            int(env.get("CRYPT_TOKEN_CACHE",
+                        cnf["crypt"]["token_cache"]))
+        cnf["crypt"]["users"] = \
+            env.get("CRYPT_USERS",
+                    cnf["crypt"]["users"])
+        cnf["crypt"]["scheme"] = \
+            env.get("CRYPT_SCHEME",
+                    cnf["crypt"]["scheme"])
+        cnf["crypt"]["target_ms"] = \
+            float(env.get("CRYPT_TARGET_MS",
+                          cnf["crypt"]["target_ms"]))
+        for limit in ("client", "username", "account"):
+            cnf["rate_limit"][limit]["rate"] = \
+                float(env.get(f"RATE_LIMIT_{limit.upper()}_RATE",
+                              cnf["rate_limit"][limit]["rate"]))
+            cnf["rate_limit"][limit]["burst"] = \
+                int(env.get(f"RATE_LIMIT_{limit.upper()}_BURST",
+                            cnf["rate_limit"][limit]["burst"]))
+        cnf["rate_limit"]["size"] = \
+            int(env.get("RATE_LIMIT_SIZE",
+                        cnf["rate_limit"]["size"]))
+        cnf["response_cache"]["size"] = \
+            int(env.get("RESPONSE_CACHE_SIZE",
+                        cnf["response_cache"]["size"]))
+        cnf["response_cache"]["memory"] = \
+            int(env.get("RESPONSE_CACHE_MEMORY",
+                        cnf["response_cache"]["memory"]))
+        cnf["response_cache"]["ttl"] = \
+            float(env.get("RESPONSE_CACHE_TTL",
+                          cnf["response_cache"]["ttl"]))
+        cnf["items"]["path"] = \
+            env.get("ITEMS_PATH",
+                    cnf["items"]["path"])
+        cnf["items"]["seed"] = \
+            env.get("ITEMS_SEED",
+                    cnf["items"]["seed"])
+        cnf["log"]["queue_size"] = \
+            int(env.get("LOG_QUEUE_SIZE",
+                        cnf["log"]["queue_size"]))
+        cnf["log"]["drop_policy"] = \
+            env.get("LOG_DROP_POLICY",
+                    cnf["log"]["drop_policy"])
+        cnf["loop_monitor"]["enabled"] = \
+            env.get("LOOP_MONITOR_ENABLED",
+                    str(cnf["loop_monitor"]["enabled"])).lower() \
+            in ("true", "t", "1", "yes", "y")
+        cnf["loop_monitor"]["interval"] = \
+            float(env.get("LOOP_MONITOR_INTERVAL",
+                          cnf["loop_monitor"]["interval"]))
+        cnf["loop_monitor"]["threshold"] = \
+            float(env.get("LOOP_MONITOR_THRESHOLD",
+                          cnf["loop_monitor"]["threshold"]))
+        cnf["watch"]["enabled"] = \
+            env.get("WATCH_ENABLED",
+                    str(cnf["watch"]["enabled"])).lower() \
+            in ("true", "t", "1", "yes", "y")
+        cnf["watch"]["interval"] = \
+            float(env.get("WATCH_INTERVAL",
+                          cnf["watch"]["interval"]))
         cnf["debug"] = \
-            os_getenv("DEBUG",
-                      default=str(cnf["debug"])).lower() \
+            env.get("DEBUG",
+                    str(cnf["debug"])).lower() \
             in ("true", "t", "1", "yes", "y")
         return cnf
 
@@ -431,15 +1434,148 @@ class Kapibara:
         """
         return self.__conf
 
+    @property
+    def conf_file(self) -> str:
+        """
+        Path of the configuration file.
+
+        :getter: Returns the path of the file the configuration was loaded from
+        :type: str
+        """
+        return self.__conf_file
+
+    @staticmethod
+    def environment_file() -> str:
+        """Path of the environment file _(``.env-kapibara``)_.
+
+        It is searched for in the same locations of the configuration file
+        _(see :py:func:`~shared.useful.find_config_path`)_.
+
+        :staticmethod:
+
+        :return: The path _(in the current working directory when not found)_
+        :rtype: str
+        """
+        return os_path.join(find_config_path(f".env-{__app_name__}"), f".env-{__app_name__}")
+
+    @staticmethod
+    def resolve_path(fname: str) -> str:
+        """Resolve the path of a file referenced by the configuration.
+
+        A relative path is searched for in the same locations of the configuration file
+        _(see :py:func:`~shared.useful.find_config_path`)_.
+
+        :staticmethod:
+
+        :param fname: path as found in the configuration
+        :type fname: str
+
+        :return: The resolved path _(empty when ``fname`` is empty)_
+        :rtype: str
+        """
+        if fname and not os_path.isabs(fname):
+            fname = os_path.join(find_config_path(fname), fname)
+        return fname
+
+    @property
+    def crypt_algorithm(self) -> str:   #pragma: no cover
+        """
+        Algorithm used to sign the access tokens.
+
+        :getter: Returns the algorithm name _(e.g. `HS256`, `RS256` or `ES256`)_
+        :type: str
+        """
+        return self.__conf["crypt"]["algorithm"]
+
     @property
     def crypt_key(self) -> str: #pragma: no cover
         """
         Cryptographic secret key.
 
+        For asymmetric algorithms it is the content of the ``private_key`` file.
+
         :getter: Returns the cryptographic secret used for token encryption
         :type: str
         """
-        return self.__conf["crypt"]["key"]
+        if self.crypt_algorithm in _HMAC_ALGORITHMS_:
+            return self.__conf["crypt"]["key"]
+        with open(self.resolve_path(self.__conf["crypt"]["private_key"]), "r", encoding="utf-8") as file:
+            return file.read()
+
+    @property
+    def crypt_public_key(self) -> Optional[str]:    #pragma: no cover
+        """
+        Public key to verify the access tokens signed with asymmetric algorithms.
+
+        :getter: Returns the content of the ``public_key`` file _(`None` when not configured)_
+        :type: str
+        """
+        if self.crypt_algorithm in _HMAC_ALGORITHMS_ or not self.__conf["crypt"]["public_key"]:
+            return None
+        with open(self.resolve_path(self.__conf["crypt"]["public_key"]), "r", encoding="utf-8") as file:
+            return file.read()
+
+    @property
+    def crypt_cache(self) -> Dict:  #pragma: no cover
+        """
+        Verified-credential cache settings.
+
+        :getter: Returns the ``size`` _(`0` when disabled)_ and ``ttl`` of the cache
+        :type: dict
+        """
+        return self.__conf["crypt"]["cache"]
+
+    @property
+    def crypt_pool(self) -> Dict:   #pragma: no cover
+        """
+        Worker pool settings for password hashing.
+
+        :getter: Returns the ``kind``, ``workers`` and ``queue`` of the pool
+        :type: dict
+        """
+        return self.__conf["crypt"]["pool"]
+
+    @property
+    def crypt_scheme(self) -> str:  #pragma: no cover
+        """
+        Password hashing scheme.
+
+        :getter: Returns the scheme of new password hashes
+        :type: str
+        """
+        return self.__conf["crypt"]["scheme"]
+
+    @property
+    def crypt_target_ms(self) -> float:  #pragma: no cover
+        """
+        Time budget of a password hash.
+
+        :getter: Returns the milliseconds a bcrypt hash should take _(`0` keeps the default cost)_
+        :type: float
+        """
+        return self.__conf["crypt"]["target_ms"]
+
+    @property
+    def crypt_token_cache(self) -> int: #pragma: no cover
+        """
+        Size of the verified-token cache.
+
+        :getter: Returns how many verified tokens are remembered
+        :type: int
+        """
+        return self.__conf["crypt"]["token_cache"]
+
+    @property
+    def crypt_users(self) -> str:   #pragma: no cover
+        """
+        Path to the file with the users and their password hashes.
+
+        A relative path is searched for in the same locations of the configuration file.
+
+        :getter: Returns the path _(empty when no file is configured)_
+        :type: str
+        """
+        return self.resolve_path(self.__conf["crypt"]["users"])
 
     @property
     def is_debug(self) -> bool: #pragma: no cover
@@ -451,6 +1587,63 @@ class Kapibara:
         """
         return self.__conf["debug"]
 
+    @property
+    def loop_monitor(self) -> Dict:  #pragma: no cover
+        """
+        Event loop monitor settings.
+
+        :getter: Returns whether the monitor is ``enabled``, the ``interval`` between
+            heartbeats and the lag ``threshold`` reported as blocking _(seconds)_
+        :type: dict
+        """
+        return self.__conf["loop_monitor"]
+
+    @property
+    def rate_limit(self) -> Dict:   #pragma: no cover
+        """
+        Rate limits of the ``/token`` endpoint.
+
+        :getter: Returns the ``rate`` _(tokens per second, `0` when disabled)_ and ``burst``
+            of the limits by ``client`` address, by ``username`` from each client address and by
+            username alone _(``account``)_, and the ``size`` of their tables
+        :type: dict
+        """
+        return self.__conf["rate_limit"]
+
+    @property
+    def items_path(self) -> str:    #pragma: no cover
+        """
+        Path to the file the items are loaded from.
+
+        A relative path is searched for in the same locations of the configuration file.
+
+        :getter: Returns the path _(empty when items are kept in memory only)_
+        :type: str
+        """
+        return self.resolve_path(self.__conf["items"]["path"])
+
+    @property
+    def items_seed(self) -> str:    #pragma: no cover
+        """
+        Path to the NDJSON file the items are seeded from at startup.
+
+        A relative path is searched for in the same locations of the configuration file.
+
+        :getter: Returns the path _(empty when there is nothing to seed)_
+        :type: str
+        """
+        return self.resolve_path(self.__conf["items"]["seed"])
+
+    @property
+    def response_cache(self) -> Dict:   #pragma: no cover
+        """
+        Response cache settings.
+
+        :getter: Returns the ``size`` _(`0` when disabled)_, ``memory`` _(bytes)_ and ``ttl`` of the cache
+        :type: dict
+        """
+        return self.__conf["response_cache"]
+
     @property
     def server_addr(self) -> str:   #pragma: no cover
         """
@@ -471,6 +1664,38 @@ class Kapibara:
         """
         return self.__conf["server"]["port"]
 
+    @property
+    def server_workers(self) -> int:    #pragma: no cover
+        """
+        Number of worker processes serving the API.
+
+        :getter: Returns the number of workers _(`auto` is one per available CPU)_
+        :type: int
+        """
+        workers = self.__conf["server"]["workers"]
+        return available_cpus() if workers == "auto" else workers
+
+    @property
+    def server_preload(self) -> bool:
+        """
+        Whether the app state is prepared once before forking the workers.
+
+        :getter: Returns `True` when preloading is enabled
+        :type: bool
+        """
+        return self.__conf["server"]["preload"]
+
+    @property
+    def watch(self) -> Dict:
+        """
+        Configuration hot-reload settings.
+
+        :getter: Returns whether the configuration files are watched _(``enabled``)_
+            and how often they are checked when polling _(``interval``, seconds)_
+        :type: dict
+        """
+        return self.__conf["watch"]
+
     def load_configuration(self, fname: str) -> Dict:
         """Load the configuration from the specified YAML file.
 
@@ -493,16 +1718,74 @@ class Kapibara:
             merged to the expected one _(see: :py:meth:`~Kapibara.load_environment_variables`)_
         :rtype: Dict
         """
-        conf_file = os_path.join(find_config_path(f"{fname}.yml"), f"{fname}.yml")
         try:
-            with open(conf_file, "r", encoding="utf-8") as file:
-                configuration = yml_load(file, Loader=yml_Loader)
+            return self.read_configuration(fname)
         except FileNotFoundError as err:
             log.critical(
-                "Missing configuration file '%s'", conf_file)
+                "Missing configuration file '%s'", err.filename)
             sys_exit(err)
+
+    def read_configuration(self, fname: str, env: Optional[Mapping[str, str]] = None) -> Dict:
+        """Read the configuration from the specified YAML file.
+
+        Same as :py:meth:`~Kapibara.load_configuration`, but errors are raised
+        instead of exiting. The file content is merged to the default
+        configuration _(not to the current one)_.
+
+        :param fname: configuration file name
+        :type fname: str
+        :param env: environment variables
+            defaults to `None` _(those of the process)_
+        :type env: Mapping[str, str], optional
+
+        :raises FileNotFoundError: when the configuration file does not exist
+
+        :return: The configuration
+        :rtype: Dict
+        """
+        conf_file = os_path.join(find_config_path(f"{fname}.yml"), f"{fname}.yml")
+        # pylint: disable=import-outside-toplevel
+        from yaml import load as yml_load
+        try:
+            from yaml import CLoader as yml_Loader
+        except ImportError: #pragma: no cover
+            from yaml import Loader as yml_Loader
+        with open(conf_file, "r", encoding="utf-8") as file:
+            configuration = yml_load(file, Loader=yml_Loader)
         log.debug("load_configuration: %s", configuration)
-        return Kapibara.load_environment_variables({**self.__conf, **configuration})
+        self.__conf_file = os_path.abspath(conf_file)
+        return Kapibara.load_environment_variables(merge_dicts(deepcopy(self.__defaults), configuration), env)
+
+    @staticmethod
+    def validate_configuration(conf: Dict):
+        """Validate a configuration against the expected schema.
+
+        :staticmethod:
+
+        :param conf: configuration dictionary
+        :type conf: Dict
+
+        :raises Exceptionbara: when the configuration is not valid
+        """
+        from schema import SchemaError  # pylint: disable=import-outside-toplevel
+        try:
+            _config_schema().validate(conf)
+        except SchemaError as err:
+            raise Exceptionbara(f"Configuration file content was not in the expected format: {err}") from err
+        if conf["server"]["port"] <= 0:
+            raise Exceptionbara("Server port to listen to must be greater than 0")
+        if conf["crypt"]["scheme"] != "bcrypt" and not _pwd_scheme_available(conf["crypt"]["scheme"]):
+            raise Exceptionbara(f"Password hashing scheme '{conf['crypt']['scheme']}' is not available "
+                                "(its backend is not installed)")
+        for key, needed in (("users", False),
+                            ("private_key", conf["crypt"]["algorithm"] not in _HMAC_ALGORITHMS_),
+                            ("public_key", False)):
+            fname = conf["crypt"].get(key)
+            if (fname or needed) and not os_path.isfile(Kapibara.resolve_path(fname)):
+                raise Exceptionbara(f"Missing {key.replace('_', ' ')} file '{fname}'")
+        fname = conf["items"].get("seed")
+        if fname and not os_path.isfile(Kapibara.resolve_path(fname)):
+            raise Exceptionbara(f"Missing items seed file '{fname}'")
 
     def sanitize_configuration(self):
         """Sanitize the configuration making sure it adhere to the expected schema.
@@ -512,16 +1795,63 @@ class Kapibara:
         it forces the script to exit with a critical error.
         """
         try:
-            _CONFIG_SCHEMA_.validate(self.__conf)
-        except SchemaError as err:
-            log.critical(
-                "Configuration file content was not in the expected format: %s", err)
-            sys_exit(EINVAL)
-        if self.__conf["server"]["port"] <= 0:
-            log.critical(
-                "Server port to listen to must be greater than 0")
+            self.validate_configuration(self.__conf)
+        except Exceptionbara as err:
+            log.critical("%s", err)
             sys_exit(EINVAL)
 
+    def reload_configuration(self) -> Dict[str, Tuple[object, object]]:
+        """Reload the configuration and environment files applying what changed.
+
+        A new configuration is built from scratch _(defaults, configuration
+        file, environment file and environment variables)_ and validated: only
+        when it is valid it replaces the current one, in a single assignment.
+        Changes to the keys in ``_LIVE_CONFIG_KEYS_`` take effect right away
+        _(logging included, the others are up to the caller)_, while changes
+        to any other key are logged and ignored until the next restart.
+
+        The environment file is read without touching the environment of the
+        process: as on start, variables set outside of it take precedence,
+        and those removed from it are gone _(see :py:func:`load_environment_file`)_.
+
+        :return: The changed live keys _(dotted, e.g. ``crypt.cache.size``)_
+            with their old and new values, empty when the new configuration is not valid
+        :rtype: Dict[str, Tuple[object, object]]
+        """
+        from dotenv import dotenv_values    # pylint: disable=import-outside-toplevel
+        invalidate_config_paths()
+        try:
+            env = {key: value for key, value in dotenv_values(self.environment_file()).items()
+                   if value is not None}
+            env.update((key, value) for key, value in os_environ.items() if key not in _dotenv_keys)
+            conf = self.read_configuration(self.__name, env)
+            self.validate_configuration(conf)
+        except Exception as err:    # pylint: disable=broad-except
+            log.error("Configuration not reloaded, keeping the current one: %s", err)
+            return {}
+        current = _flatten_conf(self.__conf)
+        changed = {}
+        for key, value in _flatten_conf(conf).items():
+            if key not in current or current[key] == value:
+                continue
+            if _is_live_key(key):
+                changed[key] = (current[key], value)
+                continue
+            log.warning("Configuration key '%s' changed: it takes effect on restart", key)
+            section, _, name = key.rpartition(".")
+            target = conf
+            for part in section.split(".") if section else ():
+                target = target[part]
+            target[name] = current[key]
+        self.__conf = conf
+        if "debug" in changed:
+            _set_debug(conf["debug"])
+        if any(key.startswith("log.") for key in changed):
+            _log_queue.configure(**conf["log"])
+        if changed:
+            log.info("Configuration reloaded: %s", ", ".join(sorted(changed)))
+        return changed
+
 
 def asgi() -> FastAPI:  #pragma: no cover
     """Configure FastAPI app as needed and returns its instance
@@ -532,12 +1862,200 @@ def asgi() -> FastAPI:  #pragma: no cover
     :return: Instance of FastAPI app
     :rtype: FastAPI
     """
-    dotenv_load(os_path.join(find_config_path(f".env-{__app_name__}"), f".env-{__app_name__}"))
+    load_environment_file()
     app.kapi = Kapibara()
-    app.kauth = Kauthbara(crypt_key=app.kapi.crypt_key)
+    pwd_context = _pwd_context_conf(app.kapi.crypt_scheme)
+    if app.kapi.crypt_target_ms and app.kapi.crypt_scheme != "bcrypt":
+        log.warning("Password hashing: crypt.target_ms only applies to bcrypt, ignored for '%s'",
+                    app.kapi.crypt_scheme)
+    elif app.kapi.crypt_target_ms:
+        rounds, timings = calibrate_bcrypt(app.kapi.crypt_target_ms)
+        pwd_context = _pwd_context_conf("bcrypt", rounds)
+        log.info("Password hashing: bcrypt cost %d for a %.0f ms budget (measured %s)",
+                 rounds, app.kapi.crypt_target_ms,
+                 ", ".join(f"cost {cost}: {elapsed:.1f} ms" for cost, elapsed in timings))
+    app.kauth = Kauthbara(crypt_key=app.kapi.crypt_key,
+                          token_encode_algorithm=app.kapi.crypt_algorithm,
+                          public_key=app.kapi.crypt_public_key,
+                          pool=WorkerPool(**app.kapi.crypt_pool),
+                          credential_cache=_credential_cache(app.kapi.crypt_cache),
+                          token_cache_size=app.kapi.crypt_token_cache,
+                          store=CredentialStore(app.kapi.crypt_users) if app.kapi.crypt_users else None,
+                          pwd_context=pwd_context)
+    _response_cache.configure(**app.kapi.response_cache)
+    app.items = _load_items(app.kapi.items_path, app.kapi.items_seed)
+    log.info("Items: %d in %s", len(app.items), app.kapi.items_path or "memory")
+    for limit, limiter in _token_limiters.items():
+        limiter.configure(size=app.kapi.rate_limit["size"], **app.kapi.rate_limit[limit])
     return app
 
 
+def load_environment_file():
+    """Load the environment file into the environment variables of the process
+
+    Variables already set are left untouched _(they take precedence over
+    the file)_. Those set from the file are remembered, so that
+    :py:meth:`Kapibara.reload_configuration` reads them from the file again
+    instead of from the environment, dropping those removed from it.
+    """
+    from dotenv import dotenv_values    # pylint: disable=import-outside-toplevel
+    for key, value in dotenv_values(Kapibara.environment_file()).items():
+        if value is not None and key not in os_environ:
+            os_environ[key] = value
+            _dotenv_keys.add(key)
+
+
+def _load_items(path: str, seed: str) -> ItemRepository:
+    """Item repository of the configured file, seeded from the configured NDJSON file
+
+    With a file, the seed is parsed only when the file is missing or older
+    than the seed, and written to the file: the following startups map the
+    file without parsing the seed again.
+
+    :param path: file the items are mapped from _(empty to keep them in memory only)_
+    :type path: str
+    :param seed: NDJSON file of the items to add _(empty when there is nothing to seed)_
+    :type seed: str
+
+    :return: The item repository
+    :rtype: ItemRepository
+    """
+    items = ItemStore(path or None)
+    if not seed or (path and os_path.isfile(path) and os_path.getmtime(path) >= os_path.getmtime(seed)):
+        return items
+    with open(seed, "r", encoding="utf-8") as lines:
+        log.info("Items: %d seeded from %s", items.load_ndjson(lines), seed)
+    if path:
+        items.save()
+        log.info("Items: seed %s written to %s", seed, path)
+    return items
+
+
+def _credential_cache(cache_conf: Dict) -> Optional[CredentialCache]:
+    """Verified-credential cache described by its settings
+
+    :return: The cache or `None` when disabled
+    :rtype: CredentialCache, optional
+    """
+    return CredentialCache(maxsize=cache_conf["size"], ttl=cache_conf["ttl"]) if cache_conf["size"] else None
+
+
+def reload_configuration(target: FastAPI, loop: Optional[AbstractEventLoop] = None) -> Dict[str, Tuple[object, object]]:
+    """Reload the configuration of an app applying the live keys that changed
+
+    The files are read and the new caches and credential store built
+    _(and indexed)_ by the caller, then the ones in use are replaced by them
+    on ``loop``, between two steps of the requests being served, which keep
+    using either the old or the new ones.
+
+    :param target: app configured by :py:func:`asgi`
+    :type target: FastAPI
+    :param loop: event loop serving the requests of ``target``
+        _(`None` replaces them right away, from the caller)_
+    :type loop: AbstractEventLoop, optional
+
+    :return: The changed live keys _(see :py:meth:`Kapibara.reload_configuration`)_
+    :rtype: Dict[str, Tuple[object, object]]
+    """
+    changed = target.kapi.reload_configuration()
+    replaced = {}
+    if any(key.startswith("crypt.cache.") for key in changed):
+        replaced["credential_cache"] = _credential_cache(target.kapi.crypt_cache)
+    if "crypt.token_cache" in changed:
+        replaced["token_cache"] = LRUCache(maxsize=target.kapi.crypt_token_cache, clock=time)
+    if "crypt.users" in changed:
+        replaced["store"] = CredentialStore(target.kapi.crypt_users) if target.kapi.crypt_users else None
+        if replaced["store"] is not None:
+            len(replaced["store"])
+    response_cache = target.kapi.response_cache if any(key.startswith("response_cache.") for key in changed) else None
+
+    def replace():
+        for name, value in replaced.items():
+            setattr(target.kauth, name, value)
+        if response_cache is not None:
+            target.response_cache.configure(**response_cache)
+
+    if loop is None:
+        replace()
+    else:
+        loop.call_soon_threadsafe(replace)
+    return changed
+
+
+def _log_blocked_loop(seconds: float, stack: str):  #pragma: no cover
+    """Log the stack of the code blocking the event loop
+
+    """
+    log.warning("Event loop blocked for %.3f s (still blocked), at:\n%s", seconds, stack)
+
+
+@app.on_event("startup")
+async def kapibara_startup():
+    """Compute what depends on the complete app once it is started
+
+    The state otherwise built by the first logins _(see
+    :py:meth:`Kauthbara.warm_up`)_ is prepared on a thread, so that
+    indexing the credential store does not block the event loop, which
+    records all the metrics of the worker _(see :py:meth:`Metrics.attach`)_.
+
+    When enabled, also start monitoring the event loop and watching the
+    configuration files _(in every worker, as each one has its own loop and
+    holds its own copy of the configuration)_.
+
+    """
+    if app.openapi_url:
+        _etags[app.openapi_url] = make_etag(JSONResponse(app.openapi()).body)
+    _metrics.attach(get_event_loop())
+    kauth = getattr(app, "kauth", None)
+    if kauth is not None:
+        # index the credential store off the event loop (already done when preloaded)
+        await get_event_loop().run_in_executor(None, kauth.warm_up)
+    kapi = getattr(app, "kapi", None)
+    if kapi is not None and kapi.loop_monitor["enabled"]:   #pragma: no cover
+        app.loop_monitor = LoopMonitor(interval=kapi.loop_monitor["interval"],
+                                       threshold=kapi.loop_monitor["threshold"],
+                                       on_lag=lambda lag: _metrics.observe("loop_lag", lag),
+                                       on_block=_log_blocked_loop)
+        app.loop_monitor.start()
+    if kapi is not None and kapi.watch["enabled"]:  #pragma: no cover
+        loop = get_event_loop()
+        app.watcher = FileWatcher((kapi.conf_file, kapi.environment_file()),
+                                  lambda paths: reload_configuration(app, loop),
+                                  interval=kapi.watch["interval"])
+        app.watcher.start()
+        log.debug("Watching %s for changes (%s)", ", ".join(app.watcher.paths), app.watcher.backend)
+
+
+@app.on_event("shutdown")
+async def kapibara_shutdown():  #pragma: no cover
+    """Release the resources held by the app on shutdown
+
+    """
+    for component in ("watcher", "loop_monitor"):
+        if getattr(app, component, None) is not None:
+            getattr(app, component).stop()
+    _metrics.attach(None)
+    kauth = getattr(app, "kauth", None)
+    if kauth is not None:
+        kauth.pool.shutdown(wait=False)
+
+
+async def get_token_claims(request: Request, token: str = Depends(oauth2_scheme)) -> Dict:
+    """Dependency verifying the bearer token of protected endpoints
+
+    :return: Claims of the verified token
+    :rtype: Dict
+    """
+    try:
+        return request.app.kauth.verify_access_token(token)
+    except JWTError as err:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        ) from err
+
+
 @app.exception_handler(StarletteHTTPException)
 async def kapibara_exception_handler(request: Request, exception: StarletteHTTPException):
     """Custom exceptions handler
@@ -551,8 +2069,13 @@ async def kapibara_exception_handler(request: Request, exception: StarletteHTTPE
 
     """
     # pylint: disable=unused-argument
-    return JSONResponse(status_code=exception.status_code,
-                        content={"msg": exception.detail})
+    headers = getattr(exception, "headers", None)
+    response = _responses.get(error_key(exception.status_code, exception.detail, headers))
+    if response is None:
+        response = JSONResponse(status_code=exception.status_code,
+                                content={"msg": exception.detail},
+                                headers=headers)
+    return response
 
 
 #    __ ___ _ __  _ __  ___ _ _
@@ -580,8 +2103,7 @@ async def get_root():
 
     Simple default 'application/json' request
     """
-    return JSONResponse(status_code=status.HTTP_200_OK,
-                        content={"msg": ["Hello World!", __app_name__, __version__]})
+    return _responses.get("root")
 
 
 @app.get("/plaintext",
@@ -593,8 +2115,33 @@ async def get_plaintext():
 
     Simple 'text/plain' request
     """
-    return PlainTextResponse(status_code=status.HTTP_200_OK,
-                             content="nothing more than text...")
+    return _responses.get("plaintext")
+
+
+@app.get("/metrics",
+         tags=["common"],
+         response_class=PlainTextResponse,
+         responses={
+            status.HTTP_200_OK: {
+                "description": "Metrics in the Prometheus text exposition format",
+                "content": {
+                    PROMETHEUS_CONTENT_TYPE: {
+                        "example": '# TYPE kapibara_http_requests_total counter\n'
+                                   'kapibara_http_requests_total{route="/",code="200"} 1\n',
+                    },
+                },
+            },
+         }
+)
+async def get_metrics():
+    """[GET] /metrics (async)
+
+    Requests served by every route _(count by status code and latency
+    histogram)_ and latency histograms of password hashing, token signing
+    and serialization, summed over all the workers, and the activity of
+    the password verification pool of the worker answering.
+    """
+    return Response(content=_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.post("/token",
@@ -622,15 +2169,58 @@ async def get_plaintext():
                     },
                 },
             },
+            status.HTTP_429_TOO_MANY_REQUESTS: {
+                "model": Msgbara,
+                "description": "Too Many Requests _(the `Retry-After` header tells when to try again)_",
+                "content": {
+                    "application/json": {
+                        "example": {"msg": "Too many login attempts, retry later"},
+                    },
+                },
+            },
+            status.HTTP_503_SERVICE_UNAVAILABLE: {
+                "model": Msgbara,
+                "description": "Service Unavailable",
+                "content": {
+                    "application/json": {
+                        "example": {"msg": "Too many authentication requests, retry later"},
+                    },
+                },
+            },
           },
 )
 async def post_token(request: Request, form_data: OAuth2PasswordRequestFormStrict = Depends()):
     """[POST] /token (async)
 
-    Mocked access token endpoint
+    Access token endpoint
+
+    Attempts are rate limited by client address, by username from each
+    client address and, more loosely, by username alone before any
+    password is verified. Limiting by username alone lets anyone lock an
+    account out, hence its looser limit.
 
     """
-    is_valid_user = request.app.kauth.authenticate(form_data.username, form_data.password)
+    client = request.client.host if request.client else ""
+    for limit, key in (("client", client),
+                       ("username", f"{client} {form_data.username}"),
+                       ("account", form_data.username)):
+        wait = _token_limiters[limit].acquire(key)
+        if wait:
+            log.debug("post_token: %s '%s' rate limited for %.1f s", limit, key, wait)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, retry later",
+                headers={"Retry-After": str(ceil(wait))},
+            )
+    try:
+        is_valid_user = await request.app.kauth.authenticate_async(form_data.username, form_data.password)
+    except PoolSaturatedError as err:
+        log.warning("post_token: %s", err)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, retry later",
+            headers={"Retry-After": "1"},
+        ) from err
     if not is_valid_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -639,10 +2229,13 @@ async def post_token(request: Request, form_data: OAuth2PasswordRequestFormStric
         )
     access_token_expires = t_timedelta(minutes=request.app.kauth.token_expiration)
     access_token = request.app.kauth.create_access_token(
-        data={"app": __app_name__}, expires_delta=access_token_expires
+        data={"app": __app_name__, "sub": form_data.username}, expires_delta=access_token_expires
     )
-    return JSONResponse(status_code=status.HTTP_200_OK,
-                        content={"access_token": access_token, "token_type": "bearer"})
+    started = perf_counter()
+    response = JSONResponse(status_code=status.HTTP_200_OK,
+                            content={"access_token": access_token, "token_type": "bearer"})
+    _metrics.observe("serialization", perf_counter() - started)
+    return response
 
 
 #    _ _
@@ -651,10 +2244,112 @@ async def post_token(request: Request, form_data: OAuth2PasswordRequestFormStric
 #   |_|\__\___|_|_|_/__/
 #
 #   #pragma TAG: items API endpoints
+@app.post("/items/batch",
+          tags=["items"],
+          response_class=JSONResponse,
+          responses={
+            status.HTTP_200_OK: {
+                "model": ItemBatchResultbara,
+                "description": "The items found _(in the order of their IDs)_ and the IDs not found",
+            },
+            status.HTTP_401_UNAUTHORIZED: {
+                "model": Msgbara,
+                "description": "Unauthorized",
+                "content": {
+                    "application/json": {
+                        "example": {"msg": "Not Authenticated"},
+                    },
+                },
+            },
+            status.HTTP_403_FORBIDDEN: {
+                "model": Msgbara,
+                "description": "Forbidden",
+                "content": {
+                    "application/json": {
+                        "example": {"msg": "Forbidden"},
+                    },
+                },
+            },
+          }
+)
+async def post_items_batch(request: Request, batch: ItemBatchbara,
+                           claims: Dict = Depends(get_token_claims)):
+    """[POST] /items/batch (async)
+
+    OAuth protected 'application/json' request retrieving up to 1000 items
+    at once: the token is verified once and the items are looked up in a
+    single pass. IDs not found are listed in `missing` _(in the order they
+    were requested)_ instead of failing the whole batch.
+    """
+    # pylint: disable=unused-argument
+    found, missing = [], []
+    for item_id, item in zip(batch.ids, request.app.items.get_many(batch.ids)):
+        if item is None:
+            missing.append(item_id)
+        else:
+            found.append(item.as_dict())
+    started = perf_counter()
+    response = JSONResponse(status_code=status.HTTP_200_OK, content={"items": found, "missing": missing})
+    _metrics.observe("serialization", perf_counter() - started)
+    return response
+
+
+@app.get("/items/export",
+         tags=["items"],
+         response_class=StreamingResponse,
+         responses={
+            status.HTTP_200_OK: {
+                "description": "One item per line _(NDJSON)_, in ascending order of `item_id`",
+                "content": {
+                    "application/x-ndjson": {
+                        "example": '{"item_id":1,"name":"kapibara","description":null,"version":1}',
+                    },
+                },
+            },
+            status.HTTP_401_UNAUTHORIZED: {
+                "model": Msgbara,
+                "description": "Unauthorized",
+                "content": {
+                    "application/json": {
+                        "example": {"msg": "Not Authenticated"},
+                    },
+                },
+            },
+            status.HTTP_403_FORBIDDEN: {
+                "model": Msgbara,
+                "description": "Forbidden",
+                "content": {
+                    "application/json": {
+                        "example": {"msg": "Forbidden"},
+                    },
+                },
+            },
+         }
+)
+async def get_items_export(request: Request, q: Optional[str] = None, cursor: Optional[int] = None,
+                           claims: Dict = Depends(get_token_claims)):
+    """[GET] /items/export (async)
+
+    OAuth protected 'application/x-ndjson' request streaming all the items,
+    one JSON object per line in ascending order of `item_id`, optionally only
+    those with `q` in their name or description. Items are read and sent a
+    chunk at a time, as fast as the client reads them, so memory does not
+    grow with the number of items. To resume an interrupted export, pass the
+    `item_id` of the last complete line received as `cursor`.
+    """
+    # pylint: disable=unused-argument
+    return StreamingResponse(_export_items(request.app.items, q, cursor),
+                             media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-store"})
+
+
 @app.get("/items/{item_id}",
          tags=["items"],
          response_class=JSONResponse,
          responses={
+            status.HTTP_304_NOT_MODIFIED: {
+                "description": "Not Modified _(the `If-None-Match` header matches the item `ETag`)_",
+            },
             status.HTTP_401_UNAUTHORIZED: {
                 "model": Msgbara,
                 "description": "Unauthorized",
@@ -673,14 +2368,43 @@ async def post_token(request: Request, form_data: OAuth2PasswordRequestFormStric
                     },
                 },
             },
+            status.HTTP_404_NOT_FOUND: {
+                "model": Msgbara,
+                "description": "Not Found",
+                "content": {
+                    "application/json": {
+                        "example": {"msg": "Item not found"},
+                    },
+                },
+            },
          }
 )
-async def get_item(item_id: int, q: Optional[str] = None,
-                   token: str = Depends(oauth2_scheme)):
+async def get_item(request: Request, item_id: int, q: Optional[str] = None,
+                   if_none_match: Optional[str] = Header(None),
+                   claims: Dict = Depends(get_token_claims)):
     """[GET] /items/{item_id} (async)
 
-    Simple OAuth protected 'application/json' request with option param
+    Simple OAuth protected 'application/json' request with option param.
+    The `ETag` of an item depends on its version and on the generation of
+    the repository _(any write changes it)_, not on its content: when it
+    matches `If-None-Match` nothing is serialized and `304 Not Modified`
+    is returned.
     """
     # pylint: disable=unused-argument
-    return JSONResponse(status_code=status.HTTP_200_OK,
-                        content={"item_id": item_id, "q": q})
+    generation = request.app.items.generation
+    item = request.app.items.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    etag = _item_etag(item_id, item.version, generation, q)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    started = perf_counter()
+    response = JSONResponse(status_code=status.HTTP_200_OK,
+                            content={**item.as_dict(), "q": q},
+                            headers={"ETag": etag})
+    _metrics.observe("serialization", perf_counter() - started)
+    return response
+
+
+# Metrics of the routes declared above _(before any worker is forked)_
+_metrics.add_routes([route.path for route in app.routes])
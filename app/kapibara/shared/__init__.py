@@ -5,5 +5,19 @@
 """
 
 __all__ = (
+    "cache",
+    "conditional",
+    "credentials",
+    "httpcache",
+    "items",
+    "logqueue",
+    "loopmonitor",
+    "metrics",
+    "pool",
+    "profiling",
+    "ratelimit",
+    "responses",
+    "supervisor",
     "useful",
+    "watcher",
 )
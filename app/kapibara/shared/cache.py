@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Bounded in-memory caches.
+
+"""
+
+from collections import OrderedDict
+from hashlib import blake2b
+from os import urandom as os_urandom
+from threading import Lock
+from time import monotonic
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+)
+
+__all__ = (
+    "CredentialCache",
+    "LRUCache",
+)
+
+
+class LRUCache:
+    """Dictionary-like cache bounded in size with LRU and TTL eviction.
+
+    Every entry can expire after ``ttl`` seconds from its insertion or at an
+    explicit point in time _(measured with ``clock``)_. When the cache is full
+    the least recently used entry is evicted to make room for the new one.
+    Entries can also be given a weight _(e.g. their size in bytes)_: the least
+    recently used entries are evicted as well while the total weight exceeds
+    ``maxweight``.
+
+    :param maxsize: Maximum number of entries _(`0` disables the cache)_
+        defaults to `1024`
+    :type maxsize: int, optional
+    :param ttl: Default time to live of the entries in seconds _(`None` means forever)_
+        defaults to `None`
+    :type ttl: float, optional
+    :param clock: Function returning the current time in seconds
+        defaults to `time.monotonic`
+    :type clock: Callable, optional
+    :param maxweight: Maximum total weight of the entries _(`None` means unbounded)_
+        defaults to `None`
+    :type maxweight: int, optional
+
+    """
+    __slots__ = {
+        "__clock",
+        "__data",
+        "__lock",
+        "__stats",
+        "__weight",
+        "maxsize",
+        "maxweight",
+        "ttl",
+    }
+
+    def __init__(self, maxsize: Optional[int] = 1024,
+                 ttl: Optional[float] = None,
+                 clock: Optional[Callable[[], float]] = monotonic,
+                 maxweight: Optional[int] = None):
+        """Constructor method
+
+        """
+        if maxsize < 0:
+            raise ValueError("Cache size must not be negative")
+        if maxweight is not None and maxweight < 0:
+            raise ValueError("Cache weight must not be negative")
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.ttl = ttl
+        self.__clock = clock
+        self.__data = OrderedDict()
+        self.__lock = Lock()
+        self.__weight = 0
+        self.__stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.__lock:
+            entry = self.__data.get(key)
+            return entry is not None and (entry[0] is None or entry[0] > self.__clock())
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    @property
+    def stats(self) -> Dict:
+        """
+        Counters describing the cache efficiency.
+
+        :getter: Returns a snapshot of the cache counters
+        :type: dict
+        """
+        with self.__lock:
+            return {
+                "size": len(self.__data),
+                "maxsize": self.maxsize,
+                "weight": self.__weight,
+                "maxweight": self.maxweight,
+                **self.__stats,
+            }
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get the value cached for ``key`` marking it as recently used.
+
+        :param key: key of the entry
+        :type key: Hashable
+        :param default: value returned when there is no valid entry
+        :type default: Any
+
+        :return: The cached value or ``default``
+        :rtype: Any
+        """
+        with self.__lock:
+            entry = self.__data.get(key)
+            if entry is None:
+                self.__stats["misses"] += 1
+                return default
+            if entry[0] is not None and entry[0] <= self.__clock():
+                del self.__data[key]
+                self.__weight -= entry[2]
+                self.__stats["expirations"] += 1
+                self.__stats["misses"] += 1
+                return default
+            self.__data.move_to_end(key)
+            self.__stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any,
+            ttl: Optional[float] = None, expires_at: Optional[float] = None,
+            weight: Optional[int] = 0):
+        """Cache ``value`` for ``key``.
+
+        Values weighing more than ``maxweight`` on their own are not cached.
+
+        :param key: key of the entry
+        :type key: Hashable
+        :param value: value to cache
+        :type value: Any
+        :param ttl: time to live in seconds overriding the default one
+        :type ttl: float, optional
+        :param expires_at: point in time _(according to the cache clock)_ the entry expires at,
+            it takes precedence over ``ttl``
+        :type expires_at: float, optional
+        :param weight: weight of the entry
+        :type weight: int, optional
+        """
+        if not self.maxsize or (self.maxweight is not None and weight > self.maxweight):
+            return
+        if expires_at is None:
+            ttl = self.ttl if ttl is None else ttl
+            expires_at = None if ttl is None else self.__clock() + ttl
+        with self.__lock:
+            previous = self.__data.pop(key, None)
+            if previous is not None:
+                self.__weight -= previous[2]
+            self.__data[key] = (expires_at, value, weight)
+            self.__weight += weight
+            while len(self.__data) > self.maxsize \
+                    or (self.maxweight is not None and self.__weight > self.maxweight):
+                self.__weight -= self.__data.popitem(last=False)[1][2]
+                self.__stats["evictions"] += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove the entry for ``key`` returning its value.
+
+        :param key: key of the entry
+        :type key: Hashable
+        :param default: value returned when there is no entry
+        :type default: Any
+
+        :return: The removed value or ``default``
+        :rtype: Any
+        """
+        with self.__lock:
+            entry = self.__data.pop(key, None)
+            if entry is not None:
+                self.__weight -= entry[2]
+        return default if entry is None else entry[1]
+
+    def pop_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries whose key satisfies ``predicate``.
+
+        :param predicate: function receiving a key and returning whether to remove it
+        :type predicate: Callable
+
+        :return: Number of removed entries
+        :rtype: int
+        """
+        with self.__lock:
+            keys = [k for k in self.__data if predicate(k)]
+            for k in keys:
+                self.__weight -= self.__data.pop(k)[2]
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries.
+
+        """
+        with self.__lock:
+            self.__data.clear()
+            self.__weight = 0
+
+
+class CredentialCache:
+    """Cache of recently verified credentials.
+
+    A successful (and expensive) password verification is remembered under
+    the username and a keyed ``blake2b`` digest of the password: plain-text
+    passwords are never stored and the digest key is random and lives in
+    memory only. Every entry also remembers the hash the password was verified
+    against, so that it is ignored _(and dropped)_ as soon as the stored hash
+    of the user changes.
+
+    :param maxsize: Maximum number of remembered credentials
+        defaults to `1024`
+    :type maxsize: int, optional
+    :param ttl: Seconds a verification is trusted for
+        defaults to `300`
+    :type ttl: float, optional
+
+    """
+    __slots__ = {
+        "__cache",
+        "__key",
+        "__lock",
+        "__stats",
+    }
+
+    def __init__(self, maxsize: Optional[int] = 1024, ttl: Optional[float] = 300.0):
+        """Constructor method
+
+        """
+        self.__cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.__key = os_urandom(blake2b.MAX_KEY_SIZE)
+        self.__lock = Lock()
+        self.__stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.__cache)
+
+    @property
+    def stats(self) -> Dict:
+        """
+        Counters describing the cache efficiency.
+
+        ``saved_seconds`` adds up, for every hit, the time the original
+        verification of the same credentials took.
+
+        :getter: Returns a snapshot of the cache counters
+        :type: dict
+        """
+        cache_stats = self.__cache.stats
+        with self.__lock:
+            return {
+                "size": cache_stats["size"],
+                "maxsize": cache_stats["maxsize"],
+                "evictions": cache_stats["evictions"],
+                "expirations": cache_stats["expirations"],
+                **self.__stats,
+            }
+
+    def __cache_key(self, username: str, password: str) -> tuple:
+        return username, blake2b(password.encode("utf-8"), key=self.__key).digest()
+
+    def check(self, username: str, password: str, hashed_password: str) -> bool:
+        """Whether the credentials were recently verified against ``hashed_password``.
+
+        :param username: user ID
+        :type username: str
+        :param password: password in plain-text
+        :type password: str
+        :param hashed_password: currently stored hash of the user password
+        :type hashed_password: str
+
+        :return: True/False
+        :rtype: bool
+        """
+        key = self.__cache_key(username, password)
+        entry = self.__cache.get(key)
+        if entry is not None and entry[0] != hashed_password:
+            self.__cache.pop(key)
+            with self.__lock:
+                self.__stats["invalidations"] += 1
+            entry = None
+        with self.__lock:
+            if entry is None:
+                self.__stats["misses"] += 1
+                return False
+            self.__stats["hits"] += 1
+            self.__stats["saved_seconds"] += entry[1]
+        return True
+
+    def add(self, username: str, password: str, hashed_password: str, cost: Optional[float] = 0.0):
+        """Remember credentials successfully verified against ``hashed_password``.
+
+        :param username: user ID
+        :type username: str
+        :param password: password in plain-text
+        :type password: str
+        :param hashed_password: hash the password was verified against
+        :type hashed_password: str
+        :param cost: seconds the verification took
+        :type cost: float, optional
+        """
+        self.__cache.set(self.__cache_key(username, password), (hashed_password, cost))
+
+    def invalidate(self, username: Optional[str] = None) -> int:
+        """Forget the credentials of ``username`` _(or of everybody)_.
+
+        :param username: user ID _(`None` for all users)_
+        :type username: str, optional
+
+        :return: Number of forgotten entries
+        :rtype: int
+        """
+        if username is None:
+            removed = len(self.__cache)
+            self.__cache.clear()
+        else:
+            removed = self.__cache.pop_if(lambda k: k[0] == username)
+        with self.__lock:
+            self.__stats["invalidations"] += removed
+        return removed
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Conditional GET requests: entity tags and ``If-None-Match``.
+
+"""
+
+from hashlib import blake2b
+from typing import (
+    Dict,
+    Optional,
+)
+
+__all__ = (
+    "ConditionalGetMiddleware",
+    "etag_matches",
+    "make_etag",
+)
+
+
+def make_etag(body: bytes) -> str:
+    """Strong entity tag of a response body.
+
+    :param body: encoded body of the response
+    :type body: bytes
+
+    :return: The quoted entity tag
+    :rtype: str
+    """
+    return f'"{blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches an entity tag.
+
+    Tags are compared with the weak comparison function _(``W/`` prefixes
+    are ignored)_, as required for ``If-None-Match``.
+
+    :param if_none_match: value of the ``If-None-Match`` header
+    :type if_none_match: str, optional
+    :param etag: entity tag of the current representation
+    :type etag: str
+
+    :return: True/False
+    :rtype: bool
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == etag:
+            return True
+    return False
+
+
+class ConditionalGetMiddleware:     # pylint: disable=too-few-public-methods
+    """ASGI middleware answering conditional GET requests of static routes.
+
+    ``etags`` maps the paths of routes whose content never changes to the
+    entity tag of their content _(it can be filled after the middleware is
+    created, e.g. on startup)_. A GET request of one of those paths with a
+    matching ``If-None-Match`` header is answered ``304 Not Modified`` right
+    away, without running the app at all; any other response of those paths
+    carries the ``ETag`` header.
+
+    :param app: ASGI app to wrap
+    :type app: ASGI app
+    :param etags: entity tags by path
+    :type etags: Dict[str, str]
+
+    """
+    __slots__ = {
+        "app",
+        "etags",
+    }
+
+    def __init__(self, app, etags: Dict[str, str]):
+        """Constructor method
+
+        """
+        self.app = app
+        self.etags = etags
+
+    async def __call__(self, scope, receive, send):
+        etag = self.etags.get(scope["path"]) \
+            if scope["type"] == "http" and scope["method"] == "GET" else None
+        if etag is None:
+            await self.app(scope, receive, send)
+            return
+        raw_etag = etag.encode("latin-1")
+        for name, value in scope["headers"]:
+            if name == b"if-none-match" and etag_matches(value.decode("latin-1"), etag):
+                await send({"type": "http.response.start", "status": 304,
+                            "headers": [(b"etag", raw_etag)]})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message["headers"] = [*message.get("headers", ()), (b"etag", raw_etag)]
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Credential store backed by a file of precomputed password hashes.
+
+"""
+
+from mmap import (
+    mmap,
+    ACCESS_READ,
+)
+from os import (
+    getpid as os_getpid,
+    replace as os_replace,
+    stat as os_stat,
+)
+from threading import Lock
+from time import monotonic
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+)
+
+__all__ = (
+    "CredentialStore",
+)
+
+
+class CredentialStore:
+    """Store of users and their precomputed password hashes.
+
+    The backing file holds one ``username:hash`` pair per line _(the same
+    layout of an ``htpasswd`` file)_, empty lines and lines starting with
+    ``#`` are ignored. When a username appears more than once, only its
+    first line counts _(for lookups as for :py:meth:`update`)_. Nothing is hashed: hashes are expected to be already
+    computed _(e.g. with ``passlib``)_.
+
+    The file is memory mapped and indexed on the first lookup: the index maps
+    every username to the offset of its hash inside the mapping, so lookups
+    are O(1) while the hashes themselves stay in the (shared) page cache
+    instead of the process heap. At most once every ``check_interval``
+    seconds a lookup checks whether the file changed and, if so, maps and
+    indexes it again. Update the file replacing it atomically _(write a new
+    file and rename it over the old one)_ rather than editing it in place,
+    as :py:meth:`update` does.
+
+    :param path: Path to the file with the credentials
+    :type path: str
+    :param check_interval: Seconds between checks for changes of the file
+        _(`0` checks at every lookup, `None` never checks)_
+        defaults to `1.0`
+    :type check_interval: float, optional
+
+    """
+    __slots__ = {
+        "__checked_at",
+        "__lock",
+        "__signature",
+        "__state",
+        "check_interval",
+        "path",
+    }
+
+    def __init__(self, path: str, check_interval: Optional[float] = 1.0):
+        """Constructor method
+
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.__checked_at = 0.0
+        self.__lock = Lock()
+        self.__signature = None
+        self.__state = None
+
+    def __contains__(self, username: str) -> bool:
+        return username in self.__get_state()[0]
+
+    def __len__(self) -> int:
+        return len(self.__get_state()[0])
+
+    def __file_signature(self) -> Tuple[int, int, int]:
+        info = os_stat(self.path)
+        return info.st_ino, info.st_size, info.st_mtime_ns
+
+    def __load(self):
+        """Map and index the file _(to be called holding the lock)_.
+
+        The previous mapping is not closed explicitly: lookups running
+        concurrently may still be reading it and it is released as soon
+        as the last of them drops its reference.
+
+        """
+        self.__signature = self.__file_signature()
+        index = {}
+        data = b""
+        with open(self.path, "rb") as file:
+            if self.__signature[1]:
+                data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        pos, size = 0, len(data)
+        while pos < size:
+            eol = data.find(b"\n", pos)
+            if eol < 0:
+                eol = size
+            if data[pos:pos + 1] != b"#":
+                sep = data.find(b":", pos, eol)
+                if sep > pos:
+                    index.setdefault(data[pos:sep].decode("utf-8").strip(), sep + 1)
+            pos = eol + 1
+        self.__state = (index, data)
+        self.__checked_at = monotonic()
+
+    def __is_check_due(self) -> bool:
+        return self.check_interval is not None and monotonic() - self.__checked_at >= self.check_interval
+
+    def __get_state(self) -> Tuple[Dict[str, int], bytes]:
+        state = self.__state
+        if state is None or self.__is_check_due():
+            with self.__lock:
+                if self.__state is None:
+                    self.__load()
+                elif self.__is_check_due():
+                    self.__checked_at = monotonic()
+                    if self.__file_signature() != self.__signature:
+                        self.__load()
+                state = self.__state
+        return state
+
+    def get(self, username: str) -> Optional[str]:
+        """Get the password hash of ``username``.
+
+        :param username: user ID
+        :type username: str
+
+        :return: The password hash or `None` when the user does not exist
+        :rtype: str, optional
+        """
+        index, data = self.__get_state()
+        offset = index.get(username)
+        if offset is None:
+            return None
+        eol = data.find(b"\n", offset)
+        return data[offset:eol if eol >= 0 else len(data)].decode("ascii").strip()
+
+    def update(self, username: str, hashed_password: str):
+        """Replace the password hash of an existing user.
+
+        A copy of the file with the new hash is written next to it and
+        renamed over it, then mapped and indexed again. Concurrent updates
+        from different processes may overwrite each other's changes.
+
+        :param username: user ID
+        :type username: str
+        :param hashed_password: new password hash
+        :type hashed_password: str
+
+        :raises KeyError: when the user does not exist
+        :raises OSError: when the file cannot be replaced
+        """
+        with self.__lock:
+            with open(self.path, "rb") as file:
+                lines = file.read().split(b"\n")
+            prefix = username.encode("utf-8")
+            for number, line in enumerate(lines):
+                name, sep, _ = line.partition(b":")
+                if sep and not line.startswith(b"#") and name.strip() == prefix:
+                    lines[number] = name + b":" + hashed_password.encode("ascii")
+                    break
+            else:
+                raise KeyError(username)
+            staged = f"{self.path}.{os_getpid()}.tmp"
+            with open(staged, "wb") as file:
+                file.write(b"\n".join(lines))
+            os_replace(staged, self.path)
+            self.__load()
+
+    def reload(self):
+        """Map and index the file again right away.
+
+        """
+        with self.__lock:
+            self.__load()
+
+    def close(self):
+        """Release the memory mapping _(it is mapped again on the next lookup)_.
+
+        Like in :py:meth:`__load`, the mapping is not closed explicitly but
+        dropped: it is unmapped once the lookups still reading it are done.
+
+        """
+        with self.__lock:
+            self.__state = None
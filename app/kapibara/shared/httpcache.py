@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""In-process cache of HTTP responses scoped to the authenticated principal.
+
+"""
+
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+)
+from urllib.parse import (
+    parse_qsl,
+    urlencode,
+)
+
+from starlette.routing import compile_path
+
+from .cache import LRUCache
+from .conditional import etag_matches
+
+__all__ = (
+    "ResponseCache",
+    "ResponseCacheMiddleware",
+)
+
+
+def _normalize_query(query_string: bytes) -> str:
+    """Query string with its parameters sorted _(and their encoding normalized)_.
+
+    """
+    if not query_string:
+        return ""
+    return urlencode(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+
+
+class ResponseCache:
+    """Successful responses of selected routes, cached per authenticated principal.
+
+    Routes are turned on one by one with :py:meth:`add_route`. Responses are
+    cached under their path, their normalized query string, the principal
+    returned by ``principal`` for the request and the generation of the data
+    of the route _(when it has one)_: requests for which the principal is
+    `None` _(e.g. not authenticated)_ are neither cached nor served from the
+    cache, and responses cached at another generation are never served again. Entries are evicted when they expire, when there are more than
+    ``size`` of them or when their bodies and headers add up to more than
+    ``memory`` bytes _(least recently used first)_.
+
+    :param principal: Function returning the principal of a request from its ASGI scope
+    :type principal: Callable[[Dict], Optional[Hashable]]
+    :param size: Maximum number of cached responses _(`0` disables the cache)_
+        defaults to `0`
+    :type size: int, optional
+    :param memory: Maximum number of bytes of the cached responses
+        defaults to `16 MiB`
+    :type memory: int, optional
+    :param ttl: Seconds a response is cached for
+        defaults to `30`
+    :type ttl: float, optional
+
+    """
+    __slots__ = {
+        "__cache",
+        "__routes",
+        "principal",
+    }
+
+    def __init__(self, principal: Callable[[Dict], Optional[Hashable]],
+                 size: Optional[int] = 0,
+                 memory: Optional[int] = 16 * 1024 * 1024,
+                 ttl: Optional[float] = 30.0):
+        """Constructor method
+
+        """
+        self.principal = principal
+        self.__routes = []
+        self.__cache = LRUCache(maxsize=size, ttl=ttl, maxweight=memory)
+
+    @property
+    def stats(self) -> Dict:
+        """
+        Counters describing the cache efficiency.
+
+        :getter: Returns a snapshot of the cache counters _(see :py:class:`LRUCache`)_
+        :type: dict
+        """
+        return self.__cache.stats
+
+    def configure(self, size: Optional[int] = 0,
+                  memory: Optional[int] = 16 * 1024 * 1024,
+                  ttl: Optional[float] = 30.0):
+        """Resize the cache _(dropping all cached responses)_.
+
+        :param size: Maximum number of cached responses _(`0` disables the cache)_
+        :type size: int, optional
+        :param memory: Maximum number of bytes of the cached responses
+        :type memory: int, optional
+        :param ttl: Seconds a response is cached for
+        :type ttl: float, optional
+        """
+        self.__cache = LRUCache(maxsize=size, ttl=ttl, maxweight=memory)
+
+    def add_route(self, path: str, generation: Optional[Callable[[], Hashable]] = None):
+        """Turn caching on for a route.
+
+        :param path: path of the route, as declared to the app _(e.g. ``/items/{item_id}``)_
+        :type path: str
+        :param generation: Function returning the current generation of the data the route serves
+            _(e.g. :py:attr:`ItemRepository.generation`)_, so that changes to it are never served stale
+            defaults to `None` _(responses change only when they expire)_
+        :type generation: Callable[[], Hashable], optional
+        """
+        self.__routes.append((compile_path(path)[0], generation))
+
+    def key(self, scope: Dict) -> Optional[Tuple]:
+        """Key of the response to a request.
+
+        :param scope: ASGI scope of the request
+        :type scope: Dict
+
+        :return: The key or `None` when the response must not be cached
+        :rtype: Tuple, optional
+        """
+        if not self.__cache.maxsize or scope["type"] != "http" or scope["method"] != "GET":
+            return None
+        path = scope["path"]
+        route = next((route for route in self.__routes if route[0].match(path)), None)
+        if route is None:
+            return None
+        principal = self.principal(scope)
+        if principal is None:
+            return None
+        return (path, _normalize_query(scope.get("query_string", b"")), principal,
+                route[1]() if route[1] is not None else None)
+
+    def get(self, key: Tuple) -> Optional[Tuple[int, list, bytes]]:
+        """Get a cached response.
+
+        :param key: key of the response _(see :py:meth:`key`)_
+        :type key: Tuple
+
+        :return: Status, raw headers and body of the response or `None`
+        :rtype: Tuple[int, list, bytes], optional
+        """
+        return self.__cache.get(key)
+
+    def set(self, key: Tuple, status_code: int, raw_headers: list, body: bytes):
+        """Cache a response.
+
+        :param key: key of the response _(see :py:meth:`key`)_
+        :type key: Tuple
+        :param status_code: HTTP status code
+        :type status_code: int
+        :param raw_headers: encoded headers
+        :type raw_headers: list
+        :param body: encoded body
+        :type body: bytes
+        """
+        weight = len(body) + sum(len(n) + len(v) for n, v in raw_headers)
+        self.__cache.set(key, (status_code, raw_headers, body), weight=weight)
+
+    def invalidate(self, path: Optional[str] = None, principal: Optional[Hashable] = None) -> int:
+        """Drop cached responses, e.g. when the resource they represent changes.
+
+        :param path: drop only the responses of this path _(any query string)_
+        :type path: str, optional
+        :param principal: drop only the responses cached for this principal
+        :type principal: Hashable, optional
+
+        :return: Number of dropped responses
+        :rtype: int
+        """
+        return self.__cache.pop_if(lambda k: (path is None or k[0] == path)
+                                   and (principal is None or k[2] == principal))
+
+
+class ResponseCacheMiddleware:  # pylint: disable=too-few-public-methods
+    """ASGI middleware serving responses from a :py:class:`ResponseCache`.
+
+    Hits are sent right away: the app _(dependencies and endpoint included)_
+    does not run at all. A hit whose ``ETag`` matches the ``If-None-Match``
+    header of the request is answered ``304 Not Modified``. Misses run the
+    app and cache its response when it is a complete ``200 OK`` not marked
+    ``no-store`` and not setting cookies.
+
+    :param app: ASGI app to wrap
+    :type app: ASGI app
+    :param cache: cache of the responses
+    :type cache: ResponseCache
+
+    """
+    __slots__ = {
+        "app",
+        "cache",
+    }
+
+    def __init__(self, app, cache: ResponseCache):
+        """Constructor method
+
+        """
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        key = self.cache.key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        cached = self.cache.get(key)
+        if cached is not None:
+            await self.__send_cached(scope, send, *cached)
+            return
+        start, chunks = {}, []
+
+        async def send_and_collect(message):
+            if message["type"] == "http.response.start":
+                if self.__cacheable(message):
+                    start.update(message)   # bodies of responses not cacheable are not collected at all
+            elif message["type"] == "http.response.body" and start:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    self.cache.set(key, start["status"], list(start.get("headers", ())), b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_and_collect)
+
+    @staticmethod
+    def __cacheable(start: Dict) -> bool:
+        if start["status"] != 200:
+            return False
+        for name, value in start.get("headers", ()):
+            if name == b"set-cookie" or (name == b"cache-control" and b"no-store" in value.lower()):
+                return False
+        return True
+
+    @staticmethod
+    async def __send_cached(scope, send, status_code: int, raw_headers: list, body: bytes):
+        etag = next((v for n, v in raw_headers if n == b"etag"), None)
+        if etag is not None:
+            for name, value in scope["headers"]:
+                if name == b"if-none-match" and etag_matches(value.decode("latin-1"), etag.decode("latin-1")):
+                    await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", etag)]})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+        await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
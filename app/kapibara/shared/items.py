@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Item repository and its default storage engine.
+
+"""
+
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from array import array
+from bisect import bisect_right
+from heapq import merge as heapq_merge
+from json import loads as json_loads
+from mmap import (
+    mmap,
+    ACCESS_READ,
+)
+from os import (
+    getpid as os_getpid,
+    path as os_path,
+    replace as os_replace,
+)
+from struct import (
+    calcsize,
+    pack,
+    unpack_from,
+)
+from threading import Lock
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+__all__ = (
+    "Item",
+    "ItemRepository",
+    "ItemStore",
+)
+
+
+# Layout of an item file (little endian, every section 8-byte aligned):
+#   header:  magic, number of items, number of slots of the hash table
+#   ids:     int64[items], sorted
+#   offsets: uint64[items + 1], where every record starts in the data section
+#   table:   int64[slots], open addressing (linear probing), position of an item + 1 (0 is empty)
+#   data:    records, name length (uint32), whether there is a description (uint8),
+#            name and description (utf-8), versions being in the record header too
+_MAGIC_ = b"KPBITEM1"
+_HEADER_ = "<8sQQ"
+_RECORD_ = "<QIB"
+
+
+def _slot(item_id: int, mask: int) -> int:
+    """First slot of an item ID in a hash table of ``mask + 1`` slots _(Fibonacci hashing)_.
+
+    """
+    return ((item_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32 & mask
+
+
+class Item:
+    """An item, as stored.
+
+    :param item_id: item ID
+    :type item_id: int
+    :param name: name of the item
+    :type name: str
+    :param description: description of the item
+        defaults to `None`
+    :type description: str, optional
+    :param version: version of the item _(to be increased at every change)_
+        defaults to `1`
+    :type version: int, optional
+
+    """
+    __slots__ = {
+        "description",
+        "item_id",
+        "name",
+        "version",
+    }
+
+    def __init__(self, item_id: int, name: str, description: Optional[str] = None,
+                 version: Optional[int] = 1):
+        """Constructor method
+
+        """
+        self.item_id = item_id
+        self.name = name
+        self.description = description
+        self.version = version
+
+    def __repr__(self) -> str:
+        return f"Item({self.item_id!r}, {self.name!r}, {self.description!r}, {self.version!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Item):
+            return NotImplemented
+        return (self.item_id, self.name, self.description, self.version) == \
+            (other.item_id, other.name, other.description, other.version)
+
+    def as_dict(self) -> Dict:
+        """The item as a dictionary _(ready to be serialized)_.
+
+        :return: Item ID, name, description and version
+        :rtype: Dict
+        """
+        return {
+            "item_id": self.item_id,
+            "name": self.name,
+            "description": self.description,
+            "version": self.version,
+        }
+
+
+class ItemRepository(ABC):
+    """Interface of the item storage engines.
+
+    """
+    __slots__ = ()
+
+    def __contains__(self, item_id: int) -> bool:
+        return self.get(item_id) is not None
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def generation(self) -> int:
+        """
+        Number of changes made to the items so far.
+
+        It grows at every item added, replaced or removed _(and whenever
+        they may have changed otherwise)_: what was derived from the items
+        at another generation _(cached responses, entity tags)_ is stale.
+        It grows once a change is visible, so it has to be read before the
+        items it is paired with.
+
+        :getter: Returns the generation
+        :type: int
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, item_id: int) -> Optional[Item]:
+        """Get an item.
+
+        :param item_id: item ID
+        :type item_id: int
+
+        :return: The item or `None` when it does not exist
+        :rtype: Item, optional
+        """
+        raise NotImplementedError
+
+    def get_many(self, item_ids: Sequence[int]) -> List[Optional[Item]]:
+        """Get several items at once.
+
+        :param item_ids: item IDs
+        :type item_ids: Sequence[int]
+
+        :return: The items, in the same order of their IDs _(`None` for those that do not exist)_
+        :rtype: List[Optional[Item]]
+        """
+        return [self.get(item_id) for item_id in item_ids]
+
+    @abstractmethod
+    def put(self, item: Item) -> Item:
+        """Add an item, or replace the one with the same ID.
+
+        :param item: the item
+        :type item: Item
+
+        :return: The stored item
+        :rtype: Item
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, item_id: int) -> bool:
+        """Remove an item.
+
+        :param item_id: item ID
+        :type item_id: int
+
+        :return: Whether the item existed
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def ids(self, after: Optional[int] = None) -> Iterator[int]:
+        """IDs of the items, in ascending order.
+
+        :param after: only IDs greater than this one
+            defaults to `None` _(all of them)_
+        :type after: int, optional
+
+        :return: The IDs
+        :rtype: Iterator[int]
+        """
+        raise NotImplementedError
+
+    def items(self, after: Optional[int] = None) -> Iterator[Item]:
+        """Items, in ascending order of ID.
+
+        :param after: only items with an ID greater than this one
+            defaults to `None` _(all of them)_
+        :type after: int, optional
+
+        :return: The items _(those removed meanwhile are skipped)_
+        :rtype: Iterator[Item]
+        """
+        for item_id in self.ids(after):
+            item = self.get(item_id)
+            if item is not None:
+                yield item
+
+    def load_ndjson(self, lines: Iterable[str]) -> int:
+        """Add the items of NDJSON lines, one JSON object per line _(the format of ``GET /items/export``)_.
+
+        Every object needs ``item_id`` and ``name``, ``description`` and
+        ``version`` are optional, any other key is ignored. Empty lines are skipped.
+
+        :param lines: the lines _(e.g. an open file)_
+        :type lines: Iterable[str]
+
+        :raises ValueError: when a line is not a valid item
+
+        :return: How many items were added or replaced
+        :rtype: int
+        """
+        count = 0
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                fields = json_loads(line)
+                item = Item(int(fields["item_id"]), str(fields["name"]), fields.get("description"),
+                            int(fields.get("version", 1)))
+            except (ValueError, TypeError, KeyError) as err:
+                raise ValueError(f"Line {number} is not a valid item: {err!r}") from err
+            self.put(item)
+            count += 1
+        return count
+
+
+class ItemStore(ItemRepository):
+    """Items in memory, optionally backed by a file mapped in memory.
+
+    Items added or replaced are kept as :py:class:`Item` objects in a
+    dictionary indexed by ID, so lookups are O(1), next to an array of their
+    IDs sorted on the first ordered scan after they change.
+
+    When ``path`` exists it is memory mapped and nothing is read upfront, so
+    start time does not grow with the number of items, and forked workers
+    share the same pages. The file holds the sorted IDs, a hash table of the
+    IDs _(lookups are O(1) there too)_ and the records, decoded into an
+    :py:class:`Item` at every lookup: changes live in memory, on top of the
+    file, until :py:meth:`save` writes everything to a new file and renames
+    it over the old one.
+
+    :param path: file the items are loaded from and saved to
+        defaults to `None` _(in memory only)_
+    :type path: str, optional
+
+    """
+    __slots__ = {
+        "__added",
+        "__deleted",
+        "__generation",
+        "__ids",
+        "__items",
+        "__lock",
+        "__mapping",
+        "path",
+    }
+
+    def __init__(self, path: Optional[str] = None):
+        """Constructor method
+
+        """
+        self.path = path
+        self.__lock = Lock()
+        self.__items: Dict[int, Item] = {}
+        self.__ids = array("q")
+        self.__added = 0
+        self.__deleted = set()
+        self.__generation = 0
+        self.__mapping = None
+        if path is not None and os_path.isfile(path):
+            self.__map()
+
+    def __map(self):
+        """Map the file _(replacing the current mapping, if any)_.
+
+        The previous mapping is not closed explicitly: scans running
+        concurrently may still be reading it and it is released as soon
+        as the last of them drops its reference.
+
+        """
+        with open(self.path, "rb") as file:
+            data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        magic, count, slots = unpack_from(_HEADER_, data, 0)
+        if magic != _MAGIC_:
+            data.close()
+            raise ValueError(f"'{self.path}' is not an item file")
+        view = memoryview(data)
+        start = calcsize(_HEADER_)
+        ids = view[start:start + 8 * count].cast("q")
+        start += 8 * count
+        offsets = view[start:start + 8 * (count + 1)].cast("Q")
+        start += 8 * (count + 1)
+        table = view[start:start + 8 * slots].cast("q")
+        self.__mapping = (data, view, ids, offsets, table, start + 8 * slots)
+
+    def __mapped_position(self, item_id: int) -> int:
+        mapping = self.__mapping
+        if mapping is None or item_id in self.__deleted:
+            return -1
+        _, _, ids, _, table, _ = mapping
+        mask = len(table) - 1
+        slot = _slot(item_id, mask)
+        while table[slot]:
+            if ids[table[slot] - 1] == item_id:
+                return table[slot] - 1
+            slot = (slot + 1) & mask
+        return -1
+
+    def __mapped_item(self, position: int) -> Item:
+        data, _, ids, offsets, _, base = self.__mapping
+        start = base + offsets[position]
+        version, name_size, has_description = unpack_from(_RECORD_, data, start)
+        start += calcsize(_RECORD_)
+        name = data[start:start + name_size].decode("utf-8")
+        description = data[start + name_size:base + offsets[position + 1]].decode("utf-8") \
+            if has_description else None
+        return Item(ids[position], name, description, version)
+
+    def __len__(self) -> int:
+        mapped = len(self.__mapping[2]) - len(self.__deleted) if self.__mapping is not None else 0
+        return mapped + self.__added
+
+    @property
+    def generation(self) -> int:
+        return self.__generation
+
+    def get(self, item_id: int) -> Optional[Item]:
+        item = self.__items.get(item_id)
+        if item is not None:
+            return item
+        position = self.__mapped_position(item_id)
+        return self.__mapped_item(position) if position >= 0 else None
+
+    def get_many(self, item_ids: Sequence[int]) -> List[Optional[Item]]:
+        items, found = self.__items, []
+        if self.__mapping is None:
+            return [items.get(item_id) for item_id in item_ids]
+        for item_id in item_ids:
+            item = items.get(item_id)
+            if item is None:
+                position = self.__mapped_position(item_id)
+                item = self.__mapped_item(position) if position >= 0 else None
+            found.append(item)
+        return found
+
+    def put(self, item: Item) -> Item:
+        with self.__lock:
+            if item.item_id in self.__deleted:
+                self.__deleted.discard(item.item_id)
+            elif item.item_id not in self.__items and self.__mapped_position(item.item_id) < 0:
+                self.__added += 1
+                self.__ids = None
+            self.__items[item.item_id] = item
+            self.__generation += 1
+        return item
+
+    def delete(self, item_id: int) -> bool:
+        with self.__lock:
+            existed = self.__items.pop(item_id, None) is not None
+            if self.__mapped_position(item_id) >= 0:
+                self.__deleted.add(item_id)
+                self.__generation += 1
+                return True
+            if existed:
+                self.__added -= 1
+                self.__ids = None
+                self.__generation += 1
+            return existed
+
+    def __added_ids(self) -> array:
+        """Sorted IDs of the items not in the file, sorted again after items are added or removed.
+
+        """
+        ids = self.__ids
+        if ids is None:
+            with self.__lock:
+                ids = self.__ids = array("q", sorted(
+                    item_id for item_id in self.__items if self.__mapped_position(item_id) < 0))
+        return ids
+
+    def ids(self, after: Optional[int] = None) -> Iterator[int]:
+        ids = self.__added_ids()
+        added = (ids[position] for position in range(bisect_right(ids, after) if after is not None else 0,
+                                                      len(ids)))
+        mapped = iter(())
+        if self.__mapping is not None:
+            mapped_ids = self.__mapping[2]
+            mapped = (mapped_ids[position] for position in range(
+                bisect_right(mapped_ids, after) if after is not None else 0, len(mapped_ids)))
+        deleted = self.__deleted
+        for item_id in heapq_merge(mapped, added):
+            if item_id not in deleted:
+                yield item_id
+
+    def save(self):
+        """Write all the items to ``path`` and map it.
+
+        A new file is written next to it and renamed over it: processes that
+        mapped the old file keep reading it until they map the new one.
+
+        :raises OSError: when the file cannot be written
+        """
+        if self.path is None:
+            raise ValueError("Items are kept in memory only: there is no file to save them to")
+        ids, offsets, records, size = array("q"), array("Q"), [], 0
+        for item in self.items():
+            name = item.name.encode("utf-8")
+            description = item.description.encode("utf-8") if item.description is not None else b""
+            ids.append(item.item_id)
+            offsets.append(size)
+            records += (pack(_RECORD_, item.version, len(name), item.description is not None), name, description)
+            size += calcsize(_RECORD_) + len(name) + len(description)
+        offsets.append(size)
+        slots = 1
+        while slots < 2 * len(ids):
+            slots *= 2
+        table, mask = array("q", bytes(8 * slots)), slots - 1
+        for position, item_id in enumerate(ids):
+            slot = _slot(item_id, mask)
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = position + 1
+        staged = f"{self.path}.{os_getpid()}.tmp"
+        with open(staged, "wb") as file:
+            file.write(pack(_HEADER_, _MAGIC_, len(ids), slots))
+            file.write(ids.tobytes())
+            file.write(offsets.tobytes())
+            file.write(table.tobytes())
+            file.writelines(records)
+        with self.__lock:
+            os_replace(staged, self.path)
+            self.__items.clear()
+            self.__ids = array("q")
+            self.__added = 0
+            self.__deleted.clear()
+            self.__map()
+            self.__generation += 1
+
+    def close(self):
+        """Release the memory mapping _(items only in the file are forgotten until it is mapped again)_.
+
+        Like in :py:meth:`__map`, the mapping is not closed explicitly but
+        dropped: it is unmapped once the lookups and scans still reading it are done.
+
+        """
+        with self.__lock:
+            self.__mapping = None
+            self.__generation += 1
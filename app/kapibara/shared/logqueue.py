@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Non-blocking logging through a bounded queue and a background writer.
+
+"""
+
+from atexit import register as atexit_register
+from os import register_at_fork
+from logging import (
+    Handler,
+    Logger,
+    LogRecord,
+)
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+)
+from queue import (
+    Empty,
+    Full,
+    Queue,
+)
+from threading import Lock
+from typing import (
+    Optional,
+    Sequence,
+)
+
+__all__ = (
+    "DROP_POLICIES",
+    "DroppingQueueHandler",
+    "QueuedLogging",
+)
+
+
+DROP_POLICIES = ("drop_new", "drop_oldest", "block")
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Handler putting records in a bounded queue without waiting for room.
+
+    When the queue is full, depending on ``policy``, the new record is dropped
+    _(`drop_new`)_, the oldest queued record is dropped to make room for the new
+    one _(`drop_oldest`)_ or the logging thread waits for room _(`block`)_.
+
+    :param queue: Queue shared with the :py:class:`~logging.handlers.QueueListener`
+    :type queue: queue.Queue
+    :param policy: What to do when the queue is full
+        defaults to `"drop_new"`
+    :type policy: str, optional
+
+    """
+
+    def __init__(self, queue: Queue, policy: Optional[str] = "drop_new"):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unsupported drop policy '{policy}' (expected one of {DROP_POLICIES})")
+        super().__init__(queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        """Merge the arguments into the message, leaving any formatting to the listener.
+
+        Records never leave the process, therefore they do not need to be
+        made picklable as :py:meth:`QueueHandler.prepare` does.
+
+        :param record: record to enqueue
+        :type record: LogRecord
+
+        :return: The same record
+        :rtype: LogRecord
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: LogRecord):
+        """Enqueue a record applying the drop policy when the queue is full.
+
+        :param record: record to enqueue
+        :type record: LogRecord
+        """
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except Full:
+            pass
+        if self.policy == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (Empty, Full):
+                pass
+        self.dropped += 1
+
+
+class _BlockingSentinelListener(QueueListener):
+    """QueueListener that waits for room to enqueue its stop sentinel.
+
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class QueuedLogging:
+    """Move formatting and I/O of a logger handlers to a background thread.
+
+    The logger is given a single :py:class:`DroppingQueueHandler`: the logging
+    thread _(e.g. the event loop)_ only enqueues records, while one listener
+    thread formats them and hands them to the actual ``handlers``, honouring
+    their level. Records still queued are flushed when the interpreter exits.
+    Threads do not survive a ``fork``: forked children start a listener of their own.
+
+    :param logger: Logger whose records go through the queue
+    :type logger: Logger
+    :param handlers: Handlers doing the actual formatting and I/O
+    :type handlers: Sequence[Handler]
+    :param queue_size: Maximum number of queued records
+        defaults to `10000`
+    :type queue_size: int, optional
+    :param drop_policy: What to do when the queue is full _(see :py:class:`DroppingQueueHandler`)_
+        defaults to `"drop_new"`
+    :type drop_policy: str, optional
+
+    """
+    __slots__ = {
+        "__dropped",
+        "__handler",
+        "__listener",
+        "__lock",
+        "drop_policy",
+        "handlers",
+        "logger",
+        "queue_size",
+    }
+
+    def __init__(self, logger: Logger, handlers: Sequence[Handler],
+                 queue_size: Optional[int] = 10000, drop_policy: Optional[str] = "drop_new"):
+        """Constructor method
+
+        """
+        self.logger = logger
+        self.handlers = tuple(handlers)
+        self.__dropped = 0
+        self.__handler = None
+        self.__listener = None
+        self.__lock = Lock()
+        self.configure(queue_size=queue_size, drop_policy=drop_policy)
+        atexit_register(self.stop)
+        register_at_fork(after_in_child=self.__restart_in_child)
+
+    def __restart_in_child(self):   #pragma: no cover
+        self.__lock = Lock()
+        if self.__handler is not None:
+            # the thread of the listener is gone: do not wait for it
+            self.__listener = None
+            self.configure(queue_size=self.queue_size, drop_policy=self.drop_policy)
+
+    @property
+    def dropped(self) -> int:
+        """
+        Records dropped because the queue was full.
+
+        :getter: Returns the number of dropped records
+        :type: int
+        """
+        with self.__lock:
+            return self.__dropped + (self.__handler.dropped if self.__handler is not None else 0)
+
+    def configure(self, queue_size: Optional[int] = 10000, drop_policy: Optional[str] = "drop_new"):
+        """(Re)start the pipeline with a new queue size and drop policy.
+
+        Records already queued are written before switching to the new queue.
+
+        :param queue_size: Maximum number of queued records _(`0` means unbounded)_
+        :type queue_size: int, optional
+        :param drop_policy: What to do when the queue is full
+        :type drop_policy: str, optional
+        """
+        handler = DroppingQueueHandler(Queue(maxsize=queue_size), policy=drop_policy)
+        listener = _BlockingSentinelListener(handler.queue, *self.handlers, respect_handler_level=True)
+        listener.start()
+        with self.__lock:
+            self.queue_size, self.drop_policy = queue_size, drop_policy
+            old_handler, old_listener = self.__handler, self.__listener
+            if old_handler is not None:
+                self.logger.removeHandler(old_handler)
+                self.__dropped += old_handler.dropped
+            self.logger.addHandler(handler)
+            self.__handler, self.__listener = handler, listener
+        if old_listener is not None:
+            old_listener.stop()
+
+    def stop(self):
+        """Detach the queue from the logger and wait for the queued records to be written.
+
+        """
+        with self.__lock:
+            handler, listener = self.__handler, self.__listener
+            self.__handler = self.__listener = None
+            if handler is not None:
+                self.logger.removeHandler(handler)
+                self.__dropped += handler.dropped
+        if listener is not None:
+            listener.stop()
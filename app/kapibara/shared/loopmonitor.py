@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Event loop lag monitor detecting blocking calls.
+
+"""
+
+from array import array
+from asyncio import (
+    CancelledError,
+    get_event_loop,
+    sleep as asyncio_sleep,
+)
+from logging import getLogger as l_getLogger
+from sys import _current_frames as sys_current_frames
+from threading import (
+    Event,
+    Thread,
+    get_ident,
+)
+from time import monotonic
+from traceback import format_stack
+from typing import (
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+)
+
+__all__ = (
+    "LoopMonitor",
+)
+
+
+log = l_getLogger(__name__)
+
+
+def _log_block(seconds: float, stack: str):
+    log.warning("Event loop blocked for %.3f s, at:\n%s", seconds, stack)
+
+
+class LoopMonitor:
+    """Measure how late the event loop runs its callbacks and catch what blocks it.
+
+    A heartbeat coroutine sleeps ``interval`` seconds at a time and measures
+    how late it wakes up _(the lag: any callback hogging the loop delays
+    it)_. Lags are passed to ``on_lag`` and kept, the most recent
+    ``samples`` of them, for :py:meth:`percentiles`.
+
+    A watchdog thread notices when the heartbeat is late by more than
+    ``threshold`` seconds while the loop is still blocked, and passes the
+    stack of the loop thread _(pointing right at the blocking code)_ to
+    ``on_block``, once per stall.
+
+    :param interval: seconds between heartbeats
+        defaults to `0.1`
+    :type interval: float, optional
+    :param threshold: lag _(seconds)_ above which the loop is considered blocked
+        defaults to `0.1`
+    :type threshold: float, optional
+    :param samples: number of lags kept for the percentiles
+        defaults to `1024`
+    :type samples: int, optional
+    :param on_lag: called with every measured lag _(seconds)_
+        defaults to `None`
+    :type on_lag: Callable[[float], None], optional
+    :param on_block: called with the lag so far and the formatted stack of a blocked loop
+        defaults to logging a warning
+    :type on_block: Callable[[float, str], None], optional
+
+    """
+    __slots__ = {
+        "__beat",
+        "__count",
+        "__lags",
+        "__loop_thread",
+        "__stop",
+        "__task",
+        "__thread",
+        "interval",
+        "on_block",
+        "on_lag",
+        "threshold",
+    }
+
+    def __init__(self, interval: Optional[float] = 0.1, threshold: Optional[float] = 0.1,
+                 samples: Optional[int] = 1024,
+                 on_lag: Optional[Callable[[float], None]] = None,
+                 on_block: Optional[Callable[[float, str], None]] = _log_block):
+        """Constructor method
+
+        """
+        if interval <= 0 or threshold <= 0 or samples < 1:
+            raise ValueError("Interval, threshold and samples must be greater than 0")
+        self.interval = interval
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self.on_block = on_block
+        self.__lags = array("d", bytes(8 * samples))
+        self.__count = 0
+        self.__beat = monotonic()
+        self.__loop_thread = None
+        self.__stop = Event()
+        self.__task = None
+        self.__thread = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the monitor is running.
+
+        :getter: Returns `True` between :py:meth:`start` and :py:meth:`stop`
+        :type: bool
+        """
+        return self.__task is not None and not self.__task.done()
+
+    def start(self):
+        """Start monitoring the running event loop _(call it from a coroutine)_.
+
+        """
+        if self.running:
+            return
+        self.__loop_thread = get_ident()
+        self.__beat = monotonic()
+        self.__stop.clear()
+        self.__task = get_event_loop().create_task(self.__heartbeat())
+        self.__thread = Thread(target=self.__watchdog, name="loopmonitor", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop monitoring.
+
+        """
+        self.__stop.set()
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def percentiles(self, fractions: Sequence[float] = (0.5, 0.99, 0.999)) -> Dict[float, float]:
+        """Percentiles of the most recent lags.
+
+        :param fractions: percentiles as fractions _(e.g. `0.99`)_
+        :type fractions: Sequence[float]
+
+        :return: The lag _(seconds)_ by percentile _(`0.0` before the first heartbeat)_
+        :rtype: Dict[float, float]
+        """
+        lags = sorted(self.__lags[:min(self.__count, len(self.__lags))])
+        if not lags:
+            return {fraction: 0.0 for fraction in fractions}
+        return {fraction: lags[min(len(lags) - 1, int(fraction * len(lags)))] for fraction in fractions}
+
+    async def __heartbeat(self):
+        loop = get_event_loop()
+        try:
+            while True:
+                expected = loop.time() + self.interval
+                self.__beat = monotonic()
+                await asyncio_sleep(self.interval)
+                lag = max(0.0, loop.time() - expected)
+                self.__lags[self.__count % len(self.__lags)] = lag
+                self.__count += 1
+                if self.on_lag is not None:
+                    self.on_lag(lag)
+        except CancelledError:
+            pass
+
+    def __watchdog(self):
+        reported = None
+        while not self.__stop.wait(self.threshold / 2):
+            beat = self.__beat
+            late = monotonic() - beat - self.interval
+            if late <= self.threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys_current_frames().get(self.__loop_thread)
+            try:
+                self.on_block(late, "".join(format_stack(frame)) if frame is not None else "")
+            except Exception:   # pylint: disable=broad-except
+                log.exception("Reporting a blocked event loop failed")
+            finally:
+                del frame
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Request and operation metrics shared by the workers, in Prometheus text format.
+
+"""
+
+from asyncio import AbstractEventLoop
+from bisect import bisect_left
+from multiprocessing.sharedctypes import RawArray
+from threading import get_ident
+from time import perf_counter
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from starlette.routing import compile_path
+
+__all__ = (
+    "DEFAULT_BUCKETS",
+    "Metrics",
+    "MetricsMiddleware",
+    "PROMETHEUS_CONTENT_TYPE",
+)
+
+
+#: Upper bounds _(seconds)_ of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Paths whose route index is remembered (forgotten all at once when there are more)
+_ROUTE_INDEX_CACHE_SIZE_ = 4096
+
+# Status codes counted one by one, any other one is counted by class (e.g. "4xx")
+_STATUS_CODES_ = (200, 201, 204, 301, 302, 304, 307, 308,
+                  400, 401, 403, 404, 405, 409, 413, 415, 422, 429,
+                  500, 502, 503, 504)
+_STATUS_LABELS_ = (*(str(code) for code in _STATUS_CODES_), "1xx", "2xx", "3xx", "4xx", "5xx", "other")
+
+
+def _build_status_index() -> List[int]:
+    """Index of the label of every status code _(`0` to `599`)_.
+
+    """
+    index = []
+    for code in range(600):
+        if code in _STATUS_CODES_:
+            index.append(_STATUS_CODES_.index(code))
+        elif code >= 100:
+            index.append(len(_STATUS_CODES_) + code // 100 - 1)
+        else:
+            index.append(len(_STATUS_LABELS_) - 1)
+    return index
+
+
+def _label(value: str) -> str:
+    """Escape a label value.
+
+    """
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _le(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Metrics:
+    """Request counts and latency histograms of the routes of an app,
+    and latency histograms of named operations.
+
+    Everything is recorded in fixed-size arrays of shared memory, one
+    slot per worker: a worker only writes to its own slot _(from its event
+    loop, so that no lock is needed)_ and any worker can report the totals
+    of all of them. Arrays must be sized _(:py:meth:`add_routes`,
+    :py:meth:`resize`)_ before the workers are forked; doing it afterwards
+    drops what was recorded.
+
+    Operations timed on other threads _(e.g. a synchronous login run on a
+    thread pool)_ are handed to the event loop given to :py:meth:`attach`,
+    which records them; before a loop is attached they are recorded right
+    away by the caller.
+
+    Counters kept by the components of a worker _(e.g. the ``stats`` of a
+    :py:class:`WorkerPool`)_ can be reported too, with :py:meth:`add_stats`:
+    those are read from the worker answering, when the metrics are rendered.
+
+    :param operations: names of the timed operations
+    :type operations: Sequence[str]
+    :param buckets: upper bounds _(seconds)_ of the histogram buckets
+        defaults to `DEFAULT_BUCKETS`
+    :type buckets: Sequence[float], optional
+    :param slots: number of workers
+        defaults to `1`
+    :type slots: int, optional
+    :param namespace: prefix of the metric names
+        defaults to `"kapibara"`
+    :type namespace: str, optional
+
+    """
+    __slots__ = {
+        "__counts",
+        "__durations",
+        "__loop",
+        "__matchers",
+        "__operation_durations",
+        "__operation_index",
+        "__operation_sums",
+        "__route_indexes",
+        "__stats",
+        "__sums",
+        "__writer",
+        "buckets",
+        "namespace",
+        "operations",
+        "routes",
+        "slot",
+        "slots",
+    }
+
+    _status_index = _build_status_index()
+
+    def __init__(self, operations: Sequence[str] = (),
+                 buckets: Optional[Sequence[float]] = DEFAULT_BUCKETS,
+                 slots: Optional[int] = 1,
+                 namespace: Optional[str] = "kapibara"):
+        """Constructor method
+
+        """
+        if slots < 1:
+            raise ValueError("Metrics need at least one slot")
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        self.operations = tuple(operations)
+        self.__operation_index = {name: i for i, name in enumerate(self.operations)}
+        self.routes: Tuple[str, ...] = ()
+        self.__matchers = []
+        self.__route_indexes = {}
+        self.__stats = []
+        self.__loop = None
+        self.__writer = None
+        self.slot = 0
+        self.slots = slots
+        self.__allocate()
+
+    def __allocate(self):
+        routes, buckets, operations = len(self.routes) + 1, len(self.buckets) + 1, len(self.operations)
+        self.__counts = RawArray("Q", self.slots * routes * len(_STATUS_LABELS_))
+        self.__durations = RawArray("Q", self.slots * routes * buckets)
+        self.__sums = RawArray("d", self.slots * routes)
+        self.__operation_durations = RawArray("Q", max(1, self.slots * operations * buckets))
+        self.__operation_sums = RawArray("d", max(1, self.slots * operations))
+
+    def attach(self, loop: Optional[AbstractEventLoop]):
+        """Record everything from ``loop``, the only writer of the slot of this worker.
+
+        Must be called from the thread running ``loop``.
+
+        :param loop: event loop of the worker _(`None` detaches it, e.g. once it is stopped)_
+        :type loop: AbstractEventLoop, optional
+        """
+        self.__loop = loop
+        self.__writer = get_ident() if loop is not None else None
+
+    def add_routes(self, paths: Sequence[str]):
+        """Record the requests of these routes, in this order.
+
+        Requests not matching any route are recorded as route ``""``.
+
+        :param paths: paths of the routes, as declared to the app _(e.g. ``/items/{item_id}``)_
+        :type paths: Sequence[str]
+        """
+        self.routes = (*self.routes, *paths)
+        self.__matchers = [compile_path(path)[0] for path in self.routes]
+        self.__route_indexes = {}
+        self.__allocate()
+
+    def add_stats(self, name: str, stats: Callable[[], Dict], description: str,
+                  counters: Sequence[str] = ()):
+        """Report the numeric entries of a dictionary of statistics of the worker.
+
+        Every entry becomes the metric ``<namespace>_<name>_<key>``, labelled
+        with the slot of the worker rendering the metrics: a counter when
+        its key is in ``counters`` _(suffixed with ``_total`` when it is not
+        already)_, a gauge otherwise. Entries that are not numbers are skipped.
+
+        :param name: name of the component the statistics belong to _(e.g. ``pool``)_
+        :type name: str
+        :param stats: Function returning the statistics _(an empty dictionary to report nothing)_
+        :type stats: Callable[[], Dict]
+        :param description: what the component is
+        :type description: str
+        :param counters: keys of the entries that only grow
+            defaults to `()`
+        :type counters: Sequence[str], optional
+        """
+        self.__stats.append((name, stats, description, frozenset(counters)))
+
+    def resize(self, slots: int):
+        """Make room for ``slots`` workers.
+
+        :param slots: number of workers
+        :type slots: int
+        """
+        if slots < 1:
+            raise ValueError("Metrics need at least one slot")
+        self.slots = slots
+        self.slot = min(self.slot, slots - 1)
+        self.__allocate()
+
+    def route_index(self, path: str) -> int:
+        """Index of the first route matching a path _(the number of routes when none does)_.
+
+        Indexes of the paths seen recently are remembered, so that the routes
+        are matched once per path rather than once per request.
+        """
+        indexes = self.__route_indexes
+        index = indexes.get(path)
+        if index is None:
+            index = next((index for index, matcher in enumerate(self.__matchers) if matcher.match(path)),
+                         len(self.routes))
+            if len(indexes) >= _ROUTE_INDEX_CACHE_SIZE_:
+                indexes.clear()
+            indexes[path] = index
+        return index
+
+    def observe_request(self, route: int, status_code: int, seconds: float):
+        """Record a request.
+
+        :param route: index of the route _(see :py:meth:`route_index`)_
+        :type route: int
+        :param status_code: HTTP status code of the response
+        :type status_code: int
+        :param seconds: time spent serving the request
+        :type seconds: float
+        """
+        base = self.slot * (len(self.routes) + 1) + route
+        self.__counts[base * len(_STATUS_LABELS_)
+                      + self._status_index[status_code if 0 <= status_code < 600 else 0]] += 1
+        self.__durations[base * (len(self.buckets) + 1) + bisect_left(self.buckets, seconds)] += 1
+        self.__sums[base] += seconds
+
+    def observe(self, operation: str, seconds: float):
+        """Record the duration of an operation.
+
+        :param operation: name of the operation _(unknown ones are ignored)_
+        :type operation: str
+        :param seconds: time spent
+        :type seconds: float
+        """
+        index = self.__operation_index.get(operation)
+        if index is None:
+            return
+        loop = self.__loop
+        if loop is not None and get_ident() != self.__writer:
+            try:
+                loop.call_soon_threadsafe(self.observe, operation, seconds)
+                return
+            except RuntimeError:    # the loop is closed: nothing else writes to the slot anymore
+                pass
+        base = self.slot * len(self.operations) + index
+        self.__operation_durations[base * (len(self.buckets) + 1) + bisect_left(self.buckets, seconds)] += 1
+        self.__operation_sums[base] += seconds
+
+    def requests(self) -> Dict[str, Dict[str, int]]:
+        """Requests served by all the workers.
+
+        :return: Count of requests by route and status code _(zeroes left out)_
+        :rtype: Dict[str, Dict[str, int]]
+        """
+        routes, labels = len(self.routes) + 1, len(_STATUS_LABELS_)
+        counts = {}
+        for route, name in enumerate((*self.routes, "")):
+            for status, label in enumerate(_STATUS_LABELS_):
+                total = sum(self.__counts[(slot * routes + route) * labels + status]
+                            for slot in range(self.slots))
+                if total:
+                    counts.setdefault(name, {})[label] = total
+        return counts
+
+    def __histograms(self, durations, sums, names: Sequence[str]) -> Dict[str, Tuple[List[int], float]]:
+        buckets = len(self.buckets) + 1
+        histograms = {}
+        for index, name in enumerate(names):
+            counts = [sum(durations[(slot * len(names) + index) * buckets + bucket] for slot in range(self.slots))
+                      for bucket in range(buckets)]
+            if any(counts):
+                histograms[name] = (counts, sum(sums[slot * len(names) + index] for slot in range(self.slots)))
+        return histograms
+
+    def request_durations(self) -> Dict[str, Tuple[List[int], float]]:
+        """Latency histograms of the routes, all workers together.
+
+        :return: Count of requests in each bucket _(not cumulative, the last
+            one is ``+Inf``)_ and total seconds by route _(unused routes left out)_
+        :rtype: Dict[str, Tuple[List[int], float]]
+        """
+        return self.__histograms(self.__durations, self.__sums, (*self.routes, ""))
+
+    def operation_durations(self) -> Dict[str, Tuple[List[int], float]]:
+        """Latency histograms of the operations, all workers together.
+
+        :return: Count of operations in each bucket _(not cumulative, the last
+            one is ``+Inf``)_ and total seconds by operation _(unused operations left out)_
+        :rtype: Dict[str, Tuple[List[int], float]]
+        """
+        return self.__histograms(self.__operation_durations, self.__operation_sums, self.operations)
+
+    def render(self) -> str:
+        """Everything recorded, in the Prometheus text exposition format.
+
+        :return: The metrics
+        :rtype: str
+        """
+        name = f"{self.namespace}_http_requests_total"
+        lines = [f"# HELP {name} HTTP requests served, by route and status code.",
+                 f"# TYPE {name} counter"]
+        for route, counts in self.requests().items():
+            for code, count in counts.items():
+                lines.append(f'{name}{{route="{_label(route)}",code="{code}"}} {count}')
+        for name, label, histograms, description in (
+                (f"{self.namespace}_http_request_duration_seconds", "route", self.request_durations(),
+                 "Time spent serving HTTP requests, by route."),
+                (f"{self.namespace}_operation_duration_seconds", "operation", self.operation_durations(),
+                 "Time spent in internal operations, by operation.")):
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+            for key, (counts, total) in histograms.items():
+                labels = f'{label}="{_label(key)}"'
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{_le(bound)}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {total!r}")
+                lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        for component, stats, description, counters in self.__stats:
+            for key, value in stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{self.namespace}_{component}_{key}"
+                if key in counters and not name.endswith("_total"):
+                    name += "_total"
+                lines += [f"# HELP {name} {description}: {key.replace('_', ' ')}.",
+                          f"# TYPE {name} {'counter' if key in counters else 'gauge'}",
+                          f'{name}{{worker="{self.slot}"}} {value!r}']
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:    # pylint: disable=too-few-public-methods
+    """ASGI middleware recording every HTTP request in :py:class:`Metrics`.
+
+    A request is timed from when it reaches the middleware to when the last
+    part of the response body is sent, or to when the app stops when it
+    never is _(recorded with the status code already sent, `500` if none)_. It should be the outermost middleware,
+    so that time spent in the other ones is included.
+
+    :param app: ASGI app to wrap
+    :type app: ASGI app
+    :param metrics: where requests are recorded
+    :type metrics: Metrics
+
+    """
+    __slots__ = {
+        "app",
+        "metrics",
+    }
+
+    def __init__(self, app, metrics: Metrics):
+        """Constructor method
+
+        """
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = perf_counter()
+        status = [500, False]   # status code sent (500 until one is) and whether the request was recorded
+
+        async def send_and_observe(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                self.metrics.observe_request(self.metrics.route_index(scope["path"]), status[0],
+                                             perf_counter() - started)
+                status[1] = True
+
+        try:
+            await self.app(scope, receive, send_and_observe)
+        finally:
+            # failed before responding, or stopped halfway (e.g. a stream cancelled when the client left)
+            if not status[1]:
+                self.metrics.observe_request(self.metrics.route_index(scope["path"]), status[0],
+                                             perf_counter() - started)
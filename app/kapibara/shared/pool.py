@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Bounded worker pool to run blocking (CPU heavy) calls out of the event loop.
+
+"""
+
+from asyncio import wrap_future
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from os import cpu_count as os_cpu_count
+from threading import Lock
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+from .profiling import profile_call
+
+__all__ = (
+    "PoolSaturatedError",
+    "WorkerPool",
+)
+
+
+POOL_KINDS = ("thread", "process")
+
+
+class PoolSaturatedError(Exception):
+    """Exception raised when a :py:class:`WorkerPool` cannot accept more work.
+
+    """
+
+
+def _timed_call(fnc: Callable, args: Tuple) -> Tuple[float, float, Any]:
+    """Run ``fnc(*args)`` and report when it started and finished.
+
+    It is a module level function so that it can be pickled and shipped to
+    a process pool too. ``perf_counter`` is backed by a system-wide monotonic
+    clock, therefore timestamps taken in different processes are comparable.
+
+    :param fnc: callable to run
+    :type fnc: Callable
+    :param args: positional arguments for ``fnc``
+    :type args: Tuple
+
+    :return: start timestamp, end timestamp and the result of the call
+    :rtype: Tuple[float, float, Any]
+    """
+    started = perf_counter()
+    result = profile_call(fnc, *args)
+    return started, perf_counter(), result
+
+
+class WorkerPool:
+    """Pool of threads (or processes) with a bounded queue in front of it.
+
+    Blocking calls are submitted with :py:meth:`run` from a coroutine and
+    awaited without blocking the event loop. When more than
+    ``workers + queue`` calls are already in flight the submission is refused
+    raising :py:class:`PoolSaturatedError` instead of piling up unbounded work.
+
+    :param kind: ``"thread"`` or ``"process"``
+        defaults to `"thread"`
+    :type kind: str, optional
+    :param workers: Number of workers _(`0` means one per available CPU)_
+        defaults to `0`
+    :type workers: int, optional
+    :param queue: Number of calls allowed to wait for a free worker
+        defaults to `64`
+    :type queue: int, optional
+
+    """
+    __slots__ = {
+        "__executor",
+        "__kind",
+        "__lock",
+        "__pending",
+        "__stats",
+        "queue",
+        "workers",
+    }
+
+    def __init__(self, kind: Optional[str] = "thread",
+                 workers: Optional[int] = 0,
+                 queue: Optional[int] = 64):
+        """Constructor method
+
+        """
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unsupported pool kind '{kind}' (expected one of {POOL_KINDS})")
+        if workers < 0 or queue < 0:
+            raise ValueError("Pool workers and queue must not be negative")
+        self.__kind = kind
+        self.__executor = None
+        self.__lock = Lock()
+        self.__pending = 0
+        self.workers = workers or os_cpu_count() or 1
+        self.queue = queue
+        self.__stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0,
+            "run_seconds_max": 0.0,
+        }
+
+    @property
+    def executor(self) -> Executor:
+        """
+        Executor backing the pool _(created on first use)_.
+
+        :getter: Returns the executor
+        :type: concurrent.futures.Executor
+        """
+        if self.__executor is None:
+            with self.__lock:
+                if self.__executor is None:
+                    if self.__kind == "process":
+                        self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self.__executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                             thread_name_prefix="workerpool")
+        return self.__executor
+
+    @property
+    def kind(self) -> str:
+        """
+        Kind of workers used by the pool.
+
+        :getter: Returns either `"thread"` or `"process"`
+        :type: str
+        """
+        return self.__kind
+
+    @property
+    def pending(self) -> int:
+        """
+        Calls currently running or waiting for a worker.
+
+        A call stays pending until a worker is done with it, even when the
+        caller stopped waiting for it _(e.g. its task was cancelled)_.
+
+        :getter: Returns the number of in-flight calls
+        :type: int
+        """
+        return self.__pending
+
+    def __release(self, future: Future):  # pylint: disable=unused-argument
+        with self.__lock:
+            self.__pending -= 1
+
+    @property
+    def stats(self) -> Dict:
+        """
+        Counters describing the pool activity.
+
+        Queue wait is the time between the submission and the moment a worker
+        picked the call up, run time is the time spent by the worker on it.
+
+        :getter: Returns a snapshot of the pool counters
+        :type: dict
+        """
+        with self.__lock:
+            return {
+                "kind": self.__kind,
+                "workers": self.workers,
+                "queue": self.queue,
+                "pending": self.__pending,
+                **self.__stats,
+            }
+
+    async def run(self, fnc: Callable, *args) -> Any:
+        """Run a blocking call on the pool and await its result.
+
+        :param fnc: callable to run _(must be picklable for process pools)_
+        :type fnc: Callable
+
+        :raises PoolSaturatedError: when the bounded queue is already full
+
+        :return: Whatever ``fnc(*args)`` returns
+        :rtype: Any
+        """
+        result, _ = await self.run_timed(fnc, *args)
+        return result
+
+    async def run_timed(self, fnc: Callable, *args) -> Tuple[Any, float]:
+        """Run a blocking call on the pool and await its result and its run time.
+
+        :param fnc: callable to run _(must be picklable for process pools)_
+        :type fnc: Callable
+
+        :raises PoolSaturatedError: when the bounded queue is already full
+
+        :return: Whatever ``fnc(*args)`` returns and the seconds a worker spent on it
+        :rtype: Tuple[Any, float]
+        """
+        with self.__lock:
+            if self.__pending >= self.workers + self.queue:
+                self.__stats["rejected"] += 1
+                raise PoolSaturatedError(
+                    f"{self.__pending} calls already in flight (limit {self.workers + self.queue})")
+            self.__pending += 1
+            self.__stats["submitted"] += 1
+        submitted = perf_counter()
+        try:
+            future = self.executor.submit(_timed_call, fnc, args)
+        except BaseException:
+            self.__release(None)
+            raise
+        # released when the worker is done, not when the caller stops waiting (e.g. cancelled)
+        future.add_done_callback(self.__release)
+        try:
+            started, finished, result = await wrap_future(future)
+        except Exception:
+            with self.__lock:
+                self.__stats["failed"] += 1
+            raise
+        waited = max(started - submitted, 0.0)
+        elapsed = finished - started
+        with self.__lock:
+            self.__stats["completed"] += 1
+            self.__stats["queue_wait_seconds_total"] += waited
+            self.__stats["queue_wait_seconds_max"] = max(self.__stats["queue_wait_seconds_max"], waited)
+            self.__stats["run_seconds_total"] += elapsed
+            self.__stats["run_seconds_max"] = max(self.__stats["run_seconds_max"], elapsed)
+        return result, elapsed
+
+    def shutdown(self, wait: Optional[bool] = True):
+        """Release the workers of the pool.
+
+        The pool can still be used afterwards: a new executor is created on demand.
+
+        :param wait: wait for the in-flight calls to complete
+            defaults to `True`
+        :type wait: bool, optional
+        """
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
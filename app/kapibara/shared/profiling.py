@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""On-demand profiling of single requests.
+
+"""
+
+from cProfile import Profile
+from io import StringIO
+from logging import getLogger as l_getLogger
+from os import (
+    makedirs as os_makedirs,
+    path as os_path,
+)
+from pstats import Stats
+from re import sub as re_sub
+from threading import Lock
+from time import strftime
+from tracemalloc import (
+    is_tracing as tm_is_tracing,
+    Snapshot,
+    start as tm_start,
+    stop as tm_stop,
+    take_snapshot as tm_take_snapshot,
+)
+from typing import (
+    Any,
+    Callable,
+    List,
+    Optional,
+)
+
+__all__ = (
+    "ProfilingMiddleware",
+    "profile_call",
+)
+
+
+log = l_getLogger(__name__)
+
+# Profiles of the calls run on other threads while a request is profiled (`None` when none is)
+_thread_profiles: Optional[List[Profile]] = None
+
+
+def profile_call(fnc: Callable, *args) -> Any:
+    """Run ``fnc(*args)``, under a profiler of its own while a request is profiled.
+
+    ``cProfile`` only sees the thread it is enabled on: blocking calls handed
+    to other threads _(e.g. by :py:class:`~shared.pool.WorkerPool`)_ run
+    through this function to show up in the profile of the request too.
+
+    :param fnc: callable to run
+    :type fnc: Callable
+
+    :return: The result of the call
+    :rtype: Any
+    """
+    profiles = _thread_profiles
+    if profiles is None:
+        return fnc(*args)
+    profile = Profile()
+    try:
+        profile.enable()
+    except ValueError:  #pragma: no cover
+        # Python 3.12+: the profiler of the request already sees every thread
+        return fnc(*args)
+    try:
+        return fnc(*args)
+    finally:
+        profile.disable()
+        profiles.append(profile)
+
+
+class ProfilingMiddleware:  # pylint: disable=too-few-public-methods
+    """ASGI middleware profiling the requests that ask for it with a header.
+
+    While ``enabled()`` returns `True`, a request with the ``header``
+    _(e.g. ``X-Kapibara-Profile: 1``)_ runs under ``cProfile`` and
+    ``tracemalloc``. The profile _(``pstats`` dump, to be explored with
+    ``python -m pstats`` or ``snakeviz``)_ and a text report _(functions by
+    cumulative time, their callees and the lines allocating the most
+    memory)_ are stored in ``directory``, and the response gets the path of
+    the report in the same header. With the header set to ``text`` the
+    report replaces the response body _(the original status code is
+    returned in ``<header>-Status``)_.
+
+    Other requests only cost the call to ``enabled()``. One request at a
+    time is profiled _(others are served as usual meanwhile)_ and, as the
+    profiler sees everything the event loop runs, concurrent requests show
+    up in the profile too. So do the calls run meanwhile on other threads
+    through :py:func:`profile_call` _(e.g. password hashing on the worker
+    pool)_, merged into the profile; other work on other threads or
+    processes is not profiled and only shows up as the time spent waiting
+    for it.
+
+    :param app: ASGI app to wrap
+    :type app: ASGI app
+    :param enabled: returns whether profiling is allowed
+    :type enabled: Callable[[], bool]
+    :param directory: where profiles are stored
+    :type directory: str
+    :param header: name of the request header asking for a profile
+        defaults to `"x-kapibara-profile"`
+    :type header: str, optional
+    :param top: number of functions and lines in the text report
+        defaults to `30`
+    :type top: int, optional
+
+    """
+    __slots__ = {
+        "__busy",
+        "app",
+        "directory",
+        "enabled",
+        "header",
+        "top",
+    }
+
+    def __init__(self, app, enabled: Callable[[], bool], directory: str,
+                 header: Optional[str] = "x-kapibara-profile", top: Optional[int] = 30):
+        """Constructor method
+
+        """
+        self.app = app
+        self.enabled = enabled
+        self.directory = directory
+        self.header = header.lower().encode("latin-1")
+        self.top = top
+        self.__busy = Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled():
+            await self.app(scope, receive, send)
+            return
+        mode = next((v.decode("latin-1").strip().lower() for n, v in scope["headers"] if n == self.header), "")
+        if mode in ("", "0", "false", "no") or not self.__busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.__profile(scope, receive, send, mode)
+        finally:
+            self.__busy.release()
+
+    async def __profile(self, scope, receive, send, mode: str):
+        start, body = {}, []
+
+        async def collect(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        tracing = tm_is_tracing()
+        if not tracing:
+            tm_start()
+        before = tm_take_snapshot()
+        global _thread_profiles     # pylint: disable=global-statement
+        _thread_profiles = threads = []
+        profile = Profile()
+        profile.enable()
+        try:
+            await self.app(scope, receive, collect)
+        finally:
+            profile.disable()
+            _thread_profiles = None
+            after = tm_take_snapshot()
+            if not tracing:
+                tm_stop()
+        stats = Stats(profile)
+        for thread_profile in list(threads):
+            stats.add(thread_profile)
+        report = self.__report(scope, start.get("status", 500), stats, len(threads), before, after)
+        path = self.__store(scope, stats, report)
+        header = self.header.decode("latin-1")
+        if mode == "text":
+            content = report.encode("utf-8")
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(content)).encode("latin-1")),
+                (self.header, path.encode("latin-1")),
+                (f"{header}-status".encode("latin-1"), str(start.get("status", 500)).encode("latin-1")),
+            ]})
+            await send({"type": "http.response.body", "body": content})
+            return
+        await send({**start, "headers": [*start.get("headers", ()), (self.header, path.encode("latin-1"))]})
+        await send({"type": "http.response.body", "body": b"".join(body)})
+
+    def __report(self, scope, status_code: int, stats: Stats, thread_calls: int,
+                 before: Snapshot, after: Snapshot) -> str:
+        out = StringIO()
+        out.write(f"{scope['method']} {scope['path']} -> {status_code}\n\n")
+        out.write(f"Event loop thread, plus {thread_calls} calls on other threads through profile_call "
+                  "(other threads and processes only show up as the time spent waiting for them)\n\n")
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.print_callees(self.top)
+        out.write(f"Top {self.top} allocating lines (size, count):\n\n")
+        for diff in after.compare_to(before, "lineno")[:self.top]:
+            out.write(f"{diff}\n")
+        return out.getvalue()
+
+    def __store(self, scope, stats: Stats, report: str) -> str:
+        os_makedirs(self.directory, exist_ok=True)
+        slug = re_sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        name = os_path.join(self.directory, f"{strftime('%Y%m%d-%H%M%S')}-{id(stats):x}-{scope['method']}-{slug}")
+        stats.dump_stats(f"{name}.prof")
+        with open(f"{name}.txt", "w", encoding="utf-8") as file:
+            file.write(report)
+        log.info("Profile of %s %s stored in %s.txt", scope["method"], scope["path"], name)
+        return f"{name}.txt"
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Token-bucket rate limiter shared by the workers, in bounded memory.
+
+"""
+
+from hashlib import blake2b
+from multiprocessing import Lock as MpLock
+from multiprocessing.sharedctypes import RawArray
+from time import monotonic
+from typing import (
+    Callable,
+    Dict,
+    Optional,
+)
+
+__all__ = (
+    "RateLimiter",
+)
+
+
+def _key_hash(key: str) -> int:
+    """Non-zero 64 bits hash of a key, the same in every process.
+
+    """
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") | 1
+
+
+class RateLimiter:
+    """Token buckets, one per key, refilled at ``rate`` tokens per second up to ``burst``.
+
+    Buckets live in a fixed-size table of shared memory: the same limits
+    apply to all the workers forked after the limiter is configured.
+    Each key can only be in one of ``ways`` slots of the table: when they
+    are all taken, the bucket used least recently is reused for the new
+    key _(which starts with a full bucket)_. Memory does not grow with the
+    number of distinct keys, but with more active keys than slots some of
+    them get their bucket refilled early.
+
+    The table is guarded by a lock shared by the workers. A worker dying
+    while holding it _(e.g. killed by a signal)_ would leave it held forever:
+    waiting for it at most ``lock_timeout`` seconds, the limiter then lets
+    requests through _(counted as ``bypassed``)_ instead of blocking the
+    event loop of every other worker.
+
+    :param rate: tokens added to a bucket every second _(`0` disables the limiter)_
+        defaults to `0`
+    :type rate: float, optional
+    :param burst: tokens a bucket can hold
+        defaults to `10`
+    :type burst: int, optional
+    :param size: number of buckets
+        defaults to `65536`
+    :type size: int, optional
+    :param ways: number of slots a key can be in
+        defaults to `4`
+    :type ways: int, optional
+    :param clock: function returning the current time in seconds _(the same for every process)_
+        defaults to `time.monotonic`
+    :type clock: Callable[[], float], optional
+    :param lock_timeout: seconds to wait for the lock of the table before letting a request through
+        defaults to `0.01`
+    :type lock_timeout: float, optional
+
+    """
+    __slots__ = {
+        "__buckets",
+        "__keys",
+        "__lock",
+        "__stats",
+        "burst",
+        "clock",
+        "lock_timeout",
+        "rate",
+        "size",
+        "ways",
+    }
+
+    def __init__(self, rate: Optional[float] = 0.0, burst: Optional[int] = 10,
+                 size: Optional[int] = 65536, ways: Optional[int] = 4,
+                 clock: Optional[Callable[[], float]] = monotonic,
+                 lock_timeout: Optional[float] = 0.01):
+        """Constructor method
+
+        """
+        self.clock = clock
+        self.lock_timeout = lock_timeout
+        self.ways = ways
+        self.__lock = MpLock()
+        self.configure(rate, burst, size)
+
+    def configure(self, rate: Optional[float] = 0.0, burst: Optional[int] = 10,
+                  size: Optional[int] = 65536):
+        """Change the limits _(forgetting all the buckets)_.
+
+        Must be called before forking the workers, which would otherwise
+        stop sharing the buckets.
+
+        :param rate: tokens added to a bucket every second _(`0` disables the limiter)_
+        :type rate: float, optional
+        :param burst: tokens a bucket can hold
+        :type burst: int, optional
+        :param size: number of buckets
+        :type size: int, optional
+        """
+        if rate < 0 or burst < 1 or size < 1:
+            raise ValueError("Rate must not be negative, burst and size must be greater than 0")
+        self.rate = rate
+        self.burst = burst
+        self.size = max(self.ways, size - size % self.ways)
+        self.__keys = RawArray("Q", self.size)
+        self.__buckets = RawArray("d", 2 * self.size)  # tokens and time of the last update of every bucket
+        self.__stats = RawArray("Q", 4)                 # allowed, limited, evicted, bypassed
+
+    @property
+    def stats(self) -> Dict:
+        """
+        Counters describing the limiter activity.
+
+        :getter: Returns a snapshot of the counters _(all the workers together)_
+        :type: dict
+        """
+        return {
+            "allowed": self.__stats[0],
+            "limited": self.__stats[1],
+            "evicted": self.__stats[2],
+            "bypassed": self.__stats[3],
+            "size": self.size,
+        }
+
+    def acquire(self, key: str, cost: Optional[float] = 1.0) -> float:
+        """Take ``cost`` tokens from the bucket of ``key``, if it holds enough of them.
+
+        :param key: what is limited _(e.g. a client address)_
+        :type key: str
+        :param cost: tokens to take
+        :type cost: float, optional
+
+        :return: `0.0` when the tokens were taken, otherwise the seconds
+            to wait before the bucket holds enough of them
+        :rtype: float
+        """
+        if not self.rate:
+            return 0.0
+        hashed = _key_hash(key)
+        first = (hashed % (self.size // self.ways)) * self.ways
+        keys, buckets = self.__keys, self.__buckets
+        if not self.__lock.acquire(timeout=self.lock_timeout):
+            self.__stats[3] += 1    # the lock holder is stuck or dead: fail open rather than block
+            return 0.0
+        try:
+            now = self.clock()
+            slot, oldest = -1, None
+            for index in range(first, first + self.ways):
+                if keys[index] == hashed:
+                    slot = index
+                    break
+                if oldest is None or keys[oldest] and (
+                        not keys[index] or buckets[2 * index + 1] < buckets[2 * oldest + 1]):
+                    oldest = index  # the first free slot, otherwise the least recently used one
+            else:
+                if keys[oldest]:
+                    self.__stats[2] += 1
+                slot = oldest
+                keys[slot] = hashed
+                buckets[2 * slot] = self.burst
+                buckets[2 * slot + 1] = now
+            tokens = min(self.burst, buckets[2 * slot] + max(0.0, now - buckets[2 * slot + 1]) * self.rate)
+            buckets[2 * slot + 1] = now
+            if tokens >= cost:
+                buckets[2 * slot] = tokens - cost
+                self.__stats[0] += 1
+                return 0.0
+            buckets[2 * slot] = tokens
+            self.__stats[1] += 1
+            return (cost - tokens) / self.rate
+        finally:
+            self.__lock.release()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Catalog of responses encoded once and served as they are.
+
+"""
+
+from typing import (
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Tuple,
+)
+
+from starlette.responses import Response
+
+__all__ = (
+    "error_key",
+    "PreencodedResponse",
+    "ResponseCatalog",
+)
+
+
+def error_key(status_code: int, detail: object, headers: Optional[Dict[str, str]] = None) -> Optional[Tuple]:
+    """Key of an error response in a :py:class:`ResponseCatalog`.
+
+    :param status_code: HTTP status code of the error
+    :type status_code: int
+    :param detail: human-readable description of the error
+    :type detail: object
+    :param headers: additional headers of the error response
+    :type headers: Dict[str, str], optional
+
+    :return: The key or `None` when ``detail`` cannot be part of a key _(not a string)_
+    :rtype: Tuple, optional
+    """
+    if not isinstance(detail, str):
+        return None
+    return status_code, detail, tuple(sorted(headers.items())) if headers else None
+
+
+class PreencodedResponse(Response):
+    """Response whose body and headers are already encoded.
+
+    Unlike other :py:class:`~starlette.responses.Response` subclasses nothing
+    is rendered on creation: the body and the raw headers are taken as they are.
+
+    :param status_code: HTTP status code
+    :type status_code: int
+    :param body: encoded body
+    :type body: bytes
+    :param raw_headers: encoded headers _(`Content-Length` included)_
+    :type raw_headers: Iterable[Tuple[bytes, bytes]]
+
+    """
+
+    def __init__(self, status_code: int, body: bytes,
+                 raw_headers: Iterable[Tuple[bytes, bytes]]):   # pylint: disable=super-init-not-called
+        self.status_code = status_code
+        self.body = body
+        # a list of its own: headers may still be changed on the way out (e.g. by middlewares)
+        self.raw_headers = list(raw_headers)
+        self.background = None
+
+
+class ResponseCatalog:
+    """Responses with a constant payload, encoded once and served as they are.
+
+    Responses are added rendered by any :py:class:`~starlette.responses.Response`
+    class and retrieved as :py:class:`PreencodedResponse` sharing their body:
+    getting a response costs one lookup and no serialization.
+
+    """
+    __slots__ = {
+        "__entries",
+    }
+
+    def __init__(self):
+        """Constructor method
+
+        """
+        self.__entries: Dict[Hashable, Tuple[int, bytes, Tuple[Tuple[bytes, bytes], ...]]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__entries
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def add(self, key: Hashable, response: Response):
+        """Add the encoded body and headers of ``response`` to the catalog.
+
+        :param key: key identifying the response
+        :type key: Hashable
+        :param response: response to encode _(its background task, if any, is ignored)_
+        :type response: Response
+        """
+        self.__entries[key] = (response.status_code, response.body, tuple(response.raw_headers))
+
+    def get(self, key: Optional[Hashable]) -> Optional[PreencodedResponse]:
+        """Get a response from the catalog.
+
+        :param key: key identifying the response
+        :type key: Hashable
+
+        :return: The response or `None` when it is not in the catalog
+        :rtype: PreencodedResponse, optional
+        """
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        return PreencodedResponse(*entry)
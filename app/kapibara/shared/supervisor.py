@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pre-fork supervisor keeping a fixed number of worker processes alive.
+
+"""
+
+from logging import getLogger as l_getLogger
+import os
+from os import (
+    _exit as os_exit,
+    fork as os_fork,
+    kill as os_kill,
+    waitpid as os_waitpid,
+    WEXITSTATUS,
+    WIFEXITED,
+    WNOHANG,
+    WTERMSIG,
+)
+from signal import (
+    signal,
+    SIGINT,
+    SIGKILL,
+    SIGTERM,
+    SIG_DFL,
+)
+from time import (
+    monotonic,
+    sleep,
+)
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+__all__ = (
+    "available_cpus",
+    "Supervisor",
+)
+
+
+log = l_getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """Number of CPUs the current process is allowed to run on.
+
+    :return: The number of usable CPUs _(at least 1)_
+    :rtype: int
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return max(len(os.sched_getaffinity(0)), 1)
+    return os.cpu_count() or 1  #pragma: no cover
+
+
+def _exit_code(status: int) -> int:
+    """Exit code of a process from its wait status _(negative signal number if killed)_.
+
+    """
+    return WEXITSTATUS(status) if WIFEXITED(status) else -WTERMSIG(status)
+
+
+class Supervisor:
+    """Fork ``workers`` processes running ``target`` and restart them when they die.
+
+    Every worker is assigned a slot _(`0` to `workers - 1`)_, passed to ``target``
+    and kept when the worker is restarted. Workers crashing right after being
+    started are restarted with an increasing delay _(up to ``max_backoff``)_ to
+    avoid busy crash loops. On ``SIGINT`` or ``SIGTERM`` the workers are asked to
+    terminate and are killed if still alive after ``graceful_timeout`` seconds.
+
+    :param target: Function run by each worker, receiving its slot
+    :type target: Callable[[int], None]
+    :param workers: Number of worker processes
+    :type workers: int
+    :param graceful_timeout: Seconds given to the workers to terminate on shutdown
+        defaults to `30`
+    :type graceful_timeout: float, optional
+    :param max_backoff: Maximum delay before restarting a crash looping worker
+        defaults to `10`
+    :type max_backoff: float, optional
+    :param on_exit: Called in the supervisor when a worker exits, with its slot, pid and exit code
+        defaults to `None`
+    :type on_exit: Callable[[int, int, int], None], optional
+    :param on_status: Called in the supervisor every ``status_interval`` seconds with the
+        running workers _(see :py:attr:`pids`)_
+        defaults to `None`
+    :type on_status: Callable[[Dict[int, int]], None], optional
+    :param status_interval: Seconds between calls of ``on_status``
+        defaults to `60`
+    :type status_interval: float, optional
+
+    """
+    __slots__ = {
+        "__backoff",
+        "__pids",
+        "__started",
+        "__stopping",
+        "graceful_timeout",
+        "max_backoff",
+        "on_exit",
+        "on_status",
+        "status_interval",
+        "target",
+        "workers",
+    }
+
+    #: a worker dying sooner than this (seconds) after its start is considered crash looping
+    MIN_UPTIME = 1.0
+
+    def __init__(self, target: Callable[[int], None], workers: int,
+                 graceful_timeout: Optional[float] = 30.0,
+                 max_backoff: Optional[float] = 10.0,
+                 on_exit: Optional[Callable[[int, int, int], None]] = None,
+                 on_status: Optional[Callable[[Dict[int, int]], None]] = None,
+                 status_interval: Optional[float] = 60.0):
+        """Constructor method
+
+        """
+        if workers < 1:
+            raise ValueError("At least one worker is needed")
+        self.target = target
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.max_backoff = max_backoff
+        self.on_exit = on_exit
+        self.on_status = on_status
+        self.status_interval = status_interval
+        self.__backoff = [0.0] * workers
+        self.__pids = {}
+        self.__started = [0.0] * workers
+        self.__stopping = False
+
+    @property
+    def pids(self) -> Dict[int, int]:
+        """
+        Running workers.
+
+        :getter: Returns a mapping of slot to worker pid
+        :type: dict
+        """
+        return {slot: pid for pid, slot in self.__pids.items()}
+
+    def __spawn(self, slot: int) -> int:
+        pid = os_fork()
+        if pid == 0:    #pragma: no cover
+            code = 0
+            try:
+                signal(SIGINT, SIG_DFL)
+                signal(SIGTERM, SIG_DFL)
+                self.target(slot)
+            except SystemExit as err:
+                code = err.code if isinstance(err.code, int) else 1
+            except BaseException:   # pylint: disable=broad-except
+                log.exception("Worker %d crashed", slot)
+                code = 1
+            finally:
+                os_exit(code)
+        self.__pids[pid] = slot
+        self.__started[slot] = monotonic()
+        log.info("Started worker %d (pid %d)", slot, pid)
+        return pid
+
+    def __stop(self, signum, frame):    # pylint: disable=unused-argument
+        self.__stopping = True
+
+    def __reap(self) -> List[int]:
+        """Collect the exited workers returning their slots.
+
+        """
+        slots = []
+        while self.__pids:
+            pid, status = os_waitpid(-1, WNOHANG)
+            if pid == 0:
+                break
+            slot = self.__pids.pop(pid, None)
+            if slot is None:    #pragma: no cover
+                continue
+            code = _exit_code(status)
+            if self.on_exit is not None:
+                self.on_exit(slot, pid, code)
+            if not self.__stopping:
+                log.warning("Worker %d (pid %d) exited with code %d", slot, pid, code)
+            slots.append(slot)
+        return slots
+
+    def run(self, poll_interval: Optional[float] = 0.2):
+        """Start the workers and supervise them until ``SIGINT`` or ``SIGTERM``.
+
+        :param poll_interval: Seconds between checks of the workers state
+            defaults to `0.2`
+        :type poll_interval: float, optional
+        """
+        previous = {s: signal(s, self.__stop) for s in (SIGINT, SIGTERM)}
+        try:
+            for slot in range(self.workers):
+                self.__spawn(slot)
+            restart_at = {}
+            status_at = monotonic() + self.status_interval
+            while not self.__stopping:
+                for slot in self.__reap():
+                    uptime = monotonic() - self.__started[slot]
+                    if uptime < self.MIN_UPTIME:
+                        self.__backoff[slot] = min(max(self.__backoff[slot] * 2, 0.5), self.max_backoff)
+                    else:
+                        self.__backoff[slot] = 0.0
+                    restart_at[slot] = monotonic() + self.__backoff[slot]
+                for slot, when in list(restart_at.items()):
+                    if when <= monotonic() and not self.__stopping:
+                        del restart_at[slot]
+                        self.__spawn(slot)
+                if self.on_status is not None and status_at <= monotonic():
+                    status_at = monotonic() + self.status_interval
+                    self.on_status(self.pids)
+                sleep(poll_interval)
+            self.shutdown(poll_interval)
+        finally:
+            for signum, handler in previous.items():
+                signal(signum, handler)
+
+    def shutdown(self, poll_interval: Optional[float] = 0.2):
+        """Terminate all workers, killing those not exiting in time.
+
+        :param poll_interval: Seconds between checks of the workers state
+            defaults to `0.2`
+        :type poll_interval: float, optional
+        """
+        self.__stopping = True
+        log.info("Stopping %d worker(s)", len(self.__pids))
+        for pid in list(self.__pids):
+            os_kill(pid, SIGTERM)
+        deadline = monotonic() + self.graceful_timeout
+        while self.__pids and monotonic() < deadline:
+            self.__reap()
+            sleep(poll_interval)
+        for pid in list(self.__pids):   #pragma: no cover
+            log.warning("Killing worker %d (pid %d)", self.__pids[pid], pid)
+            os_kill(pid, SIGKILL)
+        while self.__pids:  #pragma: no cover
+            self.__reap()
+            sleep(poll_interval)
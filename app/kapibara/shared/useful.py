@@ -5,12 +5,23 @@
 """
 
 from os import getcwd as os_getcwd
+from os import listdir as os_listdir
 from os import path as os_path
 from sys import prefix as sys_prefix
 from logging import getLogger as l_getLogger
+from threading import Lock
+from typing import (
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Tuple,
+)
 
 __all__ = (
     "find_config_path",
+    "invalidate_config_paths",
+    "merge_dicts",
 )
 
 
@@ -40,6 +51,73 @@ class DummyLogger():    # pylint: disable=too-few-public-methods
         self._logger.debug(msg, *args)
 
 
+log = DummyLogger()
+
+# Content of the directories searched by find_config_path, by application name
+_config_dirs: Dict[str, Tuple[Tuple[str, Optional[FrozenSet[str]]], ...]] = {}
+_config_dirs_lock = Lock()
+
+
+def _config_search_path(appname: str) -> List[str]:
+    """Directories searched by :py:func:`find_config_path`, in order of priority.
+
+    """
+    user_home = os_path.expanduser("~")
+    pkg_dir = os_path.dirname(__file__)
+    return [
+        os_path.realpath(pkg_dir),
+        os_path.join(pkg_dir, ".config"),
+        os_getcwd(),
+        os_path.realpath(user_home),
+        os_path.join(user_home, ".config", appname),
+        os_path.join(user_home, ".config"),
+        os_path.join(user_home, ".local", appname),
+        os_path.join(user_home, ".local"),
+        os_path.join("/etc", appname),
+        os_path.realpath("/etc"),
+        os_path.join(sys_prefix, "share", appname),
+        os_path.join(sys_prefix, "share", appname, ".config", appname),
+        os_path.join(sys_prefix, "share", appname, ".config"),
+    ]
+
+
+def _scan_config_dirs(appname: str) -> Tuple[Tuple[str, Optional[FrozenSet[str]]], ...]:
+    """List (once) the directories searched for the configuration files of ``appname``.
+
+    Directories that cannot be listed _(e.g. not readable)_ are kept without
+    content: files in there are looked up one by one.
+
+    """
+    dirs = _config_dirs.get(appname)
+    if dirs is None:
+        with _config_dirs_lock:
+            dirs = _config_dirs.get(appname)
+            if dirs is None:
+                scanned = []
+                for cfg_path in _config_search_path(appname):
+                    try:
+                        names = frozenset(os_listdir(cfg_path))
+                    except FileNotFoundError:
+                        names = frozenset()
+                    except OSError:
+                        names = None
+                    log.debug("scanned %s: %s", cfg_path, "not listable" if names is None else len(names))
+                    scanned.append((cfg_path, names))
+                dirs = _config_dirs[appname] = tuple(scanned)
+    return dirs
+
+
+def invalidate_config_paths():
+    """Forget the content of the directories searched by :py:func:`find_config_path`.
+
+    They are scanned again on the next lookup: call it when configuration files
+    are added or removed _(or the current working directory changes)_ after
+    the first lookup.
+    """
+    with _config_dirs_lock:
+        _config_dirs.clear()
+
+
 def find_config_path(fname: str, appname: str = os_path.basename(os_path.splitext(__file__)[0])) -> str:
     """Returns the path to the provided file that is the most relevant for configuring purposes.
 
@@ -61,6 +139,10 @@ def find_config_path(fname: str, appname: str = os_path.basename(os_path.splitex
 
     When in none of these locations the provided ``fname`` exists, it returns and empty string.
 
+    The locations are listed once _(a single pass over the search path)_ and
+    their content is cached for all the following lookups, until
+    :py:func:`invalidate_config_paths` is called.
+
     :param fname: (base)name of the configuration file to look for
     :type fname: str
 
@@ -72,39 +154,38 @@ def find_config_path(fname: str, appname: str = os_path.basename(os_path.splitex
         The reseach follows the priority list described above...
     :rtype: str
     """
-    try:
-        log
-    except NameError:
-        log = DummyLogger()
-    user_home = os_path.expanduser("~")
-    pkg_dir = os_path.dirname(__file__)
-    possible_path = [
-        (os_path.realpath, pkg_dir),
-        (os_path.join, (pkg_dir, ".config")),
-        (os_getcwd, None),
-        (os_path.realpath, user_home),
-        (os_path.join, (user_home, ".config", appname)),
-        (os_path.join, (user_home, ".config")),
-        (os_path.join, (user_home, ".local", appname)),
-        (os_path.join, (user_home, ".local")),
-        (os_path.join, ("/etc", appname)),
-        (os_path.realpath, "/etc"),
-        (os_path.join, (sys_prefix, "share", appname)),
-        (os_path.join, (sys_prefix, "share", appname, ".config", appname)),
-        (os_path.join, (sys_prefix, "share", appname, ".config")),
-    ]
-    for fnc, params in possible_path:
-        log.debug("trying %s[%s]", fnc, params)
-        if isinstance(params, type(None)):
-            # pylint is wrong here, because it has no clue we will always call
-            # functions that accept no args here!
-            cfg_path = fnc()  # pylint: disable=E1120
-            # pylint: disable=E1120
-        if isinstance(params, str):
-            cfg_path = fnc(params)
-        if isinstance(params, tuple):
-            cfg_path = fnc(*params)
-        if os_path.exists(os_path.join(cfg_path, fname)):
+    nested = os_path.sep in fname
+    for cfg_path, names in _scan_config_dirs(appname):
+        if names is None or nested:
+            found = os_path.exists(os_path.join(cfg_path, fname))
+        else:
+            found = fname in names
+        if found:
             log.debug("searching for %s, %s was found...", fname, cfg_path)
             return cfg_path
     return ""
+
+
+def merge_dicts(base: Dict, override: Dict) -> Dict:
+    """Recursively merge two dictionaries.
+
+    Values in ``override`` win over the ones in ``base``. Nested dictionaries
+    present in both are merged key by key instead of being replaced as a whole,
+    so a partial section in a configuration file does not wipe out the defaults.
+    None of the input dictionaries is modified.
+
+    :param base: dictionary providing the default values
+    :type base: Dict
+    :param override: dictionary whose values take precedence
+    :type override: Dict
+
+    :return: A new dictionary with the merged content
+    :rtype: Dict
+    """
+    merged = dict(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_dicts(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
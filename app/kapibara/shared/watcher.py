@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Watch files for changes with ``inotify`` _(or polling where not available)_.
+
+"""
+
+from logging import getLogger as l_getLogger
+from os import (
+    close as os_close,
+    read as os_read,
+    stat as os_stat,
+    strerror as os_strerror,
+    path as os_path,
+)
+from select import select
+from threading import (
+    Event,
+    Thread,
+)
+from typing import (
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+__all__ = (
+    "FileWatcher",
+    "WATCHER_BACKENDS",
+)
+
+
+WATCHER_BACKENDS = ("inotify", "polling")
+
+log = l_getLogger(__name__)
+
+# inotify(7) constants
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_WATCH_MASK = (
+    0x00000004      # IN_ATTRIB
+    | 0x00000008    # IN_CLOSE_WRITE
+    | 0x00000040    # IN_MOVED_FROM
+    | 0x00000080    # IN_MOVED_TO
+    | 0x00000100    # IN_CREATE
+    | 0x00000200    # IN_DELETE
+)
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity and state of a file _(`None` when it does not exist)_.
+
+    """
+    try:
+        info = os_stat(path)
+    except OSError:
+        return None
+    return info.st_ino, info.st_size, info.st_mtime_ns
+
+
+def _inotify_init(directories: Sequence[str]) -> int:
+    """Create an ``inotify`` instance watching ``directories``.
+
+    ``ctypes`` is imported only here, when the watcher starts.
+
+    :raises OSError: when ``inotify`` is not available
+
+    :return: The ``inotify`` file descriptor
+    :rtype: int
+    """
+    # pylint: disable=import-outside-toplevel
+    from ctypes import CDLL, get_errno
+    from ctypes.util import find_library
+    libc = CDLL(find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):     #pragma: no cover
+        raise OSError("inotify is not available")
+    fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:  #pragma: no cover
+        raise OSError(get_errno(), os_strerror(get_errno()))
+    for directory in directories:
+        if libc.inotify_add_watch(fd, directory.encode(), _IN_WATCH_MASK) < 0:
+            errno = get_errno()
+            os_close(fd)
+            raise OSError(errno, os_strerror(errno), directory)
+    return fd
+
+
+class FileWatcher:
+    """Call ``callback`` from a background thread when any of ``paths`` changes.
+
+    The directories of the files are watched with ``inotify`` _(Linux)_, so
+    that files replaced atomically _(renamed over)_ or through symbolic links
+    _(e.g. Kubernetes ConfigMaps)_ are noticed as well; elsewhere, or when
+    ``inotify`` cannot be used, files are checked every ``interval`` seconds.
+    Either way a file is considered changed when its inode, size or
+    modification time differ from the last check, and bursts of changes
+    _(e.g. an editor saving a file)_ result in a single call.
+
+    :param paths: Files to watch _(they do not need to exist)_
+    :type paths: Sequence[str]
+    :param callback: Function called with the changed paths
+    :type callback: Callable[[Sequence[str]], None]
+    :param interval: Seconds between checks when polling
+        defaults to `1.0`
+    :type interval: float, optional
+    :param backend: ``"inotify"``, ``"polling"`` or `None` to pick the best available
+        defaults to `None`
+    :type backend: str, optional
+    :param settle: Seconds to wait for a burst of changes to end
+        defaults to `0.1`
+    :type settle: float, optional
+
+    """
+    __slots__ = {
+        "__fd",
+        "__signatures",
+        "__stop",
+        "__thread",
+        "backend",
+        "callback",
+        "interval",
+        "paths",
+        "settle",
+    }
+
+    def __init__(self, paths: Sequence[str], callback: Callable[[Sequence[str]], None],
+                 interval: Optional[float] = 1.0, backend: Optional[str] = None,
+                 settle: Optional[float] = 0.1):
+        """Constructor method
+
+        """
+        if backend is not None and backend not in WATCHER_BACKENDS:
+            raise ValueError(f"Unsupported watcher backend '{backend}' (expected one of {WATCHER_BACKENDS})")
+        self.paths = tuple(os_path.abspath(p) for p in paths)
+        self.callback = callback
+        self.interval = interval
+        self.settle = settle
+        self.backend = backend
+        self.__fd = -1
+        self.__signatures: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        self.__stop = Event()
+        self.__thread = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the watcher thread is running.
+
+        :getter: Returns `True` between :py:meth:`start` and :py:meth:`stop`
+        :type: bool
+        """
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """Start watching the files.
+
+        """
+        if self.running:
+            return
+        self.__signatures = {p: _file_signature(p) for p in self.paths}
+        if self.backend in (None, "inotify"):
+            try:
+                self.__fd = _inotify_init(sorted({os_path.dirname(p) for p in self.paths}))
+                self.backend = "inotify"
+            except OSError as err:
+                if self.backend == "inotify":
+                    raise
+                log.debug("inotify is not available (%s): polling", err)
+                self.backend = "polling"
+        self.__stop.clear()
+        self.__thread = Thread(target=self.__run, name="filewatcher", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop watching the files.
+
+        """
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if self.__fd >= 0:
+            os_close(self.__fd)
+            self.__fd = -1
+
+    def check(self) -> Sequence[str]:
+        """Check the files right away calling ``callback`` if any changed.
+
+        :return: The changed paths
+        :rtype: Sequence[str]
+        """
+        changed = []
+        for path in self.paths:
+            signature = _file_signature(path)
+            if signature != self.__signatures.get(path):
+                self.__signatures[path] = signature
+                changed.append(path)
+        if changed:
+            try:
+                self.callback(changed)
+            except Exception:   # pylint: disable=broad-except
+                log.exception("Handling changes of %s failed", changed)
+        return changed
+
+    def __drain(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for ``inotify`` events, discarding them.
+
+        """
+        if not select([self.__fd], [], [], timeout)[0]:
+            return False
+        try:
+            while os_read(self.__fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def __run(self):
+        while not self.__stop.is_set():
+            if self.backend == "inotify":
+                if not self.__drain(self.interval):
+                    continue
+                while self.__drain(self.settle):
+                    pass
+            elif self.__stop.wait(self.interval):
+                break
+            self.check()
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks initialization
+
+"""
+
+__all__ = (
+    "common",
+)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark the API endpoints end to end against committed baselines.
+
+Every case is a request sent over and over, by ``--concurrency`` clients at
+once, for ``--duration`` seconds _(after a short warm-up)_. The ``asgi``
+target calls the FastAPI ``app`` in-process, as an ASGI server would, with
+no socket in between: it measures the app alone. The ``server`` target
+starts ``server.py`` on a local port and sends the requests over keep-alive
+HTTP/1.1 connections: it measures what a client gets. For every case it
+reports requests per second and the 50th, 99th and 99.9th percentile of the
+latency; responses with an unexpected status are counted as errors. Every
+case is measured ``--runs`` times and the median of every figure is
+reported, so that a single unlucky run _(a noisy neighbour, a GC pause)_
+does not move the result.
+
+Results can be saved as the baseline _(``--save``)_. When a baseline is
+available the run is compared with it: the benchmark fails _(exit code `1`)_
+when the throughput of a case drops, or its p99 latency grows, by more than
+``--threshold`` _(latencies growing by less than ``--noise`` milliseconds are
+ignored: sub-millisecond percentiles are mostly noise)_. Baselines depend on the machine they were measured on:
+compare runs on the same machine only.
+
+Example:
+    From the root of the repository::
+
+        $ python3 -m bench.bench_asgi --target asgi --concurrency 1 16
+        $ python3 -m bench.bench_asgi --target server --workers 2 --save
+
+"""
+
+from asyncio import (
+    gather,
+    new_event_loop,
+    open_connection,
+    sleep as asyncio_sleep,
+)
+from json import (
+    dump as json_dump,
+    load as json_load,
+    loads as json_loads,
+)
+from os import (
+    cpu_count,
+    environ as os_environ,
+    path as os_path,
+)
+from platform import python_version
+from statistics import median
+from socket import create_connection, socket
+from subprocess import DEVNULL, Popen
+from tempfile import TemporaryDirectory
+from sys import executable as sys_executable, exit as sys_exit
+from time import perf_counter, sleep
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.kapibara.shared.items import Item, ItemStore
+from bench.common import bench_parser, print_table
+
+
+_ROOT_ = os_path.dirname(os_path.dirname(os_path.abspath(__file__)))
+_BASELINE_ = os_path.join(os_path.dirname(__file__), "baselines", "bench_asgi.json")
+_CREDENTIALS_ = b"grant_type=password&username=kapibara&password=kapibara"
+
+#: name, method, path, whether it needs the bearer token, body and expected status
+Case = Tuple[str, str, str, bool, bytes, int]
+
+
+def cases() -> List[Case]:
+    """Requests to benchmark.
+
+    :return: tuples of name, method, path, need of a bearer token, body and expected status
+    :rtype: list
+    """
+    return [
+        ("GET /", "GET", "/", False, b"", 200),
+        ("GET /plaintext", "GET", "/plaintext", False, b"", 200),
+        ("POST /token", "POST", "/token", False, _CREDENTIALS_, 200),
+        ("GET /items/{item_id}", "GET", "/items/42?q=bench", True, b"", 200),
+    ]
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples.
+
+    :param samples: samples sorted in ascending order
+    :type samples: Sequence[float]
+    :param fraction: percentile as a fraction _(e.g. `0.99`)_
+    :type fraction: float
+
+    :return: The percentile _(`0.0` without samples)_
+    :rtype: float
+    """
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def _headers(method: str, body: bytes, token: Optional[str]) -> List[Tuple[bytes, bytes]]:
+    headers = [(b"host", b"localhost"), (b"user-agent", b"bench_asgi")]
+    if method == "POST":
+        headers += [(b"content-type", b"application/x-www-form-urlencoded"),
+                    (b"content-length", str(len(body)).encode())]
+    if token is not None:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return headers
+
+
+class AsgiTarget:
+    """Send requests to the ``app`` in-process, through its ASGI interface.
+
+    """
+    __slots__ = {
+        "app",
+    }
+
+    def __init__(self, app):
+        self.app = app
+
+    async def connect(self) -> Callable:
+        """Client sending requests, one at a time.
+
+        :return: Coroutine function taking method, path, headers and body and
+            returning the status and the body of the response
+        :rtype: Callable
+        """
+        return self.request
+
+    async def request(self, method: str, path: str, headers: list, body: bytes) -> Tuple[int, bytes]:
+        """Send a request to the app.
+
+        """
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "root_path": "",
+            "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+            "headers": headers, "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 80),
+        }
+        received, response = [], [0, []]
+
+        async def receive():
+            if received:
+                return {"type": "http.disconnect"}
+            received.append(True)
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                response[1].append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return response[0], b"".join(response[1])
+
+    def close(self):
+        """Release the resources held by the app.
+
+        """
+        self.app.kauth.pool.shutdown(wait=False)
+
+
+class ServerTarget:
+    """Send requests to ``server.py``, started on a local port.
+
+    :param workers: number of server worker processes
+    :type workers: int
+
+    """
+    __slots__ = {
+        "port",
+        "process",
+    }
+
+    def __init__(self, workers: int):
+        with socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.process = Popen([sys_executable, "server.py", "--bind", f"127.0.0.1:{self.port}",
+                              "--workers", str(workers)],
+                             cwd=_ROOT_, stdout=DEVNULL, stderr=DEVNULL)
+        deadline = perf_counter() + 30
+        while True:
+            try:
+                create_connection(("127.0.0.1", self.port), timeout=1).close()
+                break
+            except OSError:
+                if self.process.poll() is not None or perf_counter() > deadline:
+                    self.close()
+                    raise RuntimeError("server.py did not start listening") from None
+                sleep(0.1)
+
+    async def connect(self) -> Callable:
+        """Client sending requests, one at a time, over a keep-alive connection.
+
+        :return: Coroutine function taking method, path, headers and body and
+            returning the status and the body of the response
+        :rtype: Callable
+        """
+        reader, writer = await open_connection("127.0.0.1", self.port)
+
+        async def request(method: str, path: str, headers: list, body: bytes) -> Tuple[int, bytes]:
+            writer.write(b"".join((f"{method} {path} HTTP/1.1\r\n".encode(),
+                                   *(n + b": " + v + b"\r\n" for n, v in headers),
+                                   b"\r\n", body)))
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.split(b"\r\n")
+            length = 0
+            for line in lines[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            return int(lines[0].split(b" ", 2)[1]), await reader.readexactly(length)
+
+        return request
+
+    def close(self):
+        """Stop the server.
+
+        """
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except Exception:   # pylint: disable=broad-except
+            self.process.kill()
+
+
+async def _fetch_token(target) -> str:
+    request = await target.connect()
+    status, body = await request("POST", "/token", _headers("POST", _CREDENTIALS_, None), _CREDENTIALS_)
+    if status != 200:
+        raise RuntimeError(f"POST /token answered {status}: {body!r}")
+    return json_loads(body)["access_token"]
+
+
+async def run_case(target, case: Case, concurrency: int, duration: float,
+                   token: Optional[str]) -> Tuple[int, float, List[float]]:
+    """Send the request of a case for ``duration`` seconds from ``concurrency`` clients.
+
+    :return: The number of errors, the elapsed seconds and the sorted latencies _(seconds)_
+    :rtype: Tuple[int, float, List[float]]
+    """
+    _, method, path, needs_token, body, expected = case
+    headers = _headers(method, body, token if needs_token else None)
+    latencies, errors = [], [0]
+    started = perf_counter()
+    deadline = started + duration
+
+    async def client():
+        request = await target.connect()
+        while perf_counter() < deadline:
+            sent = perf_counter()
+            status, _ = await request(method, path, headers, body)
+            latencies.append(perf_counter() - sent)
+            if status != expected:
+                errors[0] += 1
+            await asyncio_sleep(0)
+
+    await gather(*(client() for _ in range(concurrency)))
+    return errors[0], perf_counter() - started, sorted(latencies)
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float,
+            noise_ms: float = 0.0) -> List[str]:
+    """Regressions of a run with respect to the baseline.
+
+    :return: descriptions of the regressions _(empty when there are none)_
+    :rtype: List[str]
+    """
+    failures = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result["rps"] < reference["rps"] * (1 - threshold):
+            failures.append(f"{key}: {result['rps']:,.1f} requests/s, "
+                            f"baseline {reference['rps']:,.1f} (-{1 - result['rps'] / reference['rps']:.0%})")
+        if result["p99_ms"] > reference["p99_ms"] * (1 + threshold) \
+                and result["p99_ms"] - reference["p99_ms"] > noise_ms:
+            failures.append(f"{key}: p99 {result['p99_ms']:,.2f} ms, "
+                            f"baseline {reference['p99_ms']:,.2f} ms (+{result['p99_ms'] / reference['p99_ms'] - 1:.0%})")
+    return failures
+
+
+def main():
+    """Benchmark entrypoint
+    """
+    parser = bench_parser("bench_asgi", __doc__.split("\n", 1)[0])
+    parser.add_argument("-t", "--target", choices=("asgi", "server"), default="asgi",
+                        help="Where requests are sent: the app in-process or server.py (default: asgi)")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 16], metavar="N",
+                        help="Number of concurrent clients, one run per value (default: 1 16)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Worker processes of server.py for the server target (default: 1)")
+    parser.add_argument("-k", "--case", type=str, nargs="+", default=None, metavar="NAME",
+                        help="Cases to run, matching the start of their name (default: all)")
+    parser.add_argument("--warmup", type=float, default=0.2, metavar="seconds",
+                        help="Time spent warming up each case before measuring (default: 0.2)")
+    parser.add_argument("-b", "--baseline", type=str, default=_BASELINE_,
+                        help="Baseline file, empty to skip the comparison (default: bench/baselines/bench_asgi.json)")
+    parser.add_argument("-r", "--runs", type=int, default=3,
+                        help="Runs of every case, the median of each figure is kept (default: 3)")
+    parser.add_argument("--threshold", type=float, default=0.35,
+                        help="Tolerated regression as a fraction of the baseline (default: 0.35)")
+    parser.add_argument("--noise", type=float, default=0.5, metavar="ms",
+                        help="Tolerated p99 latency growth regardless of the threshold (default: 0.5)")
+    parser.add_argument("--save", action="store_true",
+                        help="Save the results in the baseline file instead of comparing them")
+    args = parser.parse_args()
+
+    # Items served to both targets, through the configuration (server.py inherits the environment)
+    items_dir = TemporaryDirectory(prefix="bench_asgi-")
+    items = ItemStore(os_path.join(items_dir.name, "items.db"))
+    items.put(Item(42, "bench", "Item requested by the GET /items/{item_id} case"))
+    items.save()
+    os_environ["ITEMS_PATH"] = items.path
+    if args.target == "asgi":
+        from app.kapibara.api import asgi   # pylint: disable=import-outside-toplevel
+        target = AsgiTarget(asgi())
+    else:
+        target = ServerTarget(args.workers)
+    loop = new_event_loop()
+    results, rows = {}, []
+    try:
+        token = loop.run_until_complete(_fetch_token(target))
+        for case in cases():
+            if args.case and not any(case[0].startswith(name) for name in args.case):
+                continue
+            for concurrency in args.concurrency:
+                if args.warmup > 0:
+                    loop.run_until_complete(run_case(target, case, concurrency, args.warmup, token))
+                runs = []
+                for _ in range(max(args.runs, 1)):
+                    errors, elapsed, latencies = loop.run_until_complete(
+                        run_case(target, case, concurrency, args.duration, token))
+                    runs.append((len(latencies) / elapsed, percentile(latencies, 0.5),
+                                 percentile(latencies, 0.99), percentile(latencies, 0.999), errors))
+                key = f"{args.target} {case[0]} c={concurrency}"
+                results[key] = {
+                    "rps": round(median(run[0] for run in runs), 1),
+                    "p50_ms": round(median(run[1] for run in runs) * 1000, 3),
+                    "p99_ms": round(median(run[2] for run in runs) * 1000, 3),
+                    "p999_ms": round(median(run[3] for run in runs) * 1000, 3),
+                    "errors": sum(run[4] for run in runs),
+                }
+                rows.append((case[0], concurrency, *results[key].values()))
+    finally:
+        loop.close()
+        target.close()
+        items_dir.cleanup()
+    print_table(("case", "clients", "requests/s", "p50 (ms)", "p99 (ms)", "p999 (ms)", "errors"),
+                [(*row[:3], f"{row[3]:,.2f}", f"{row[4]:,.2f}", f"{row[5]:,.2f}", row[6]) for row in rows])
+
+    if not args.baseline:
+        return
+    if args.save:
+        baseline = {"results": {}}
+        if os_path.isfile(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as file:
+                baseline = json_load(file)
+        baseline["machine"] = {"python": python_version(), "cpus": cpu_count(), "runs": max(args.runs, 1)}
+        baseline["results"].update(results)
+        baseline["results"] = dict(sorted(baseline["results"].items()))
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json_dump(baseline, file, indent=4)
+            file.write("\n")
+        print(f"\n[SAVE] results saved as the baseline in {args.baseline}")
+        return
+    if not os_path.isfile(args.baseline):
+        print(f"\n[SKIP] no baseline in {args.baseline} (create it with --save)")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        failures = compare(results, json_load(file)["results"], args.threshold, args.noise)
+    print()
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    if failures:
+        sys_exit(1)
+    print(f"[ OK ] within {args.threshold:.0%} of the baseline in {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
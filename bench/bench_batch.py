@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark retrieving items in batches against retrieving them one by one.
+
+For every ``--batch`` size N it times, over ``--duration`` seconds, how
+long a client takes to get N items with N ``GET /items/{item_id}`` requests
+_(sent one after the other, as a client looping over IDs would)_ and with a
+single ``POST /items/batch`` request, and reports the items per second of
+both and the speedup of the batch. One ID every ten is missing, to include
+the misses reported by the batch. The targets are the same of
+``bench.bench_asgi``: the app in-process _(``asgi``)_ or ``server.py``
+_(``server``, which adds the HTTP round trips)_.
+
+Example:
+    From the root of the repository::
+
+        $ python3 -m bench.bench_batch --batch 10 100 1000
+        $ python3 -m bench.bench_batch --target server
+
+"""
+
+from asyncio import new_event_loop
+from json import dumps as json_dumps
+from os import (
+    environ as os_environ,
+    path as os_path,
+)
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import List
+
+from app.kapibara.shared.items import Item, ItemStore
+from bench.bench_asgi import AsgiTarget, ServerTarget, _fetch_token, _headers
+from bench.common import bench_parser, print_table
+
+
+async def one_by_one(target, item_ids: List[int], token: str, duration: float) -> float:
+    """Items per second retrieved with one request per item.
+
+    """
+    request = await target.connect()
+    headers = _headers("GET", b"", token)
+    items, started = 0, perf_counter()
+    while perf_counter() - started < duration:
+        for item_id in item_ids:
+            status, _ = await request("GET", f"/items/{item_id}", headers, b"")
+            if status not in (200, 404):
+                raise RuntimeError(f"GET /items/{item_id} answered {status}")
+        items += len(item_ids)
+    return items / (perf_counter() - started)
+
+
+async def batched(target, item_ids: List[int], token: str, duration: float) -> float:
+    """Items per second retrieved with one request for all the items.
+
+    """
+    request = await target.connect()
+    body = json_dumps({"ids": item_ids}).encode()
+    headers = [(b"host", b"localhost"), (b"user-agent", b"bench_batch"),
+               (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+               (b"authorization", f"Bearer {token}".encode())]
+    items, started = 0, perf_counter()
+    while perf_counter() - started < duration:
+        status, _ = await request("POST", "/items/batch", headers, body)
+        if status != 200:
+            raise RuntimeError(f"POST /items/batch answered {status}")
+        items += len(item_ids)
+    return items / (perf_counter() - started)
+
+
+def main():
+    """Benchmark entrypoint
+    """
+    parser = bench_parser("bench_batch", __doc__.split("\n", 1)[0])
+    parser.add_argument("-t", "--target", choices=("asgi", "server"), default="asgi",
+                        help="Where requests are sent: the app in-process or server.py (default: asgi)")
+    parser.add_argument("-n", "--batch", type=int, nargs="+", default=[10, 100, 1000], metavar="N",
+                        help="Numbers of items retrieved at once, one run per value (default: 10 100 1000)")
+    args = parser.parse_args()
+
+    # Items served to both targets, through the configuration (server.py inherits the environment)
+    items_dir = TemporaryDirectory(prefix="bench_batch-")
+    items = ItemStore(os_path.join(items_dir.name, "items.db"))
+    for item_id in range(max(args.batch)):
+        if item_id % 10 != 9:
+            items.put(Item(item_id, f"item {item_id}", f"Description of the item number {item_id}"))
+    items.save()
+    os_environ["ITEMS_PATH"] = items.path
+    if args.target == "asgi":
+        from app.kapibara.api import asgi   # pylint: disable=import-outside-toplevel
+        target = AsgiTarget(asgi())
+    else:
+        target = ServerTarget(1)
+    loop = new_event_loop()
+    rows = []
+    try:
+        token = loop.run_until_complete(_fetch_token(target))
+        for size in args.batch:
+            item_ids = list(range(size))
+            single = loop.run_until_complete(one_by_one(target, item_ids, token, args.duration))
+            batch = loop.run_until_complete(batched(target, item_ids, token, args.duration))
+            rows.append((size, single, batch, batch / single))
+    finally:
+        loop.close()
+        target.close()
+        items_dir.cleanup()
+    print_table(("items", "items/s (one by one)", "items/s (batch)", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
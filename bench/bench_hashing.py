@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark the password hashing schemes on this machine.
+
+For every scheme _(``crypt.scheme``, with the ``passlib`` default cost)_ it
+reports the hashes per second of a single caller, the peak memory a hash
+takes _(growth of the resident set size of a fresh process hashing once)_
+and the hashes per second of a :py:class:`WorkerPool` kept busy by as many
+concurrent logins as it has workers, for each ``--concurrency``. Speedups
+close to the number of workers mean the scheme runs in parallel _(it
+releases the GIL, or ``--kind process`` is used)_: they tell how many
+logins per second a pool of that size can take, and how many CPUs it eats.
+
+Schemes whose backend is not installed _(e.g. ``argon2`` without
+``argon2-cffi``)_ are skipped.
+
+Example:
+    From the root of the repository::
+
+        $ python3 -m bench.bench_hashing --concurrency 1 2 4 --kind thread
+        $ python3 -m bench.bench_hashing --schemes bcrypt argon2 --kind process
+
+"""
+
+from asyncio import (
+    gather,
+    new_event_loop,
+)
+from multiprocessing import get_context
+from os import cpu_count as os_cpu_count
+from time import perf_counter
+
+from app.kapibara.api import (
+    _PWD_SCHEMES_,
+    _pwd_context,
+    _pwd_context_conf,
+    _pwd_hash,
+    _pwd_scheme_available,
+)
+from app.kapibara.shared.pool import POOL_KINDS, WorkerPool
+from bench.common import bench_parser, print_table, throughput
+
+PASSWORD = "Thi$-i5-5up3r$ecr37!!!"
+
+
+def _peak_rss() -> int:
+    """Peak resident set size _(KiB)_ of this process.
+
+    ``VmHWM`` is used where available _(Linux)_: unlike ``ru_maxrss``, it
+    does not carry over the peak of the parent through ``exec``.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as status:
+            return next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        from resource import getrusage, RUSAGE_SELF   # pylint: disable=import-outside-toplevel
+        return getrusage(RUSAGE_SELF).ru_maxrss
+
+
+def _hash_memory(pwdctx_conf: str, queue):
+    """Put in ``queue`` the growth _(KiB)_ of the peak resident set size caused by one hash.
+
+    Meant to run in a fresh process: the hashing backend is loaded, and its
+    own memory left out, by hashing once with the lowest cost first.
+    """
+    context = _pwd_context(pwdctx_conf)
+    handler = context.handler()
+    handler.using(**({"rounds": handler.min_rounds} if "rounds" in handler.setting_kwds else {})).hash(PASSWORD)
+    before = _peak_rss()
+    context.hash(PASSWORD)
+    queue.put(_peak_rss() - before)
+
+
+def hash_memory(pwdctx_conf: str) -> float:
+    """Peak memory _(KiB)_ of a hash, measured in a fresh process.
+
+    :param pwdctx_conf: CryptContext serialized with ``CryptContext.to_string()``
+    :type pwdctx_conf: str
+
+    :return: Growth of the peak resident set size _(KiB)_
+    :rtype: float
+    """
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_hash_memory, args=(pwdctx_conf, queue))
+    process.start()
+    memory = queue.get()
+    process.join()
+    return float(memory)
+
+
+def pool_throughput(pool: WorkerPool, pwdctx_conf: str, duration: float) -> float:
+    """Hashes per second of a pool kept busy by one caller per worker.
+
+    :param pool: pool running the hashes
+    :type pool: WorkerPool
+    :param pwdctx_conf: CryptContext serialized with ``CryptContext.to_string()``
+    :type pwdctx_conf: str
+    :param duration: seconds to spend measuring
+    :type duration: float
+
+    :return: Hashes per second
+    :rtype: float
+    """
+    async def caller(deadline: float) -> int:
+        hashes = 0
+        while perf_counter() < deadline:
+            await pool.run(_pwd_hash, pwdctx_conf, PASSWORD)
+            hashes += 1
+        return hashes
+
+    async def run() -> float:
+        await gather(*(pool.run(_pwd_hash, pwdctx_conf, PASSWORD) for _ in range(pool.workers)))
+        started = perf_counter()
+        hashes = sum(await gather(*(caller(started + duration) for _ in range(pool.workers))))
+        return hashes / (perf_counter() - started)
+
+    loop = new_event_loop()
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def main():
+    """Benchmark entrypoint
+    """
+    parser = bench_parser("bench_hashing", __doc__.split("\n", 1)[0])
+    parser.add_argument("-s", "--schemes", nargs="+", choices=_PWD_SCHEMES_, default=_PWD_SCHEMES_,
+                        metavar="scheme", help=f"Hashing schemes (default: {' '.join(_PWD_SCHEMES_)})")
+    parser.add_argument("-c", "--concurrency", nargs="+", type=int, metavar="workers",
+                        default=sorted({1, 2, os_cpu_count() or 1}),
+                        help="Pool sizes, logins hashed at once (default: 1, 2 and the number of CPUs)")
+    parser.add_argument("-k", "--kind", choices=POOL_KINDS, default="thread",
+                        help="Kind of the pool workers (default: thread)")
+    args = parser.parse_args()
+    rows, skipped = [], []
+    for scheme in args.schemes:
+        if not _pwd_scheme_available(scheme):
+            skipped.append(scheme)
+            continue
+        conf = _pwd_context_conf(scheme)
+        single = throughput(_pwd_hash, conf, PASSWORD, duration=args.duration)
+        row = [scheme, single, 1000 / single, hash_memory(conf)]
+        for workers in args.concurrency:
+            pool = WorkerPool(kind=args.kind, workers=workers, queue=0)
+            try:
+                pooled = pool_throughput(pool, conf, args.duration)
+            finally:
+                pool.shutdown()
+            row += [pooled, pooled / single]
+        rows.append(row)
+    print_table(("scheme", "hashes/s", "ms/hash", "KiB/hash",
+                 *(f"{header} ({args.kind} x{workers})" for workers in args.concurrency
+                   for header in ("hashes/s", "speedup"))), rows)
+    if skipped:
+        print(f"\nSkipped (backend not installed): {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark the import time of the app against a budget.
+
+The module is imported by fresh interpreters run with ``python -X importtime``
+_(after a first discarded run warming up the bytecode cache)_ and, for every
+imported module, the best time over all the runs is kept: it is the least
+noisy estimate of the cost of each import. It reports the total cost of
+importing the module and its most expensive imports, then checks them against
+the budget file: the benchmark fails _(exit code `1`)_ when the import takes
+longer than allowed or imports a module that is supposed to be loaded lazily.
+
+Example:
+    From the root of the repository::
+
+        $ python3 -m bench.bench_import --runs 10
+
+"""
+
+from argparse import ArgumentParser, RawTextHelpFormatter
+from json import load as json_load
+from os import path as os_path
+from subprocess import run as subprocess_run
+from sys import executable as sys_executable, exit as sys_exit
+from typing import Dict, List, Tuple
+
+from bench.common import print_table
+
+
+_BUDGET_ = os_path.join(os_path.dirname(__file__), "import_budget.json")
+
+
+def parse_importtime(output: str) -> List[Tuple[str, str, int, int]]:
+    """Parse the report printed by ``python -X importtime``.
+
+    Modules are reported after the ones they import, nested one level deeper.
+
+    :param output: standard error of the interpreter
+    :type output: str
+
+    :return: tuples of module name, name of the module importing it _(empty
+        at the top level)_, self and cumulative time _(microseconds)_
+    :rtype: list
+    """
+    modules, children = [], {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name = name.strip()
+        for child in children.pop(depth + 1, ()):
+            modules[child] = (modules[child][0], name, *modules[child][2:])
+        children.setdefault(depth, []).append(len(modules))
+        modules.append((name, "", int(own), int(cumulative)))
+    return modules
+
+
+def measure(module: str, runs: int) -> Dict[str, Tuple[int, int, str]]:
+    """Import ``module`` in ``runs`` fresh interpreters.
+
+    :param module: module to import
+    :type module: str
+    :param runs: number of measured runs
+    :type runs: int
+
+    :return: best self and cumulative times _(microseconds)_ and importer by imported module
+    :rtype: Dict[str, Tuple[int, int, str]]
+    """
+    root = os_path.dirname(os_path.dirname(os_path.abspath(__file__)))
+    best = {}
+    for run in range(runs + 1):
+        result = subprocess_run([sys_executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=root, capture_output=True, text=True, check=True)
+        if not run:
+            continue
+        for name, parent, own, cumulative in parse_importtime(result.stderr):
+            previous = best.get(name)
+            if previous is None:
+                best[name] = (own, cumulative, parent)
+            else:
+                best[name] = (min(own, previous[0]), min(cumulative, previous[1]), parent)
+    return best
+
+
+def main():
+    """Benchmark entrypoint
+    """
+    parser = ArgumentParser(prog="bench_import", description=__doc__.split("\n", 1)[0],
+                            formatter_class=RawTextHelpFormatter)
+    parser.add_argument("-m", "--module", type=str, default="app.kapibara.api",
+                        help="Module to import (default: app.kapibara.api)")
+    parser.add_argument("-r", "--runs", type=int, default=5,
+                        help="Number of measured imports (default: 5)")
+    parser.add_argument("-t", "--top", type=int, default=15,
+                        help="Number of most expensive imports to report (default: 15)")
+    parser.add_argument("-b", "--budget", type=str, default=_BUDGET_,
+                        help="Budget file, empty to skip the checks (default: bench/import_budget.json)")
+    args = parser.parse_args()
+
+    best = measure(args.module, args.runs)
+    if args.module not in best:
+        print(f"{args.module} was already imported by the interpreter: nothing to measure")
+        sys_exit(1)
+    total_ms = best[args.module][1] / 1000
+    rows = sorted(((name, own / 1000, cumulative / 1000) for name, (own, cumulative, _) in best.items()),
+                  key=lambda r: r[1], reverse=True)[:args.top]
+    print(f"import {args.module}: {total_ms:,.1f} ms (best of {args.runs} runs)\n")
+    print_table(("module", "self (ms)", "cumulative (ms)"), rows)
+    print(f"\nImported by {args.module}:")
+    print_table(("module", "cumulative (ms)"),
+                sorted(((name, cumulative / 1000) for name, (_, cumulative, parent) in best.items()
+                        if parent == args.module), key=lambda r: r[1], reverse=True)[:args.top])
+
+    if not args.budget:
+        return
+    with open(args.budget, "r", encoding="utf-8") as file:
+        budget = json_load(file).get(args.module, {})
+    failures = []
+    if "max_ms" in budget and total_ms > budget["max_ms"]:
+        failures.append(f"import took {total_ms:,.1f} ms, more than the {budget['max_ms']:,} ms budget")
+    for name in budget.get("lazy", ()):
+        if name in best:
+            failures.append(f"'{name}' is imported eagerly, but it is supposed to be loaded lazily")
+    print()
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    if failures:
+        sys_exit(1)
+    print(f"[ OK ] within the budget of {args.budget}")
+
+
+if __name__ == "__main__":
+    main()
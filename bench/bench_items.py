@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark the item store at growing numbers of items.
+
+For every ``--items`` count it fills an :py:class:`ItemStore` in memory and
+reports the memory it takes per item _(``tracemalloc``, records and index
+included)_, then saves it to a file and reports the file size per item and
+the time it takes to open it _(memory mapped: it should not grow with the
+number of items)_. Random lookups are timed against both stores: they
+should take about the same time whatever the number of items.
+
+Example:
+    From the root of the repository::
+
+        $ python3 -m bench.bench_items --items 10000 100000 1000000
+
+"""
+
+from os import path as os_path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import (
+    get_traced_memory as tm_get_traced_memory,
+    start as tm_start,
+    stop as tm_stop,
+)
+
+from app.kapibara.shared.items import Item, ItemStore
+from bench.common import bench_parser, print_table, throughput
+
+
+def fill(store: ItemStore, count: int):
+    """Add ``count`` items with realistic names and descriptions, in random order of ID.
+
+    """
+    rnd = Random(count)
+    ids = list(range(0, 2 * count, 2))
+    rnd.shuffle(ids)
+    for item_id in ids:
+        store.put(Item(item_id, f"item {item_id}", f"Description of the item number {item_id}"))
+
+
+def lookups(store: ItemStore, count: int, duration: float) -> float:
+    """Lookups per second of random IDs _(half of them missing)_.
+
+    """
+    rnd = Random(0)
+    ids = [rnd.randrange(2 * count) for _ in range(4096)]
+
+    def lookup_all():
+        for item_id in ids:
+            store.get(item_id)
+
+    return throughput(lookup_all, duration=duration) * len(ids)
+
+
+def main():
+    """Benchmark entrypoint
+    """
+    parser = bench_parser("bench_items", __doc__.split("\n", 1)[0])
+    parser.add_argument("-n", "--items", type=int, nargs="+", default=[10000, 100000, 1000000], metavar="N",
+                        help="Numbers of items, one run per value (default: 10000 100000 1000000)")
+    args = parser.parse_args()
+    rows = []
+    with TemporaryDirectory(prefix="bench_items-") as directory:
+        for count in args.items:
+            path = os_path.join(directory, f"items-{count}.db")
+            tm_start()
+            store = ItemStore(path)
+            fill(store, count)
+            memory = tm_get_traced_memory()[0]
+            tm_stop()
+            in_memory = lookups(store, count, args.duration)
+            store.save()
+            del store
+            started = perf_counter()
+            mapped = ItemStore(path)
+            opened = perf_counter() - started
+            rows.append((count, memory / count, os_path.getsize(path) / count, opened * 1000,
+                         in_memory, lookups(mapped, count, args.duration)))
+            mapped.close()
+    print_table(("items", "bytes/item (memory)", "bytes/item (file)", "open (ms)",
+                 "lookups/s (memory)", "lookups/s (file)"), rows)
+
+
+if __name__ == "__main__":
+    main()
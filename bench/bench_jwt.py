@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark access token encoding and decoding.
+
+For every supported family of signing algorithms it compares the throughput
+of ``python-jose`` fed with the raw key material _(parsed again at every call)_
+with the one of :py:class:`Kauthbara`, which parses the keys once into cached
+signer and verifier objects. The verified-token cache of ``Kauthbara`` is
+disabled, so that every decode does verify the signature.
+
+Example:
+    From the root of the repository::
+
+        $ python3 -m bench.bench_jwt --duration 2
+
+"""
+
+from datetime import timedelta
+from ecdsa import NIST256p, SigningKey as ECSigningKey
+from jose import jwt
+from rsa import newkeys as rsa_newkeys
+
+from app.kapibara.api import Kauthbara
+from bench.common import bench_parser, print_table, throughput
+
+
+def signing_keys():
+    """Generate fresh key material for each benchmarked algorithm.
+
+    :return: tuples of algorithm, private _(or secret)_ key and public key
+    :rtype: list
+    """
+    rsa_public, rsa_private = rsa_newkeys(2048)
+    ec_private = ECSigningKey.generate(curve=NIST256p)
+    return [
+        ("HS256", "Thi$-i5-5up3r$ecr37!!!", "Thi$-i5-5up3r$ecr37!!!"),
+        ("RS256", rsa_private.save_pkcs1().decode(), rsa_public.save_pkcs1().decode()),
+        ("ES256", ec_private.to_pem().decode(), ec_private.get_verifying_key().to_pem().decode()),
+    ]
+
+
+def main():
+    """Benchmark entrypoint
+    """
+    args = bench_parser("bench_jwt", __doc__.split("\n", 1)[0]).parse_args()
+    claims = {"app": "kapibara", "sub": "kapibara"}
+    rows = []
+    for algorithm, private_key, public_key in signing_keys():
+        kauth = Kauthbara(crypt_key=private_key, token_encode_algorithm=algorithm,
+                          public_key=public_key if public_key != private_key else None,
+                          token_cache_size=0)
+        token = kauth.create_access_token(claims, timedelta(days=1))
+        raw_encode = throughput(jwt.encode, claims, private_key, algorithm, duration=args.duration)
+        prepared_encode = throughput(kauth.create_access_token, claims, timedelta(days=1),
+                                     duration=args.duration)
+        raw_decode = throughput(jwt.decode, token, public_key, [algorithm], duration=args.duration)
+        prepared_decode = throughput(kauth.verify_access_token, token, duration=args.duration)
+        rows.append((algorithm, raw_encode, prepared_encode, raw_decode, prepared_decode))
+    print_table(("algorithm", "encode/s (raw key)", "encode/s (prepared)",
+                 "decode/s (raw key)", "decode/s (prepared)"), rows)
+    print("\nEdDSA is not listed: python-jose does not support it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark pre-encoded responses against rendering them at every request.
+
+For the constant payloads served by ``kapibara`` _(the version banner, the
+plaintext body and the standard errors)_ it compares the throughput of
+building a new ``JSONResponse`` or ``PlainTextResponse`` _(rendering the body
+and the headers every time)_ with the one of getting the same response from
+the catalog of pre-encoded responses. Both are then sent to a no-op ASGI
+``send``, which is what the server does with them.
+
+Example:
+    From the root of the repository::
+
+        $ python3 -m bench.bench_responses --duration 2
+
+"""
+
+from asyncio import new_event_loop
+
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.kapibara.__constants__ import __app_name__, __version__
+from app.kapibara.shared.responses import error_key, ResponseCatalog
+from bench.common import bench_parser, print_table, throughput
+
+
+async def _send(message):   # pylint: disable=unused-argument
+    pass
+
+
+def cases():
+    """Responses to benchmark.
+
+    :return: tuples of name, catalog key and function rendering the response
+    :rtype: list
+    """
+    bearer = {"WWW-Authenticate": "Bearer"}
+    return [
+        ("GET / (banner)", "root",
+         lambda: JSONResponse(content={"msg": ["Hello World!", __app_name__, __version__]})),
+        ("GET /plaintext", "plaintext",
+         lambda: PlainTextResponse(content="nothing more than text...")),
+        ("401 invalid token", error_key(401, "Invalid or expired token", bearer),
+         lambda: JSONResponse(status_code=401, content={"msg": "Invalid or expired token"}, headers=bearer)),
+        ("404 not found", error_key(404, "Not Found"),
+         lambda: JSONResponse(status_code=404, content={"msg": "Not Found"})),
+    ]
+
+
+def main():
+    """Benchmark entrypoint
+    """
+    args = bench_parser("bench_responses", __doc__.split("\n", 1)[0]).parse_args()
+    loop = new_event_loop()
+    catalog = ResponseCatalog()
+    rows = []
+    for name, key, render in cases():
+        catalog.add(key, render())
+
+        def rendered(render=render):
+            loop.run_until_complete(render()({"type": "http"}, None, _send))
+
+        def preencoded(key=key):
+            loop.run_until_complete(catalog.get(key)({"type": "http"}, None, _send))
+
+        build = throughput(render, duration=args.duration)
+        lookup = throughput(catalog.get, key, duration=args.duration)
+        sent_rendered = throughput(rendered, duration=args.duration)
+        sent_preencoded = throughput(preencoded, duration=args.duration)
+        rows.append((name, build, lookup, sent_rendered, sent_preencoded,
+                     f"{sent_preencoded / sent_rendered:.2f}x"))
+    loop.close()
+    print_table(("response", "build/s (rendered)", "build/s (pre-encoded)",
+                 "sent/s (rendered)", "sent/s (pre-encoded)", "speedup (sent)"), rows)
+
+
+if __name__ == "__main__":
+    main()
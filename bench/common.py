@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Helpers shared by the benchmarks.
+
+"""
+
+from argparse import ArgumentParser, RawTextHelpFormatter
+from time import perf_counter
+from typing import Callable, List, Sequence
+
+__all__ = (
+    "bench_parser",
+    "print_table",
+    "throughput",
+)
+
+
+def bench_parser(prog: str, description: str) -> ArgumentParser:
+    """Command line parser with the options common to all benchmarks.
+
+    :param prog: name of the benchmark
+    :type prog: str
+    :param description: what the benchmark measures
+    :type description: str
+
+    :return: The parser, ready to be extended with specific options
+    :rtype: ArgumentParser
+    """
+    parser = ArgumentParser(prog=prog, description=description,
+                            formatter_class=RawTextHelpFormatter)
+    parser.add_argument("-d", "--duration", type=float, default=1.0, metavar="seconds",
+                        help="Time spent measuring each case (default: 1.0)")
+    return parser
+
+
+def throughput(fnc: Callable, *args, duration: float = 1.0) -> float:
+    """Call ``fnc(*args)`` repeatedly for about ``duration`` seconds.
+
+    Calls are timed in batches growing exponentially, so that the overhead of
+    reading the clock stays negligible even for very fast functions.
+
+    :param fnc: function to measure
+    :type fnc: Callable
+    :param duration: seconds to spend measuring
+    :type duration: float
+
+    :return: Calls per second
+    :rtype: float
+    """
+    fnc(*args)
+    calls, batch, elapsed = 0, 1, 0.0
+    while elapsed < duration:
+        started = perf_counter()
+        for _ in range(batch):
+            fnc(*args)
+        elapsed += perf_counter() - started
+        calls += batch
+        batch *= 2
+    return calls / elapsed
+
+
+def print_table(headers: Sequence[str], rows: List[Sequence]):
+    """Print rows as a plain text table.
+
+    :param headers: column titles
+    :type headers: Sequence[str]
+    :param rows: table content _(floats are printed with 1 decimal digit)_
+    :type rows: List[Sequence]
+    """
+    cells = [[f"{c:,.1f}" if isinstance(c, float) else str(c) for c in row] for row in rows]
+    widths = [max(len(str(h)), *(len(r[i]) for r in cells)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in cells:
+        print("  ".join(c.rjust(w) if i else c.ljust(w) for i, (c, w) in enumerate(zip(row, widths))))
@@ -3,17 +3,21 @@
 """Microservice app wrapper with uvicorn.
 """
 
-from os import path as os_path
+from os import getpid, path as os_path
 from sys import exit as sys_exit, stderr as sys_stderr, version_info as sys_version_info
-from errno import ENOTRECOVERABLE
-from typing import Dict
+from errno import EINVAL, ENOTRECOVERABLE
+from gc import collect as gc_collect, freeze as gc_freeze, get_freeze_count as gc_get_freeze_count
+from typing import Dict, Tuple
 from logging import basicConfig, getLogger, DEBUG, INFO
 from argparse import ArgumentParser, RawTextHelpFormatter
-from uvicorn import run as uvicorn_run
+from multiprocessing.sharedctypes import RawArray
+from socket import socket, AF_INET, AF_INET6, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
+from uvicorn import Config as UvicornConfig, Server as UvicornServer, run as uvicorn_run
 from app.kapibara.__constants__ import __app_name__
 from app.kapibara.__constants__ import __description__
 from app.kapibara.__constants__ import __version__
 from app.kapibara.api import asgi as kapi_asgi
+from app.kapibara.shared.supervisor import available_cpus, Supervisor
 
 
 if sys_version_info < (3, 6, 0):
@@ -26,6 +30,44 @@ app = kapi_asgi()
 _log = getLogger()
 
 
+class RequestCounter:   # pylint: disable=too-few-public-methods
+    """ASGI middleware counting the HTTP requests served by a worker.
+
+    Counters live in memory shared with the supervisor, one slot per worker.
+    """
+    __slots__ = {
+        "app",
+        "counters",
+        "slot",
+    }
+
+    def __init__(self, asgi_app, counters, slot: int):
+        self.app = asgi_app
+        self.counters = counters
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            self.counters[self.slot] += 1
+        await self.app(scope, receive, send)
+
+
+def parse_workers(workers: str) -> int:
+    """Parse the number of workers: a positive integer or ``auto`` _(one per available CPU)_.
+
+    :return: Number of workers _(`0` when not specified)_
+    :rtype: int
+    """
+    if not workers:
+        return 0
+    if workers == "auto":
+        return available_cpus()
+    if not workers.isdigit() or int(workers) < 1:
+        _log.critical("Number of workers must be a positive integer or 'auto' (got '%s')", workers)
+        sys_exit(EINVAL)
+    return int(workers)
+
+
 def parse_args() -> Dict:
     """Parse command line arguments & provide help screen for CLI.
 
@@ -35,14 +77,21 @@ def parse_args() -> Dict:
     parser = ArgumentParser(prog=os_path.basename(__file__),
                             description=__description__,
                             formatter_class=RawTextHelpFormatter)
-    parser.add_argument("-b", "--bind", type=str, default="", metavar="addr[:port]",
-                        help="bind <addr>[:<port>] to use for the microservice")
+    parser.add_argument("-b", "--bind", type=str, default="", metavar="addr:port",
+                        help="bind <addr>:<port> to use for the microservice\n"
+                             "(IPv6 addresses in brackets, e.g. '[::1]:8088')")
     parser.add_argument("--debug", action="store_true",
                         help="Turns ON debug mode (implies '-vv')")
     parser.add_argument("--development", action="store_true",
                         help="Turns ON development mode (reloads the server if a change is detected)")
     parser.add_argument("-v", "--verbose", action="count", default=0,
                         help="Increase output verbosity")
+    parser.add_argument("-w", "--workers", type=str, default="", metavar="N|auto",
+                        help="Number of worker processes, 'auto' is one per available CPU\n"
+                             "(defaults to the 'server.workers' configuration)")
+    parser.add_argument("--preload", action="store_true",
+                        help="Prepare the app state once before forking the workers\n"
+                             "(defaults to the 'server.preload' configuration)")
     parser.add_argument("--version", action="version",
                         help="Show program version",
                         version=f"%(prog)s ({__app_name__} v{__version__})")
@@ -51,6 +100,84 @@ def parse_args() -> Dict:
     return received_args
 
 
+def parse_bind(bind: str) -> Tuple[str, int]:
+    """Split ``addr:port`` into address and port.
+
+    IPv6 addresses are given in brackets _(e.g. ``[::1]:8000``)_, which are
+    removed from the returned address.
+
+    :return: Address & port to bind
+    :rtype: Tuple[str, int]
+    """
+    host, _, port = bind.rpartition(":")
+    if not port.isdigit() or (":" in host and not host.startswith("[")):
+        _log.critical("Bind address must be <addr>:<port> with IPv6 addresses in brackets (got '%s')", bind)
+        sys_exit(EINVAL)
+    return host.strip("[]"), int(port)
+
+
+def bind_socket(host: str, port: int) -> socket:
+    """Create the listening socket shared by all workers.
+
+    :return: The bound socket
+    :rtype: socket
+    """
+    sock = socket(AF_INET6 if ":" in host else AF_INET, SOCK_STREAM)
+    sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Prepare the app state before forking the workers.
+
+    The configuration is already loaded when ``server.py`` is imported:
+    this also builds what the first requests of every worker would
+    otherwise build on their own, then moves all the objects allocated so
+    far out of the reach of the garbage collector, so that its passes do
+    not write to _(and therefore copy)_ the pages workers share with the
+    supervisor.
+    """
+    app.kauth.warm_up()
+    gc_collect()
+    gc_freeze()
+    _log.info("Preloaded the app state (%d objects frozen)", gc_get_freeze_count())
+
+
+def serve_workers(host: str, port: int, workers: int, log_level: str):
+    """Serve the app from ``workers`` supervised processes sharing one socket.
+
+    Workers are forked from this process, restarted if they die and
+    periodically reported in the log with their pid and served requests.
+    """
+    sock = bind_socket(host, port)
+    requests = RawArray("Q", workers)
+    app.metrics.resize(workers)
+    _log.info("Serving on http://%s:%d with %d workers (supervisor pid %d)", host, port, workers, getpid())
+
+    def worker(slot: int):
+        app.metrics.slot = slot
+        config = UvicornConfig(RequestCounter(app, requests, slot),
+                               headers=[("server", __app_name__)],
+                               log_level=log_level)
+        _log.info("Worker %d (pid %d) is ready", slot, getpid())
+        UvicornServer(config).run(sockets=[sock])
+
+    def on_exit(slot: int, pid: int, code: int):
+        _log.info("Worker %d (pid %d) exited with code %d after serving %d requests",
+                  slot, pid, code, requests[slot])
+        requests[slot] = 0
+
+    def on_status(pids: Dict[int, int]):
+        for slot, pid in sorted(pids.items()):
+            _log.info("Worker %d (pid %d) served %d requests", slot, pid, requests[slot])
+
+    Supervisor(worker, workers, on_exit=on_exit, on_status=on_status).run()
+    sock.close()
+
+
 def main():
     """CLI main entrypoint
     """
@@ -67,14 +194,29 @@ def main():
         basicConfig(level=DEBUG, format=fmt)
     _bind = args.get("bind")
     if not _bind:
-        args["bind"] = f"{app.kapi.server_addr}:{app.kapi.server_port}"
+        _addr = app.kapi.server_addr
+        args["bind"] = f"[{_addr}]:{app.kapi.server_port}" if ":" in _addr else f"{_addr}:{app.kapi.server_port}"
+    args["workers"] = parse_workers(args.get("workers")) or app.kapi.server_workers
+    args["preload"] = args.get("preload") or app.kapi.server_preload
     _log.debug("Received arguments are: %s", args)
 
-    uvicorn_run("server:app",
-                host=args.get("bind", app.kapi.server_addr).split(":", 1)[0],
-                port=int(args.get("bind", app.kapi.server_port).split(":", 1)[-1]),
+    host, port = parse_bind(args["bind"])
+    log_level = "debug" if args.get("debug", False) else "info"
+    if args["workers"] > 1 and args.get("development", False):
+        _log.warning("Development mode reloads a single worker: ignoring %d workers", args["workers"])
+        args["workers"] = 1
+    if args["workers"] > 1:
+        if args["preload"]:
+            preload()
+        serve_workers(host, port, args["workers"], log_level)
+        return
+
+    # reloading needs an import string, otherwise reuse the app already built here
+    uvicorn_run("server:app" if args.get("development", False) else app,
+                host=host,
+                port=port,
                 headers=[("server", __app_name__)],
-                log_level="debug" if args.get("debug", False) else "info",
+                log_level=log_level,
                 reload=bool(args.get("development", False)),
                 )
 
@@ -20,12 +20,14 @@ Example:
 """
 
 from os import path as os_path
+from re import search
 from sys import exit as sys_exit
 from errno import EINVAL
 from typing import Dict, List
 from pathlib import Path, PurePath
 from configparser import ConfigParser
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 
 
 class SetupCfgParser(ConfigParser):  # pylint: disable=too-many-ancestors
@@ -74,6 +76,51 @@ class SetupCfgParser(ConfigParser):  # pylint: disable=too-many-ancestors
         return dict(x.split("=") for x in self.get_list(section, option))
 
 
+def version_info(version: str) -> tuple:
+    """Split a version string into its components _(like ``sys.version_info``)_.
+
+    :param version: PEP0440 version string
+    :type version: str
+
+    :return: major, minor, micro, release level and serial
+    :rtype: tuple
+    """
+    _v = search(
+        r"^([0-9]+)\.([0-9]+)(\.([0-9]+))*(([a-zA-z]+)([0-9]*))*$", version)
+    return (int(_v.group(1)) if _v.group(1) else 0,
+            int(_v.group(2)) if _v.group(2) else 0,
+            int(_v.group(4)) if _v.group(4) else 0,
+            str(_v.group(6)),
+            int(_v.group(7)) if _v.group(7) else 0)
+
+
+class BuildPyWithConstants(build_py):
+    """Build command also generating the ``__build__`` module of the package.
+
+    The module holds the constants otherwise parsed from `setup.cfg` at import
+    time _(see ``__constants__.py``)_ as plain literals.
+
+    """
+
+    def run(self):
+        super().run()
+        target = os_path.join(self.build_lib, _app_name_, "__build__.py")
+        self.mkpath(os_path.dirname(target))
+        self.announce(f"generating {target}", level=2)
+        if self.dry_run:
+            return
+        metadata = config["metadata"]
+        version = metadata.get("version", "0.0.0alpha0")
+        with open(target, "w", encoding="utf-8") as file:
+            file.write('"""Constants generated by setup.py when the package was built."""\n\n'
+                       f"__version__ = {version!r}\n"
+                       f"__version_info__ = {version_info(version)!r}\n"
+                       f"__author__ = {metadata.get('author', 'Unknown')!r}\n"
+                       f"__email__ = {metadata.get('author_email', '')!r}\n"
+                       f"__app_name__ = {_app_name_!r}\n"
+                       f"__description__ = {metadata.get('description', '')!r}\n")
+
+
 current_path = Path(__file__).parent.absolute()
 
 with open(str(PurePath(current_path, "README.md")), "r", encoding="utf-8") as f:
@@ -103,10 +150,11 @@ setup(name=_app_name_,
       packages=find_packages(where="app"),
       data_files=[
           (os_path.join("share", _app_name_, ".config"), ["setup.cfg"]),
-          (os_path.join("share", _app_name_, "examples"), [f"{_app_name_}.yml"])],
+          (os_path.join("share", _app_name_, "examples"), [f"{_app_name_}.yml", f"{_app_name_}.items.ndjson"])],
       include_package_data=True,
       license_files=["LICENSE", ],
       zip_safe=bool(config["options"].get("zip_safe", False)),
       python_requires=config["options"].get("python_requires", ">=3.6"),
       install_requires=config.get_list("options", "install_requires"),
+      cmdclass={"build_py": BuildPyWithConstants},
       )
@@ -4,23 +4,48 @@
 
 """
 
+from asyncio import gather, get_running_loop, new_event_loop, run as asyncio_run, sleep as asyncio_sleep
+from json import loads as json_loads
+from datetime import datetime, timedelta
 from errno import EINVAL
+from os import environ as os_environ, path as os_path, utime as os_utime
+from threading import Event, Thread
+from time import sleep
+from types import SimpleNamespace
 from sys import maxsize as sys_maxsize
 from random import seed as rnd_seed
 from random import randint as rnd_randint
 from fastapi import status
 from fastapi.testclient import TestClient
+from ecdsa import NIST256p, SigningKey as ECSigningKey
+from jose import JWTError, jwt
+from rsa import newkeys as rsa_newkeys
 
 import pytest
 
 from app.kapibara.api import app
 from app.kapibara.api import Kapibara
+from app.kapibara.api import Exceptionbara
 from app.kapibara.api import Kauthbara
+from app.kapibara.api import calibrate_bcrypt
+from app.kapibara.api import _export_items
+from app.kapibara.api import _load_items
+from app.kapibara.api import _pwd_context_conf
+from app.kapibara.api import reload_configuration
+from app.kapibara.shared.cache import CredentialCache
+from app.kapibara.shared.credentials import CredentialStore
+from app.kapibara.shared.httpcache import ResponseCache
+from app.kapibara.shared.items import Item, ItemStore
+from app.kapibara.shared.pool import WorkerPool
+from app.kapibara.shared.profiling import ProfilingMiddleware
 from app.kapibara.__constants__ import __app_name__
 from app.kapibara.__constants__ import __version__
 
 app.kauth = Kauthbara()
+for _item_id in (0, 7, 8, 11):
+    app.items.put(Item(_item_id, f"item {_item_id}", "Item served to the tests"))
 client = TestClient(app)
+bearer = {"Authorization": f"Bearer {app.kauth.create_access_token({'app': __app_name__}, timedelta(minutes=5))}"}
 
 
 @pytest.mark.parametrize(
@@ -39,6 +64,184 @@ def test_class_kauthbara_authenticate(username, password, expected_response):
                           password=password) == expected_response
 
 
+@pytest.mark.parametrize(
+    "username,password,expected_response",
+    [
+        ("this-username-is-wrong-for-sure", "", False),
+        (__app_name__, "this-is-the-wrong-password", False),
+        (__app_name__, __app_name__, True),
+    ],
+)
+def test_class_kauthbara_authenticate_async(username, password, expected_response):
+    """[TEST] Class Kauthbara - authenticate_async
+    """
+    k = Kauthbara(pool=WorkerPool(workers=1))
+    assert asyncio_run(k.authenticate_async(username=username,
+                                            password=password)) == expected_response
+    # the mocked user password is hashed on the pool the first time it is needed
+    assert k.pool.stats["completed"] == (0 if username != __app_name__ else 2)
+
+
+def test_class_kauthbara_mocked_password_hashed_once(monkeypatch):
+    """[TEST] Class Kauthbara - concurrent first logins hash the mocked user password once
+    """
+    k = Kauthbara(pool=WorkerPool(workers=4))
+
+    async def login_all():
+        return await gather(*(k.authenticate_async(__app_name__, __app_name__) for _ in range(3)))
+
+    assert asyncio_run(login_all()) == [True] * 3
+    assert k.pool.stats["completed"] == 1 + 3
+    hashed, get_password_hash = [], Kauthbara.get_password_hash
+
+    def slow_hash(self, password):
+        sleep(0.2)
+        hashed.append(password)
+        return get_password_hash(self, password)
+
+    monkeypatch.setattr(Kauthbara, "get_password_hash", slow_hash)
+    k = Kauthbara()
+    logins = [Thread(target=k.authenticate, args=(__app_name__, __app_name__)) for _ in range(3)]
+    for t in logins:
+        t.start()
+    for t in logins:
+        t.join()
+    assert hashed == [__app_name__]
+    assert k.authenticate(__app_name__, __app_name__)
+
+
+def test_class_kauthbara_warm_up(tmp_path):
+    """[TEST] Class Kauthbara - warm_up prepares the state upfront
+    """
+    k = Kauthbara(pool=WorkerPool(workers=1))
+    k.warm_up()
+    assert asyncio_run(k.authenticate_async(__app_name__, __app_name__))
+    # the mocked user password was already hashed: only the verification hit the pool
+    assert k.pool.stats["completed"] == 1
+    users = tmp_path / "kapibara.users"
+    users.write_text(f"alice:{k.get_password_hash('wonderland')}\n", encoding="utf-8")
+    k = Kauthbara(store=CredentialStore(str(users)))
+    k.warm_up()
+    assert "alice" in k.store
+
+
+def test_class_kauthbara_credential_store(tmp_path):
+    """[TEST] Class Kauthbara - users from a CredentialStore
+    """
+    users = tmp_path / "kapibara.users"
+    users.write_text(f"alice:{Kauthbara().get_password_hash('wonderland')}\n", encoding="utf-8")
+    k = Kauthbara(pool=WorkerPool(workers=1), store=CredentialStore(str(users)))
+    assert k.authenticate("alice", "wonderland")
+    assert asyncio_run(k.authenticate_async("alice", "wonderland"))
+    assert not asyncio_run(k.authenticate_async("alice", "looking-glass"))
+    assert not asyncio_run(k.authenticate_async(__app_name__, __app_name__))
+    assert k.get_stored_hash("nobody") is None
+
+
+def test_class_kauthbara_rehash(tmp_path):
+    """[TEST] Class Kauthbara - hashes of another bcrypt cost are updated on login
+    """
+    users = tmp_path / "kapibara.users"
+    old_hash = Kauthbara(pwd_context=_pwd_context_conf("bcrypt", 4)).get_password_hash("wonderland")
+    users.write_text(f"alice:{old_hash}\n", encoding="utf-8")
+    k = Kauthbara(pool=WorkerPool(workers=1), store=CredentialStore(str(users)),
+                  pwd_context=_pwd_context_conf("bcrypt", 5))
+    assert not asyncio_run(k.authenticate_async("alice", "looking-glass"))
+    assert k.get_stored_hash("alice") == old_hash
+    assert asyncio_run(k.authenticate_async("alice", "wonderland"))
+    new_hash = k.get_stored_hash("alice")
+    assert new_hash.startswith("$2b$05$")
+    assert f"alice:{new_hash}" in users.read_text(encoding="utf-8")
+    k = Kauthbara(store=CredentialStore(str(users)), pwd_context=_pwd_context_conf("bcrypt", 4))
+    assert k.authenticate("alice", "wonderland")
+    assert k.get_stored_hash("alice").startswith("$2b$04$")
+
+
+@pytest.mark.parametrize("scheme", ["scrypt", "pbkdf2_sha256"])
+def test_class_kauthbara_scheme(tmp_path, scheme):
+    """[TEST] Class Kauthbara - hashing scheme, bcrypt hashes still verified and updated
+    """
+    users = tmp_path / "kapibara.users"
+    users.write_text(f"alice:{Kauthbara().get_password_hash('wonderland')}\n", encoding="utf-8")
+    k = Kauthbara(store=CredentialStore(str(users)), pwd_context=_pwd_context_conf(scheme))
+    assert k.get_password_hash("wonderland").startswith(f"${scheme.replace('_', '-')}$")
+    assert k.get_stored_hash("alice").startswith("$2b$")
+    assert k.authenticate("alice", "wonderland")
+    assert k.get_stored_hash("alice").startswith(f"${scheme.replace('_', '-')}$")
+    assert k.authenticate("alice", "wonderland")
+    assert not k.authenticate("alice", "looking-glass")
+
+
+def test_calibrate_bcrypt():
+    """[TEST] Function calibrate_bcrypt
+    """
+    rounds, timings = calibrate_bcrypt(1.0, probe_rounds=5)
+    assert 4 <= rounds <= 5
+    assert timings[0][0] == 5
+    assert all(elapsed > 0.0 for _, elapsed in timings)
+    assert calibrate_bcrypt(0)[0] == 4
+
+
+def test_class_kauthbara_credential_cache():
+    """[TEST] Class Kauthbara - verified credentials are cached
+    """
+    k = Kauthbara(pool=WorkerPool(workers=1), credential_cache=CredentialCache())
+    assert k.authenticate(__app_name__, __app_name__)
+    assert k.authenticate(__app_name__, __app_name__)
+    assert asyncio_run(k.authenticate_async(__app_name__, __app_name__))
+    assert not asyncio_run(k.authenticate_async(__app_name__, "this-is-the-wrong-password"))
+    assert k.pool.stats["completed"] == 1
+    stats = k.credential_cache.stats
+    assert stats["hits"] == 2
+    assert stats["saved_seconds"] > 0.0
+    k.credential_cache.invalidate()
+    assert asyncio_run(k.authenticate_async(__app_name__, __app_name__))
+    assert k.pool.stats["completed"] == 2
+
+
+def test_class_kauthbara_verify_access_token():
+    """[TEST] Class Kauthbara - verify_access_token (& its cache)
+    """
+    k = Kauthbara(crypt_key="secret", token_cache_size=1)
+    token = k.create_access_token({"app": __app_name__}, timedelta(minutes=1))
+    claims = k.verify_access_token(token)
+    assert claims["app"] == __app_name__
+    assert k.verify_access_token(token) is claims
+    assert k.token_cache.stats["hits"] == 1
+    with pytest.raises(JWTError):
+        k.verify_access_token(token[:-2])
+    with pytest.raises(JWTError):
+        Kauthbara(crypt_key="another-secret").verify_access_token(token)
+    expired = k.create_access_token({"app": __app_name__}, timedelta(minutes=-1))
+    with pytest.raises(JWTError):
+        k.verify_access_token(expired)
+    with pytest.raises(JWTError):
+        k.verify_access_token(jwt.encode({"app": __app_name__}, "secret", algorithm="HS256"))
+    assert len(k.token_cache) == 1
+
+
+def test_class_kauthbara_asymmetric_tokens():
+    """[TEST] Class Kauthbara - tokens signed with asymmetric algorithms
+    """
+    rsa_public, rsa_private = rsa_newkeys(1024)
+    ec_private = ECSigningKey.generate(curve=NIST256p)
+    for algorithm, private_pem, public_pem in (
+            ("RS256", rsa_private.save_pkcs1().decode(), rsa_public.save_pkcs1().decode()),
+            ("ES256", ec_private.to_pem().decode(), ec_private.get_verifying_key().to_pem().decode()),
+    ):
+        signer = Kauthbara(crypt_key=private_pem, token_encode_algorithm=algorithm)
+        token = signer.create_access_token({"app": __app_name__}, timedelta(minutes=1))
+        assert jwt.get_unverified_header(token)["alg"] == algorithm
+        assert signer.verify_access_token(token)["app"] == __app_name__
+        assert jwt.decode(token, public_pem, algorithms=[algorithm])["app"] == __app_name__
+        verifier = Kauthbara(crypt_key=private_pem, token_encode_algorithm=algorithm, public_key=public_pem)
+        assert verifier.verify_access_token(token)["app"] == __app_name__
+        with pytest.raises(JWTError):
+            Kauthbara(crypt_key="secret").verify_access_token(token)
+    with pytest.raises(JWTError):
+        Kauthbara(crypt_key="secret", token_encode_algorithm="EdDSA")
+
+
 def test_class_kapibara_singleton():
     """[TEST] Class Kapibara is correctly behaving as a SINGLETON
     """
@@ -87,6 +290,48 @@ def test_class_kapibara_sanitize_configuration_errors():
     assert pytest_wrapped_e.value.code == EINVAL
 
 
+def test_class_kapibara_validate_configuration_scheme(monkeypatch):
+    """[TEST] Class Kapibara - unavailable hashing scheme
+    """
+    monkeypatch.setattr("app.kapibara.api._pwd_scheme_available", lambda scheme: False)
+    conf = Kapibara().read_configuration(__app_name__)
+    conf["crypt"]["scheme"] = "argon2"
+    with pytest.raises(Exceptionbara, match="argon2"):
+        Kapibara.validate_configuration(conf)
+
+
+def test_class_kapibara_validate_configuration_items_seed():
+    """[TEST] Class Kapibara - items seed file
+    """
+    conf = Kapibara().read_configuration(__app_name__)
+    assert conf["items"]["seed"] == f"{__app_name__}.items.ndjson"
+    Kapibara.validate_configuration(conf)
+    with open(Kapibara.resolve_path(conf["items"]["seed"]), "r", encoding="utf-8") as seed:
+        assert ItemStore().load_ndjson(seed) > 0
+    conf["items"]["seed"] = "this-items-file-does-not-exist"
+    with pytest.raises(Exceptionbara, match="items seed"):
+        Kapibara.validate_configuration(conf)
+
+
+def test_class_kapibara_sanitize_configuration_missing_users():
+    """[TEST] Class Kapibara - sanitize_configuration with a missing users file
+    """
+    k = Kapibara()
+    k.conf["server"] = {"addr": "localhost", "port": 8088}
+    k.conf["crypt"]["users"] = "this-users-file-does-not-exist"
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        k.sanitize_configuration()
+    k.conf["crypt"]["users"] = ""
+    assert pytest_wrapped_e.type == SystemExit
+    assert pytest_wrapped_e.value.code == EINVAL
+    k.conf["crypt"]["algorithm"] = "RS256"
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        k.sanitize_configuration()
+    k.conf["crypt"]["algorithm"] = "HS256"
+    assert pytest_wrapped_e.value.code == EINVAL
+    k.sanitize_configuration()
+
+
 def test_openapi_schema():
     """[TEST] OpenAPI schema is exposed correctly
     """
@@ -94,6 +339,47 @@ def test_openapi_schema():
     assert response.status_code == status.HTTP_200_OK, response.text
 
 
+def test_openapi_schema_etag():
+    """[TEST] OpenAPI schema has an ETag computed on startup
+    """
+    with TestClient(app) as started:
+        response = started.get("/openapi.json")
+        etag = response.headers["ETag"]
+        response = started.get("/openapi.json", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED, response.text
+        assert response.content == b""
+
+
+def test_startup_warm_up(monkeypatch):
+    """[TEST] startup - the state of the first logins is prepared off the event loop
+    """
+    loops = []
+
+    def warm_up(self):     # pylint: disable=unused-argument
+        try:
+            loops.append(get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+
+    monkeypatch.setattr(Kauthbara, "warm_up", warm_up)
+    with TestClient(app):
+        pass
+    assert loops == [None]
+
+
+@pytest.mark.parametrize("path", ["/", "/plaintext"])
+def test_static_routes_etag(path):
+    """[TEST] static routes answer 304 when If-None-Match matches their ETag
+    """
+    response = client.get(path)
+    etag = response.headers["ETag"]
+    assert client.get(path, headers={"If-None-Match": "\"something-else\""}).status_code == status.HTTP_200_OK
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED, response.text
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+
 def test_get_root():
     """[TEST] get_root
     """
@@ -110,6 +396,22 @@ def test_get_plaintext():
     assert response.text == "nothing more than text..."
 
 
+@pytest.mark.parametrize(
+    "method,path,expected_status,expected_response",
+    [
+        ("GET", "/this-path-does-not-exist", status.HTTP_404_NOT_FOUND, {"msg": "Not Found"}),
+        ("DELETE", "/", status.HTTP_405_METHOD_NOT_ALLOWED, {"msg": "Method Not Allowed"}),
+    ],
+)
+def test_standard_errors(method, path, expected_status, expected_response):
+    """[TEST] standard errors are served pre-encoded in the usual format
+    """
+    response = client.request(method, path)
+    assert response.status_code == expected_status, response.text
+    assert response.json() == expected_response
+    assert int(response.headers["content-length"]) == len(response.content)
+
+
 def test_post_token():
     """[TEST] post_token
     """
@@ -119,15 +421,39 @@ def test_post_token():
         "password": __app_name__,
     })
     assert response.status_code == status.HTTP_200_OK, response.text
-    json_with_time_insensitive_token_chunk = response.json()
-    print(json_with_time_insensitive_token_chunk["access_token"])
-    json_with_time_insensitive_token_chunk["access_token"] = \
-        ".".join(json_with_time_insensitive_token_chunk["access_token"].split(".", 2)[:2])[:-8]
-    print(json_with_time_insensitive_token_chunk["access_token"])
-    assert json_with_time_insensitive_token_chunk == {
-            "access_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJhcHAiOiJrYXBpYmFyYSIsImV4cCI6MTY0NjY",
-            "token_type": "bearer",
-        }
+    assert response.json()["token_type"] == "bearer"
+    token = response.json()["access_token"]
+    assert token.startswith("eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.")
+    claims = jwt.decode(token, "", algorithms=["HS256"])
+    assert claims["app"] == __app_name__
+    assert claims["sub"] == __app_name__
+    expires_in = claims["exp"] - datetime.utcnow().timestamp()
+    assert 0 < expires_in <= app.kauth.token_expiration * 60
+
+
+def test_post_token_busy():
+    """[TEST] post_token (503 - Hashing pool saturated)
+    """
+    saved_kauth = app.kauth
+    app.kauth = Kauthbara(pool=WorkerPool(workers=1, queue=0))
+    release = Event()
+    busy = Thread(target=asyncio_run, args=(app.kauth.pool.run(release.wait),))
+    busy.start()
+    while app.kauth.pool.pending < 1:
+        sleep(0.01)
+    try:
+        response = client.post("/token", data={
+            "grant_type": "password",
+            "username": __app_name__,
+            "password": __app_name__,
+        })
+    finally:
+        release.set()
+        busy.join()
+        app.kauth = saved_kauth
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE, response.text
+    assert response.headers["Retry-After"] == "1"
+    assert response.json() == {"msg": "Too many authentication requests, retry later"}
 
 
 #
@@ -221,14 +547,155 @@ def test_get_items():
     rnd_seed()
     for i in range(10):
         random_id = rnd_randint(-sys_maxsize, sys_maxsize)
+        item = app.items.put(Item(random_id, f"item {i}", None if i % 2 else "description", i + 1))
         response = client.get(f"/items/{random_id}",
                               params=params[i],
-                              headers={"Authorization": "Bearer footokenbar"})
+                              headers=bearer)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.json() == {**item.as_dict(), "q": params[i].get("q")}
+        app.items.delete(random_id)
+
+
+def test_get_items_not_found():
+    """[TEST] get_items (404 - Not Found)
+    """
+    response = client.get("/items/404", headers=bearer)
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+    assert response.json() == {"msg": "Item not found"}
+
+
+def test_get_items_etag():
+    """[TEST] get_items (304 - Not Modified)
+    """
+    response = client.get("/items/7", params={"q": "kapibara"}, headers=bearer)
+    etag = response.headers["ETag"]
+    assert etag.startswith("W/")
+    assert client.get("/items/7", params={"q": "other"}, headers=bearer).headers["ETag"] != etag
+    assert client.get("/items/8", params={"q": "kapibara"}, headers=bearer).headers["ETag"] != etag
+    response = client.get("/items/7", params={"q": "kapibara"}, headers={**bearer, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED, response.text
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    # the token is verified anyway
+    response = client.get("/items/7", params={"q": "kapibara"}, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
+    # a new version of the item gets a new tag
+    app.items.put(Item(7, "item 7", "Item served to the tests", version=2))
+    try:
+        response = client.get("/items/7", params={"q": "kapibara"}, headers={**bearer, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.headers["ETag"] != etag
+        assert response.json()["version"] == 2
+        # so does any change to the repository, even one keeping the version
+        etag = response.headers["ETag"]
+        app.items.put(Item(7, "item 7 renamed", "Item served to the tests", version=2))
+        response = client.get("/items/7", params={"q": "kapibara"}, headers={**bearer, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.json()["name"] == "item 7 renamed"
+    finally:
+        app.items.put(Item(7, "item 7", "Item served to the tests"))
+
+
+def test_get_items_response_cache():
+    """[TEST] get_items - responses cached per token subject
+    """
+    alice = {"Authorization": f"Bearer {app.kauth.create_access_token({'sub': 'alice'}, timedelta(minutes=5))}"}
+    bob = {"Authorization": f"Bearer {app.kauth.create_access_token({'sub': 'bob'}, timedelta(minutes=5))}"}
+    app.response_cache.configure(size=16)
+    try:
+        for headers in (alice, alice, bob):
+            response = client.get("/items/11", params={"q": "kapibara"}, headers=headers)
+            assert response.status_code == status.HTTP_200_OK, response.text
+            assert response.json() == {**app.items.get(11).as_dict(), "q": "kapibara"}
+        stats = app.response_cache.stats
+        assert (stats["size"], stats["hits"]) == (2, 1)
+        response = client.get("/items/11", params={"q": "kapibara"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
+        # writes to the repository are never served stale
+        app.items.put(Item(11, "item 11 renamed", "Item served to the tests"))
+        response = client.get("/items/11", params={"q": "kapibara"}, headers=alice)
+        assert response.json()["name"] == "item 11 renamed"
+        app.items.delete(11)
+        response = client.get("/items/11", params={"q": "kapibara"}, headers=alice)
+        assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+        assert app.response_cache.stats["hits"] == 1
+        assert app.response_cache.invalidate(path="/items/11") == 3
+    finally:
+        app.items.put(Item(11, "item 11", "Item served to the tests"))
+        app.response_cache.configure(size=0)
+
+
+def test_post_items_batch():
+    """[TEST] post_items_batch
+    """
+    response = client.post("/items/batch", json={"ids": [7, 404, 0, 7, -1]}, headers=bearer)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json() == {
+        "items": [app.items.get(7).as_dict(), app.items.get(0).as_dict(), app.items.get(7).as_dict()],
+        "missing": [404, -1],
+    }
+    response = client.post("/items/batch", json={"ids": [404]}, headers=bearer)
+    assert response.json() == {"items": [], "missing": [404]}
+
+
+@pytest.mark.parametrize(
+    "body,headers,expected_status",
+    [
+        ({"ids": [0]}, {}, status.HTTP_401_UNAUTHORIZED),
+        ({"ids": []}, bearer, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        ({"ids": list(range(1001))}, bearer, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        ({"ids": ["string"]}, bearer, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        ({}, bearer, status.HTTP_422_UNPROCESSABLE_ENTITY),
+    ],
+)
+def test_post_items_batch_errors(body, headers, expected_status):
+    """[TEST] post_items_batch (401 - Not Authenticated, 422 - Validation error)
+    """
+    response = client.post("/items/batch", json=body, headers=headers)
+    assert response.status_code == expected_status, response.text
+
+
+def test_get_items_export():
+    """[TEST] get_items_export
+    """
+    def export(**params):
+        response = client.get("/items/export", params=params, headers=bearer)
         assert response.status_code == status.HTTP_200_OK, response.text
-        assert response.json() == (
-            {"item_id": random_id, "q": params[i]["q"]}
-            if params[i] else
-            {"item_id": random_id, "q": None})
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+        return [json_loads(line) for line in response.text.splitlines()]
+
+    assert export() == [item.as_dict() for item in app.items.items()]
+    assert [item["item_id"] for item in export(cursor=7)] == [8, 11]
+    assert [item["item_id"] for item in export(q="ITEM 1")] == [11]
+    assert [item["item_id"] for item in export(q="served", cursor=0)] == [7, 8, 11]
+    assert export(q="nothing like this") == []
+    app.response_cache.configure(size=16)
+    try:
+        assert export() == export()
+        assert app.response_cache.stats["size"] == 0
+    finally:
+        app.response_cache.configure(size=0)
+    response = client.get("/items/export")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
+    response = client.get("/items/export", params={"cursor": "string"}, headers=bearer)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, response.text
+
+
+def test_export_items_chunks():
+    """[TEST] _export_items - one chunk of lines at a time
+    """
+    async def collect(*args, **kwargs):
+        return [chunk async for chunk in _export_items(*args, **kwargs)]
+
+    store = ItemStore()
+    for item_id in range(10):
+        store.put(Item(item_id, f"ïtem {item_id}", "even" if item_id % 2 == 0 else None))
+    chunks = asyncio_run(collect(store, None, None, chunk=3))
+    assert [len(chunk.splitlines()) for chunk in chunks] == [3, 3, 3, 1]
+    assert json_loads(chunks[0].splitlines()[0]) == store.get(0).as_dict()
+    chunks = asyncio_run(collect(store, "EVEN", 3, chunk=3))
+    assert [[json_loads(line)["item_id"] for line in chunk.splitlines()] for chunk in chunks] == [[4, 6], [8]]
+    assert asyncio_run(collect(store, "odd", None, chunk=3)) == []
 
 
 def test_get_items_forbidden():
@@ -239,9 +706,194 @@ def test_get_items_forbidden():
     assert response.json() == {"msg": "Not authenticated"}
 
 
+@pytest.mark.parametrize(
+    "token",
+    [
+        "footokenbar",
+        Kauthbara(crypt_key="another-secret").create_access_token({"app": __app_name__}, timedelta(minutes=5)),
+        app.kauth.create_access_token({"app": __app_name__}, timedelta(minutes=-5)),
+    ],
+)
+def test_get_items_invalid_token(token):
+    """[TEST] get_items (401 - Invalid or expired token)
+    """
+    response = client.get("/items/0", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+    assert response.json() == {"msg": "Invalid or expired token"}
+
+
 def test_get_items_validation():
     """[TEST] get_items (422 - Validation error)
     """
     response = client.get("/items/string",
-                          headers={"Authorization": "Bearer footokenbar"})
+                          headers=bearer)
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, response.text
+
+
+def test_reload_configuration(monkeypatch):
+    """[TEST] reload_configuration - live keys are applied, invalid configurations rejected
+    """
+    k = Kapibara()
+    target = SimpleNamespace(kapi=k, kauth=Kauthbara(), response_cache=ResponseCache(principal=lambda s: None))
+    cache_stats = target.response_cache.stats
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "7")
+    monkeypatch.setenv("CRYPT_TOKEN_CACHE", "3")
+    monkeypatch.setenv("SERVER_ADDR", "this-takes-effect-on-restart")
+    changed = reload_configuration(target)
+    assert changed["response_cache.size"][1] == 7
+    assert changed["crypt.token_cache"][1] == 3
+    assert "server.addr" not in changed
+    assert k.conf["response_cache"]["size"] == 7
+    assert k.server_addr != "this-takes-effect-on-restart"
+    assert target.response_cache.stats["maxsize"] == 7 != cache_stats["maxsize"]
+    assert target.kauth.token_cache.maxsize == 3
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "-1")
+    assert not reload_configuration(target)
+    assert k.conf["response_cache"]["size"] == 7
+    monkeypatch.delenv("RESPONSE_CACHE_SIZE")
+    monkeypatch.delenv("CRYPT_TOKEN_CACHE")
+    changed = reload_configuration(target)
+    assert set(changed) == {"response_cache.size", "crypt.token_cache"}
+    assert k.conf_file.endswith(f"{__app_name__}.yml")
+
+
+def test_reload_configuration_on_loop(monkeypatch):
+    """[TEST] reload_configuration - caches in use are replaced on the event loop serving the requests
+    """
+    k = Kapibara()
+    target = SimpleNamespace(kapi=k, kauth=Kauthbara(), response_cache=ResponseCache(principal=lambda s: None))
+    token_cache = target.kauth.token_cache
+    monkeypatch.setenv("CRYPT_TOKEN_CACHE", "3")
+    loop = new_event_loop()
+    try:
+        watcher = Thread(target=reload_configuration, args=(target, loop))
+        watcher.start()
+        watcher.join()
+        assert target.kauth.token_cache is token_cache
+        loop.run_until_complete(asyncio_sleep(0))
+        assert target.kauth.token_cache.maxsize == 3
+    finally:
+        loop.close()
+
+
+def test_reload_configuration_environment_file(monkeypatch, tmp_path):
+    """[TEST] reload_configuration - the environment file is read again, below the process environment
+    """
+    env_file = tmp_path / f".env-{__app_name__}"
+    monkeypatch.setattr(Kapibara, "environment_file", staticmethod(lambda: str(env_file)))
+    k = Kapibara()
+    target = SimpleNamespace(kapi=k, kauth=Kauthbara(), response_cache=ResponseCache(principal=lambda s: None))
+    env_file.write_text("RESPONSE_CACHE_SIZE=5\nCRYPT_TOKEN_CACHE=6\n")
+    monkeypatch.setenv("CRYPT_TOKEN_CACHE", "2")
+    changed = reload_configuration(target)
+    assert changed["response_cache.size"][1] == 5
+    assert changed["crypt.token_cache"][1] == 2
+    assert "RESPONSE_CACHE_SIZE" not in os_environ
+    env_file.write_text("")
+    monkeypatch.delenv("CRYPT_TOKEN_CACHE")
+    changed = reload_configuration(target)
+    assert set(changed) == {"response_cache.size", "crypt.token_cache"}
+    assert k.conf["response_cache"]["size"] != 5
+
+
+def test_get_metrics():
+    """[TEST] GET /metrics - requests and operations are exposed in the Prometheus format
+    """
+    client.get("/plaintext")
+    client.post("/token", data={"grant_type": "password", "username": __app_name__, "password": __app_name__})
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert 'kapibara_http_requests_total{route="/plaintext",code="200"}' in response.text
+    assert 'kapibara_operation_duration_seconds_count{operation="token_encode"}' in response.text
+    assert 'kapibara_operation_duration_seconds_count{operation="password_verify"}' in response.text
+    assert 'kapibara_pool_completed_total{worker="0"}' in response.text
+    assert "kapibara_credential_cache_" not in response.text
+    app.kauth.credential_cache = CredentialCache()
+    try:
+        for _ in range(2):
+            client.post("/token", data={"grant_type": "password", "username": __app_name__, "password": __app_name__})
+        response = client.get("/metrics")
+        assert 'kapibara_credential_cache_hits_total{worker="0"} 1\n' in response.text
+        assert 'kapibara_credential_cache_misses_total{worker="0"} 1\n' in response.text
+        assert 'kapibara_credential_cache_evictions_total{worker="0"} 0\n' in response.text
+        assert "# TYPE kapibara_credential_cache_size gauge\n" in response.text
+    finally:
+        app.kauth.credential_cache = None
+
+
+def test_get_plaintext_profile(monkeypatch, tmp_path):
+    """[TEST] GET /plaintext - requests are profiled on demand in DEBUG mode only
+    """
+    response = client.get("/plaintext", headers={"X-Kapibara-Profile": "1"})
+    assert "X-Kapibara-Profile" not in response.headers
+    # profiles are written to a temporary directory instead of the one shared by the system
+    middleware = app.middleware_stack
+    while not isinstance(middleware, ProfilingMiddleware):
+        middleware = middleware.app
+    monkeypatch.setattr(middleware, "directory", str(tmp_path))
+    monkeypatch.setattr(app, "kapi", SimpleNamespace(is_debug=True), raising=False)
+    response = client.get("/plaintext", headers={"X-Kapibara-Profile": "1"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.text == "nothing more than text..."
+    assert response.headers["X-Kapibara-Profile"].endswith("-GET-plaintext.txt")
+    assert response.headers["X-Kapibara-Profile"].startswith(str(tmp_path))
+
+
+def test_post_token_rate_limited():
+    """[TEST] POST /token - attempts over the limit are answered 429 before any hashing
+    """
+    limiter = app.token_limiters["username"]
+    limiter.configure(rate=0.01, burst=2)
+    try:
+        for password in ("this-is-the-wrong-password", __app_name__):
+            response = client.post("/token", data={"grant_type": "password", "username": __app_name__, "password": password})
+            assert response.status_code != status.HTTP_429_TOO_MANY_REQUESTS, response.text
+        response = client.post("/token", data={"grant_type": "password", "username": __app_name__, "password": __app_name__})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS, response.text
+        assert response.json() == {"msg": "Too many login attempts, retry later"}
+        assert int(response.headers["Retry-After"]) >= 99
+        response = client.post("/token", data={"grant_type": "password", "username": "someone-else", "password": __app_name__})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED, response.text
+        # the username is only limited for the client address that used up its bucket
+        assert limiter.acquire(f"testclient {__app_name__}")
+        assert not limiter.acquire(f"192.0.2.1 {__app_name__}")
+    finally:
+        limiter.configure()
+
+
+def test_post_token_rate_limited_account():
+    """[TEST] POST /token - attempts by username from any client address have their own limit
+    """
+    limiter = app.token_limiters["account"]
+    limiter.configure(rate=0.01, burst=1)
+    try:
+        response = client.post("/token", data={"grant_type": "password", "username": __app_name__, "password": __app_name__})
+        assert response.status_code == status.HTTP_200_OK, response.text
+        response = client.post("/token", data={"grant_type": "password", "username": __app_name__, "password": __app_name__})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS, response.text
+    finally:
+        limiter.configure()
+
+
+def test_load_items_seed_written_once(monkeypatch, tmp_path):
+    """[TEST] _load_items - the seed is parsed and written to the item file once, then mapped
+    """
+    path, seed = str(tmp_path / "items.db"), tmp_path / "items.ndjson"
+    seed.write_text('{"item_id": 1, "name": "item 1"}\n{"item_id": 2, "name": "item 2"}\n')
+    parsed = []
+    load_ndjson = ItemStore.load_ndjson
+    monkeypatch.setattr(ItemStore, "load_ndjson", lambda self, lines: parsed.append(seed) or load_ndjson(self, lines))
+    assert len(_load_items("", str(seed))) == 2
+    assert len(parsed) == 1
+    items = _load_items(path, str(seed))
+    assert len(items) == 2 and len(parsed) == 2
+    # the second start maps the file written by the first one
+    items = _load_items(path, str(seed))
+    assert items.get(2) == Item(2, "item 2")
+    assert len(parsed) == 2
+    seed.write_text('{"item_id": 3, "name": "item 3"}\n')
+    os_utime(seed, (os_path.getmtime(path) + 1,) * 2)
+    assert list(_load_items(path, str(seed)).ids()) == [1, 2, 3]
+    assert len(parsed) == 3
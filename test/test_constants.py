@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST __constants__.py
+
+"""
+
+from configparser import ConfigParser
+
+from app.kapibara import __constants__ as constants
+
+
+def test_constants_from_setup_cfg():
+    """[TEST] constants match setup.cfg _(source checkout)_
+    """
+    config = ConfigParser()
+    config.read("setup.cfg")
+    assert constants.__version__ == config["metadata"]["version"]
+    assert constants.__app_name__ == config["metadata"]["name"]
+    assert constants.__version_info__[:3] == tuple(int(n) for n in constants.__version__.split(".")[:3])
+
+
+def test_version_info():
+    """[TEST] _version_info
+    """
+    assert constants._version_info("1.2") == (1, 2, 0, "None", 0)  # pylint: disable=protected-access
+    assert constants._version_info("1.2.3rc4") == (1, 2, 3, "rc", 4)    # pylint: disable=protected-access
+
+
+def test_from_setup_cfg(tmp_path):
+    """[TEST] _from_setup_cfg - missing file or metadata section
+    """
+    assert constants._from_setup_cfg(str(tmp_path / "setup.cfg")) is None  # pylint: disable=protected-access
+    (tmp_path / "setup.cfg").write_text("[options]\nzip_safe = False\n")
+    assert constants._from_setup_cfg(str(tmp_path / "setup.cfg")) is None  # pylint: disable=protected-access
+    (tmp_path / "setup.cfg").write_text("[metadata]\nname = other\nversion = 9.8.7\n")
+    assert constants._from_setup_cfg(str(tmp_path / "setup.cfg")) == (  # pylint: disable=protected-access
+        "9.8.7", "Unknown", "", "other", "")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/cache.py
+
+"""
+
+import pytest
+
+from app.kapibara.shared import cache
+
+
+class FakeClock:    # pylint: disable=too-few-public-methods
+    """Manually advanced clock
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_eviction():
+    """[TEST] LRUCache - LRU eviction
+    """
+    c = cache.LRUCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)
+    assert "b" not in c
+    assert c.get("b", "missing") == "missing"
+    assert len(c) == 2
+    assert c.stats == {"size": 2, "maxsize": 2, "weight": 0, "maxweight": None,
+                       "hits": 1, "misses": 1, "evictions": 1, "expirations": 0}
+    assert c.pop("a") == 1
+    assert c.pop("a") is None
+    assert c.pop_if(lambda k: k == "c") == 1
+    c.set("d", 4)
+    c.clear()
+    assert len(c) == 0
+    with pytest.raises(ValueError):
+        cache.LRUCache(maxsize=-1)
+
+
+def test_lru_cache_weight():
+    """[TEST] LRUCache - eviction by total weight
+    """
+    c = cache.LRUCache(maxsize=10, maxweight=100)
+    c.set("a", "a", weight=40)
+    c.set("b", "b", weight=40)
+    c.get("a")
+    c.set("c", "c", weight=40)
+    assert "b" not in c
+    assert c.stats["weight"] == 80
+    c.set("a", "A", weight=10)
+    assert c.stats["weight"] == 50
+    c.set("huge", "huge", weight=101)
+    assert "huge" not in c
+    assert c.pop("c") == "c"
+    assert c.stats["weight"] == 10
+    assert c.pop_if(lambda k: True) == 1
+    assert c.stats["weight"] == 0
+    with pytest.raises(ValueError):
+        cache.LRUCache(maxweight=-1)
+
+
+def test_lru_cache_expiration():
+    """[TEST] LRUCache - TTL & explicit expiration
+    """
+    clock = FakeClock()
+    c = cache.LRUCache(maxsize=10, ttl=5, clock=clock)
+    c.set("ttl", 1)
+    c.set("short", 2, ttl=1)
+    c.set("at", 3, expires_at=clock.now + 20)
+    c.set("forever", 4, ttl=None)
+    clock.now += 2
+    assert c.get("short") is None
+    assert c.get("ttl") == 1
+    clock.now += 4
+    assert "ttl" not in c
+    assert c.get("at") == 3
+    clock.now += 100
+    assert c.get("at") is None
+    assert c.stats["expirations"] == 2
+    disabled = cache.LRUCache(maxsize=0)
+    disabled.set("a", 1)
+    assert len(disabled) == 0
+
+
+def test_credential_cache():
+    """[TEST] CredentialCache - hits, invalidation & stats
+    """
+    c = cache.CredentialCache(maxsize=4, ttl=60)
+    assert not c.check("user", "secret", "$hash$1")
+    c.add("user", "secret", "$hash$1", cost=0.25)
+    assert c.check("user", "secret", "$hash$1")
+    assert not c.check("user", "wrong", "$hash$1")
+    assert not c.check("other", "secret", "$hash$1")
+    # the stored hash changed: the entry is dropped at once
+    assert not c.check("user", "secret", "$hash$2")
+    assert not c.check("user", "secret", "$hash$1")
+    c.add("user", "secret", "$hash$2")
+    c.add("other", "secret", "$hash$3")
+    assert c.invalidate("user") == 1
+    assert len(c) == 1
+    assert c.invalidate() == 1
+    stats = c.stats
+    assert stats["hits"] == 1
+    assert stats["invalidations"] == 3
+    assert stats["saved_seconds"] == 0.25
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/conditional.py
+
+"""
+
+from asyncio import run as asyncio_run
+
+import pytest
+
+from app.kapibara.shared import conditional
+
+
+def test_make_etag():
+    """[TEST] make_etag
+    """
+    etag = conditional.make_etag(b"body")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == conditional.make_etag(b"body")
+    assert etag != conditional.make_etag(b"other body")
+
+
+@pytest.mark.parametrize(
+    "if_none_match,etag,expected_response",
+    [
+        (None, '"a"', False),
+        ("", '"a"', False),
+        ("*", '"a"', True),
+        ('"a"', '"a"', True),
+        ('"b", "a"', '"a"', True),
+        ('W/"a"', '"a"', True),
+        ('"a"', 'W/"a"', True),
+        ('"b"', '"a"', False),
+    ],
+)
+def test_etag_matches(if_none_match, etag, expected_response):
+    """[TEST] etag_matches
+    """
+    assert conditional.etag_matches(if_none_match, etag) == expected_response
+
+
+def test_conditional_get_middleware():
+    """[TEST] ConditionalGetMiddleware - 304 without running the app
+    """
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"static"})
+
+    def request(path, headers=(), method="GET"):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": method, "path": path, "headers": list(headers)}
+        asyncio_run(middleware(scope, None, send))
+        return messages[0]["status"], dict(messages[0]["headers"])
+
+    middleware = conditional.ConditionalGetMiddleware(app, etags={"/static": '"v1"'})
+    assert request("/static") == (200, {b"etag": b'"v1"'})
+    assert request("/static", [(b"if-none-match", b'"v0"')]) == (200, {b"etag": b'"v1"'})
+    assert len(calls) == 2
+    assert request("/static", [(b"if-none-match", b'"v1"')]) == (304, {b"etag": b'"v1"'})
+    assert len(calls) == 2
+    assert request("/dynamic", [(b"if-none-match", b'"v1"')]) == (200, {})
+    assert request("/static", [(b"if-none-match", b'"v1"')], method="POST") == (200, {})
+    assert len(calls) == 4
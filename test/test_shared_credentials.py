@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/credentials.py
+
+"""
+
+from os import replace as os_replace
+from sys import getswitchinterval, setswitchinterval
+from threading import Event, Thread
+from time import sleep
+
+import pytest
+
+from app.kapibara.shared import credentials
+
+
+def write_users(path, content):
+    """Atomically (re)write a users file
+    """
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os_replace(tmp, path)
+
+
+def test_credential_store_get(tmp_path):
+    """[TEST] CredentialStore - lookups
+    """
+    users = tmp_path / "kapibara.users"
+    write_users(users, "# comment\n\nalice:$2b$12$alicehash\nbob:$2b$12$bobhash  \nbroken-line\ncarol:$2b$04$carol")
+    store = credentials.CredentialStore(str(users), check_interval=None)
+    assert store.get("alice") == "$2b$12$alicehash"
+    assert store.get("bob") == "$2b$12$bobhash"
+    assert store.get("carol") == "$2b$04$carol"
+    assert store.get("broken-line") is None
+    assert store.get("# comment") is None
+    assert store.get("dave") is None
+    assert "alice" in store
+    assert len(store) == 3
+    store.close()
+    assert store.get("alice") == "$2b$12$alicehash"
+
+
+def test_credential_store_close_concurrent(tmp_path):
+    """[TEST] CredentialStore - closing does not break the lookups in flight
+    """
+    users = tmp_path / "kapibara.users"
+    write_users(users, "".join(f"user{n}:$2b$12$hash{n}\n" for n in range(100)))
+    store = credentials.CredentialStore(str(users), check_interval=None)
+    stop, errors = Event(), []
+
+    def lookups():
+        try:
+            while not stop.is_set():
+                assert store.get("user99") == "$2b$12$hash99"
+        except Exception as err:    # pylint: disable=broad-except
+            errors.append(err)
+
+    readers = [Thread(target=lookups) for _ in range(4)]
+    for t in readers:
+        t.start()
+    interval = getswitchinterval()
+    setswitchinterval(1e-6)     # switch threads as often as possible, right in the middle of lookups
+    try:
+        for _ in range(300):
+            store.close()
+            sleep(0)
+    finally:
+        setswitchinterval(interval)
+        stop.set()
+        for t in readers:
+            t.join()
+    assert not errors
+
+
+def test_credential_store_reload(tmp_path):
+    """[TEST] CredentialStore - changes of the file are picked up
+    """
+    users = tmp_path / "kapibara.users"
+    write_users(users, "")
+    store = credentials.CredentialStore(str(users), check_interval=0)
+    assert len(store) == 0
+    write_users(users, "alice:$2b$12$first\n")
+    assert store.get("alice") == "$2b$12$first"
+    write_users(users, "alice:$2b$12$second-and-longer\nbob:$2b$12$bob\n")
+    assert store.get("alice") == "$2b$12$second-and-longer"
+    lazy = credentials.CredentialStore(str(users), check_interval=None)
+    assert len(lazy) == 2
+    write_users(users, "carol:$2b$12$carol\n")
+    assert lazy.get("carol") is None
+    lazy.reload()
+    assert lazy.get("carol") == "$2b$12$carol"
+    assert lazy.get("alice") is None
+
+
+def test_credential_store_update(tmp_path):
+    """[TEST] CredentialStore - hashes are replaced atomically
+    """
+    users = tmp_path / "kapibara.users"
+    write_users(users, "# alice:commented\nalice:$2b$12$alicehash\nbob:$2b$12$bobhash\n")
+    store = credentials.CredentialStore(str(users), check_interval=None)
+    store.update("alice", "$2b$10$newhash")
+    assert store.get("alice") == "$2b$10$newhash"
+    assert store.get("bob") == "$2b$12$bobhash"
+    assert users.read_text(encoding="utf-8") == "# alice:commented\nalice:$2b$10$newhash\nbob:$2b$12$bobhash\n"
+    with pytest.raises(KeyError):
+        store.update("carol", "$2b$10$carolhash")
+    assert [p.name for p in tmp_path.iterdir()] == ["kapibara.users"]
+
+
+def test_credential_store_duplicates(tmp_path):
+    """[TEST] CredentialStore - the first line of a username counts, for lookups as for updates
+    """
+    users = tmp_path / "kapibara.users"
+    write_users(users, "alice:$2b$12$firsthash\nbob:$2b$12$bobhash\nalice:$2b$12$secondhash\n")
+    store = credentials.CredentialStore(str(users), check_interval=None)
+    assert len(store) == 2
+    assert store.get("alice") == "$2b$12$firsthash"
+    store.update("alice", "$2b$10$newhash")
+    assert store.get("alice") == "$2b$10$newhash"
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/httpcache.py
+
+"""
+
+from asyncio import run as asyncio_run
+
+from app.kapibara.shared import httpcache
+
+
+def _principal(scope):
+    return dict(scope["headers"]).get(b"x-user")
+
+
+def _request(middleware, path, query=b"", user=b"alice", headers=()):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query,
+             "headers": [(b"x-user", user), *headers] if user else list(headers)}
+    asyncio_run(middleware(scope, None, send))
+    return messages[0]["status"], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def test_response_cache_middleware():
+    """[TEST] ResponseCacheMiddleware - hits skip the app, keys are scoped
+    """
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        status = 404 if scope["path"].endswith("/404") else 200
+        await send({"type": "http.response.start", "status": status, "headers": [(b"etag", b'"v1"')]})
+        await send({"type": "http.response.body", "body": b"chunk-", "more_body": True})
+        await send({"type": "http.response.body", "body": scope["path"].encode()})
+
+    cache = httpcache.ResponseCache(principal=_principal, size=10)
+    cache.add_route("/items/{item_id}")
+    middleware = httpcache.ResponseCacheMiddleware(app, cache)
+    assert _request(middleware, "/items/1", b"q=a&b=c") == (200, b"chunk-/items/1")
+    assert _request(middleware, "/items/1", b"b=c&q=a") == (200, b"chunk-/items/1")
+    assert len(calls) == 1
+    # other principals, other queries, anonymous requests and other routes are not served from the cache
+    _request(middleware, "/items/1", b"q=a&b=c", user=b"bob")
+    _request(middleware, "/items/1", b"q=b")
+    _request(middleware, "/items/1", b"q=a&b=c", user=None)
+    _request(middleware, "/other", b"")
+    _request(middleware, "/other", b"")
+    assert len(calls) == 6
+    # errors are not cached
+    _request(middleware, "/items/404")
+    _request(middleware, "/items/404")
+    assert len(calls) == 8
+    # hits are revalidated against If-None-Match
+    assert _request(middleware, "/items/1", b"q=a&b=c", headers=[(b"if-none-match", b'"v1"')]) == (304, b"")
+    assert len(calls) == 8
+    assert cache.stats["hits"] == 2
+    assert cache.invalidate(path="/items/1", principal=b"bob") == 1
+    assert cache.invalidate(path="/items/1") == 2
+    _request(middleware, "/items/1", b"q=a&b=c")
+    assert len(calls) == 9
+
+
+def test_response_cache_limits():
+    """[TEST] ResponseCache - memory cap & disabled cache
+    """
+    cache = httpcache.ResponseCache(principal=_principal, size=10, memory=100)
+    cache.add_route("/items/{item_id}")
+    scope = {"type": "http", "method": "GET", "path": "/items/1", "query_string": b"", "headers": [(b"x-user", b"a")]}
+    key = cache.key(scope)
+    cache.set(key, 200, [], b"x" * 101)
+    assert cache.get(key) is None
+    cache.set(key, 200, [(b"etag", b'"v1"')], b"x" * 50)
+    assert cache.get(key) == (200, [(b"etag", b'"v1"')], b"x" * 50)
+    assert cache.stats["weight"] == 58
+    assert cache.key({**scope, "method": "POST"}) is None
+    # routes with a generation are keyed by it
+    generation = [0]
+    cache.add_route("/versioned/{item_id}", generation=lambda: generation[0])
+    versioned = {**scope, "path": "/versioned/1"}
+    key = cache.key(versioned)
+    cache.set(key, 200, [], b"v0")
+    assert cache.get(cache.key(versioned)) == (200, [], b"v0")
+    generation[0] += 1
+    assert cache.key(versioned) != key
+    assert cache.get(cache.key(versioned)) is None
+    cache.configure(size=0)
+    assert cache.key(scope) is None
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/items.py
+
+"""
+
+import pytest
+
+from app.kapibara.shared import items
+
+
+def test_item_repository_abstract():
+    """[TEST] ItemRepository - storage engines must implement the whole interface
+    """
+    class Partial(items.ItemRepository):   # pylint: disable=abstract-method
+        """Storage engine missing most of the interface
+        """
+        def get(self, item_id):
+            return None
+
+    with pytest.raises(TypeError):
+        items.ItemRepository()   # pylint: disable=abstract-class-instantiated
+    with pytest.raises(TypeError):
+        Partial()   # pylint: disable=abstract-class-instantiated
+    assert isinstance(items.ItemStore(), items.ItemRepository)
+
+
+def test_item_store_memory():
+    """[TEST] ItemStore - in memory
+    """
+    store = items.ItemStore()
+    for item_id in (5, 3, 9, -2):
+        store.put(items.Item(item_id, f"item {item_id}", None if item_id == 3 else "description"))
+    assert len(store) == 4
+    assert store.generation == 4
+    assert store.get(3) == items.Item(3, "item 3")
+    assert store.get(4) is None
+    assert 9 in store and 4 not in store
+    assert list(store.ids()) == [-2, 3, 5, 9]
+    assert list(store.ids(after=3)) == [5, 9]
+    assert store.get_many([9, 4, 3]) == [store.get(9), None, store.get(3)]
+    assert [item.name for item in store.items(after=-3)] == ["item -2", "item 3", "item 5", "item 9"]
+    store.put(items.Item(5, "item 5", version=2))
+    assert len(store) == 4
+    assert store.get(5).as_dict() == {"item_id": 5, "name": "item 5", "description": None, "version": 2}
+    assert store.delete(5)
+    assert not store.delete(5)
+    assert store.generation == 6
+    assert list(store.ids()) == [-2, 3, 9]
+    assert len(store) == 3
+    with pytest.raises(ValueError):
+        store.save()
+
+
+def test_item_repository_load_ndjson():
+    """[TEST] ItemRepository - load_ndjson
+    """
+    store = items.ItemStore()
+    lines = ['{"item_id": 2, "name": "item 2", "description": "déscription", "version": 3}\n',
+             "\n",
+             '{"item_id": 1, "name": "item 1", "q": null}\n']
+    assert store.load_ndjson(lines) == 2
+    assert list(store.items()) == [items.Item(1, "item 1"), items.Item(2, "item 2", "déscription", 3)]
+    for line in ('{"name": "no ID"}', '{"item_id": "x", "name": "bad ID"}', "not json"):
+        with pytest.raises(ValueError, match="Line 2"):
+            store.load_ndjson(["", line])
+
+
+def test_item_store_file(tmp_path):
+    """[TEST] ItemStore - saved to a file and memory mapped
+    """
+    path = str(tmp_path / "items.db")
+    store = items.ItemStore(path)
+    assert len(store) == 0
+    for item_id in range(0, 100, 10):
+        store.put(items.Item(item_id, f"ïtem {item_id}", None if item_id % 20 else f"déscription {item_id}"))
+    store.save()
+    mapped = items.ItemStore(path)
+    assert len(mapped) == 10
+    assert mapped.get(20) == items.Item(20, "ïtem 20", "déscription 20")
+    assert mapped.get(30) == items.Item(30, "ïtem 30")
+    assert mapped.get(35) is None
+    assert list(mapped.ids(after=75)) == [80, 90]
+    assert mapped.get_many([20, 35, 30]) == [mapped.get(20), None, mapped.get(30)]
+    # changes live in memory, on top of the file
+    mapped.put(items.Item(35, "item 35"))
+    mapped.put(items.Item(30, "item 30", version=2))
+    assert mapped.delete(40)
+    assert not mapped.delete(40)
+    assert list(mapped.ids()) == [0, 10, 20, 30, 35, 50, 60, 70, 80, 90]
+    assert len(mapped) == 10
+    assert mapped.get(40) is None
+    assert mapped.get_many([35, 40, 30]) == [items.Item(35, "item 35"), None, items.Item(30, "item 30", version=2)]
+    mapped.put(items.Item(40, "item 40"))
+    assert mapped.get(40) == items.Item(40, "item 40")
+    assert len(mapped) == 11
+    assert items.ItemStore(path).get(35) is None
+    generation = mapped.generation
+    mapped.save()
+    assert mapped.generation > generation
+    reopened = items.ItemStore(path)
+    assert list(reopened.items()) == list(mapped.items())
+    assert reopened.get(30).version == 2
+    scan = reopened.ids()
+    assert next(scan) == 0
+    reopened.close()
+    assert reopened.get(30) is None
+    # scans started before closing keep reading the mapping they started with
+    assert len(list(scan)) == 10
+    (tmp_path / "not-items.db").write_bytes(b"not an item file" * 4)
+    with pytest.raises(ValueError):
+        items.ItemStore(str(tmp_path / "not-items.db"))
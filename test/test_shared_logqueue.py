@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/logqueue.py
+
+"""
+
+from logging import (
+    getLogger as l_getLogger,
+    Handler as l_Handler,
+    makeLogRecord as l_makeLogRecord,
+    INFO as l_INFO,
+    WARNING as l_WARNING,
+)
+from queue import Queue
+from threading import get_ident
+
+import pytest
+
+from app.kapibara.shared import logqueue
+
+
+class ListHandler(l_Handler):
+    """Handler collecting the formatted records and the thread handling them
+    """
+    def __init__(self, level=l_INFO):
+        super().__init__(level)
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+        self.threads.add(get_ident())
+
+
+@pytest.mark.parametrize(
+    "policy,expected_queue,expected_dropped",
+    [
+        ("drop_new", ["msg 0", "msg 1"], 2),
+        ("drop_oldest", ["msg 2", "msg 3"], 2),
+    ],
+)
+def test_dropping_queue_handler(policy, expected_queue, expected_dropped):
+    """[TEST] DroppingQueueHandler - drop policies
+    """
+    handler = logqueue.DroppingQueueHandler(Queue(maxsize=2), policy=policy)
+    for i in range(4):
+        handler.emit(l_makeLogRecord({"msg": "msg %d", "args": (i,)}))
+    queued = [handler.queue.get_nowait() for _ in range(handler.queue.qsize())]
+    assert [r.msg for r in queued] == expected_queue
+    assert all(r.args is None for r in queued)
+    assert handler.dropped == expected_dropped
+    with pytest.raises(ValueError):
+        logqueue.DroppingQueueHandler(Queue(), policy="drop_everything")
+
+
+def test_queued_logging():
+    """[TEST] QueuedLogging - records are handled by the listener thread
+    """
+    logger = l_getLogger("test_queued_logging")
+    logger.setLevel(l_INFO)
+    info, warning = ListHandler(), ListHandler(l_WARNING)
+    pipeline = logqueue.QueuedLogging(logger, (info, warning), queue_size=100, drop_policy="block")
+    logger.info("hello %s", "world")
+    pipeline.configure(queue_size=0, drop_policy="drop_oldest")
+    logger.warning("bye")
+    pipeline.stop()
+    logger.error("not handled anymore")
+    assert info.records == ["hello world", "bye"]
+    assert warning.records == ["bye"]
+    assert get_ident() not in info.threads | warning.threads
+    assert pipeline.dropped == 0
+    assert not [h for h in logger.handlers if isinstance(h, logqueue.DroppingQueueHandler)]
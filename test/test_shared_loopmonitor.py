@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/loopmonitor.py
+
+"""
+
+from asyncio import run as asyncio_run, sleep as asyncio_sleep
+from time import sleep
+
+import pytest
+
+from app.kapibara.shared import loopmonitor
+
+
+def _blocking_handler():
+    sleep(0.4)
+
+
+def test_loop_monitor_blocking_call():
+    """[TEST] LoopMonitor - lags are measured and blocking calls reported with their stack
+    """
+    lags, blocks = [], []
+    monitor = loopmonitor.LoopMonitor(interval=0.02, threshold=0.1, on_lag=lags.append,
+                                      on_block=lambda late, stack: blocks.append((late, stack)))
+    assert monitor.percentiles((0.5,)) == {0.5: 0.0}
+
+    async def serve():
+        monitor.start()
+        assert monitor.running
+        await asyncio_sleep(0.1)
+        _blocking_handler()
+        await asyncio_sleep(0.1)
+        monitor.stop()
+
+    asyncio_run(serve())
+    assert not monitor.running
+    assert len(blocks) == 1
+    assert blocks[0][0] > 0.1
+    assert "_blocking_handler" in blocks[0][1]
+    assert max(lags) >= 0.3
+    assert monitor.percentiles((0.5, 1.0))[1.0] == max(lags)
+    with pytest.raises(ValueError):
+        loopmonitor.LoopMonitor(threshold=0)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/metrics.py
+
+"""
+
+from asyncio import CancelledError, new_event_loop, run as asyncio_run, sleep as asyncio_sleep
+from threading import Thread
+
+import pytest
+
+from app.kapibara.shared import metrics
+
+
+def test_metrics_requests():
+    """[TEST] Metrics - requests are counted by route and status code, all slots together
+    """
+    m = metrics.Metrics(buckets=(0.1, 1.0), slots=2)
+    m.add_routes(["/", "/items/{item_id}"])
+    assert m.route_index("/") == 0
+    assert m.route_index("/items/42") == 1
+    assert m.route_index("/this-route-does-not-exist") == 2
+    assert m.route_index("/items/42") == 1
+    for n in range(5000):
+        assert m.route_index(f"/items/{n}") == 1
+    m.add_routes(["/other", "/this-route-does-not-exist"])
+    assert m.route_index("/this-route-does-not-exist") == 3
+    m = metrics.Metrics(buckets=(0.1, 1.0), slots=2)
+    m.add_routes(["/", "/items/{item_id}"])
+    m.observe_request(0, 200, 0.05)
+    m.slot = 1
+    m.observe_request(0, 200, 0.5)
+    m.observe_request(1, 418, 5.0)
+    m.observe_request(2, 404, 0.01)
+    assert m.requests() == {"/": {"200": 2}, "/items/{item_id}": {"4xx": 1}, "": {"404": 1}}
+    counts, total = m.request_durations()["/"]
+    assert counts == [1, 1, 0]
+    assert total == pytest.approx(0.55)
+    assert m.request_durations()["/items/{item_id}"][0] == [0, 0, 1]
+    m.resize(1)
+    assert m.slot == 0
+    assert not m.requests()
+    with pytest.raises(ValueError):
+        m.resize(0)
+
+
+def test_metrics_render():
+    """[TEST] Metrics - render in the Prometheus text format
+    """
+    m = metrics.Metrics(operations=("password_verify",), buckets=(0.1, 1.0))
+    m.add_routes(['/"quoted"'])
+    m.observe_request(0, 200, 0.2)
+    m.observe("password_verify", 0.05)
+    m.observe("this-operation-does-not-exist", 0.05)
+    text = m.render()
+    assert 'kapibara_http_requests_total{route="/\\"quoted\\"",code="200"} 1\n' in text
+    assert 'kapibara_http_request_duration_seconds_bucket{route="/\\"quoted\\"",le="0.1"} 0\n' in text
+    assert 'kapibara_http_request_duration_seconds_bucket{route="/\\"quoted\\"",le="1.0"} 1\n' in text
+    assert 'kapibara_http_request_duration_seconds_bucket{route="/\\"quoted\\"",le="+Inf"} 1\n' in text
+    assert 'kapibara_http_request_duration_seconds_count{route="/\\"quoted\\""} 1\n' in text
+    assert 'kapibara_operation_duration_seconds_bucket{operation="password_verify",le="0.1"} 1\n' in text
+    assert "# TYPE kapibara_operation_duration_seconds histogram\n" in text
+    assert "this-operation-does-not-exist" not in text
+
+
+def test_metrics_attach():
+    """[TEST] Metrics - operations timed on other threads are recorded by the attached event loop
+    """
+    m = metrics.Metrics(operations=("password_verify",), buckets=(0.1, 1.0))
+    count = 'kapibara_operation_duration_seconds_count{operation="password_verify"} '
+    loop = new_event_loop()
+    try:
+        m.attach(loop)
+        other = Thread(target=m.observe, args=("password_verify", 0.05))
+        other.start()
+        other.join()
+        assert count not in m.render()
+        loop.run_until_complete(asyncio_sleep(0))
+        assert f"{count}1\n" in m.render()
+        m.observe("password_verify", 0.05)
+        assert f"{count}2\n" in m.render()
+    finally:
+        loop.close()
+    # a closed loop records nothing anymore: the caller does
+    other = Thread(target=m.observe, args=("password_verify", 0.05))
+    other.start()
+    other.join()
+    assert f"{count}3\n" in m.render()
+    m.attach(None)
+
+
+def test_metrics_stats():
+    """[TEST] Metrics - statistics of the worker rendering the metrics
+    """
+    m = metrics.Metrics()
+    stats = {"kind": "thread", "enabled": True, "pending": 2, "submitted": 5, "wait_seconds_total": 0.5}
+    m.add_stats("pool", lambda: stats, "Worker pool", counters=("submitted", "wait_seconds_total"))
+    m.add_stats("nothing", dict, "Component not configured")
+    m.slot = 1
+    text = m.render()
+    assert '# TYPE kapibara_pool_pending gauge\nkapibara_pool_pending{worker="1"} 2\n' in text
+    assert '# TYPE kapibara_pool_submitted_total counter\nkapibara_pool_submitted_total{worker="1"} 5\n' in text
+    assert 'kapibara_pool_wait_seconds_total{worker="1"} 0.5\n' in text
+    assert "kind" not in text and "enabled" not in text and "nothing" not in text
+
+
+def test_metrics_middleware():
+    """[TEST] MetricsMiddleware - responses and failures are recorded
+    """
+    async def app(scope, receive, send):
+        if scope.get("path") == "/fail":
+            raise RuntimeError("failure")
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"chunk", "more_body": True})
+        if scope.get("path") == "/stream":
+            raise CancelledError()  # e.g. the client left halfway
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):    # pylint: disable=unused-argument
+        pass
+
+    m = metrics.Metrics()
+    m.add_routes(["/ok", "/fail", "/stream"])
+    middleware = metrics.MetricsMiddleware(app, m)
+    asyncio_run(middleware({"type": "http", "path": "/ok"}, None, send))
+    with pytest.raises(RuntimeError):
+        asyncio_run(middleware({"type": "http", "path": "/fail"}, None, send))
+    with pytest.raises(CancelledError):
+        asyncio_run(middleware({"type": "http", "path": "/stream"}, None, send))
+    asyncio_run(middleware({"type": "lifespan"}, None, send))
+    assert m.requests() == {"/ok": {"201": 1}, "/fail": {"500": 1}, "/stream": {"201": 1}}
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/pool.py
+
+"""
+
+from asyncio import ensure_future, run as asyncio_run, sleep as asyncio_sleep
+from operator import add
+from threading import Event, Thread
+from time import sleep
+
+import pytest
+
+from app.kapibara.shared import pool
+
+
+def test_worker_pool_run():
+    """[TEST] WorkerPool - run (thread & process)
+    """
+    for kind in pool.POOL_KINDS:
+        p = pool.WorkerPool(kind=kind, workers=1, queue=0)
+        assert asyncio_run(p.run(add, 40, 2)) == 42
+        stats = p.stats
+        assert stats["kind"] == kind
+        assert stats["submitted"] == stats["completed"] == 1
+        assert stats["pending"] == 0
+        assert stats["run_seconds_total"] >= stats["run_seconds_max"] >= 0.0
+        assert stats["queue_wait_seconds_total"] >= 0.0
+        p.shutdown()
+
+
+def test_worker_pool_errors():
+    """[TEST] WorkerPool - invalid parameters & failing calls
+    """
+    with pytest.raises(ValueError):
+        pool.WorkerPool(kind="fiber")
+    with pytest.raises(ValueError):
+        pool.WorkerPool(queue=-1)
+    p = pool.WorkerPool(workers=1)
+    with pytest.raises(ZeroDivisionError):
+        asyncio_run(p.run(divmod, 1, 0))
+    assert p.stats["failed"] == 1
+    assert p.pending == 0
+    p.shutdown()
+
+
+def test_worker_pool_saturated():
+    """[TEST] WorkerPool - bounded queue refuses extra work
+    """
+    p = pool.WorkerPool(workers=1, queue=1)
+    release = Event()
+    busy = [Thread(target=asyncio_run, args=(p.run(release.wait),)) for _ in range(2)]
+    for t in busy:
+        t.start()
+    while p.pending < 2:
+        sleep(0.01)
+    with pytest.raises(pool.PoolSaturatedError):
+        asyncio_run(p.run(add, 1, 1))
+    release.set()
+    for t in busy:
+        t.join()
+    assert p.stats["rejected"] == 1
+    assert p.stats["completed"] == 2
+    assert asyncio_run(p.run(add, 1, 1)) == 2
+    p.shutdown()
+
+
+def test_worker_pool_cancelled():
+    """[TEST] WorkerPool - cancelled callers keep their call pending until a worker is done with it
+    """
+    p = pool.WorkerPool(workers=1, queue=1)
+    release = Event()
+
+    async def cancel_all():
+        running = ensure_future(p.run(release.wait))
+        queued = ensure_future(p.run(add, 1, 1))
+        while p.pending < 2:
+            await asyncio_sleep(0.01)
+        running.cancel()
+        queued.cancel()
+        await asyncio_sleep(0.05)
+
+    asyncio_run(cancel_all())
+    # the queued call never started and is released, the running one still holds its worker
+    assert p.pending == 1
+    assert p.stats["failed"] == 0
+    release.set()
+    while p.pending:
+        sleep(0.01)
+    assert asyncio_run(p.run(add, 1, 1)) == 2
+    p.shutdown()
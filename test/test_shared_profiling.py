@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/profiling.py
+
+"""
+
+from asyncio import run as asyncio_run
+from os import path as os_path
+
+from app.kapibara.shared import profiling
+from app.kapibara.shared.pool import WorkerPool
+
+
+async def _app(scope, receive, send):   # pylint: disable=unused-argument
+    payload = [str(n) for n in range(1000)]
+    await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": " ".join(payload[:3]).encode()})
+
+
+def _request(middleware, headers=()):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio_run(middleware({"type": "http", "method": "GET", "path": "/items/42", "headers": list(headers)},
+                           None, send))
+    return messages[0]["status"], dict(messages[0]["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def test_profiling_middleware(tmp_path):
+    """[TEST] ProfilingMiddleware - requests with the header are profiled only when enabled
+    """
+    enabled = [False]
+    middleware = profiling.ProfilingMiddleware(_app, enabled=lambda: enabled[0], directory=str(tmp_path))
+    header = (b"x-kapibara-profile", b"1")
+    assert _request(middleware, [header]) == (201, {b"content-type": b"text/plain"}, b"0 1 2")
+    enabled[0] = True
+    assert _request(middleware) == (201, {b"content-type": b"text/plain"}, b"0 1 2")
+    status, headers, body = _request(middleware, [header])
+    assert (status, body) == (201, b"0 1 2")
+    report = headers[b"x-kapibara-profile"].decode()
+    assert os_path.isfile(report)
+    assert os_path.isfile(report[:-len(".txt")] + ".prof")
+    status, headers, body = _request(middleware, [(b"x-kapibara-profile", b"text")])
+    assert status == 200
+    assert headers[b"x-kapibara-profile-status"] == b"201"
+    assert body.startswith(b"GET /items/42 -> 201")
+    assert b"cumulative" in body
+    assert b"allocating lines" in body
+
+
+def _pool_hot_spot(count: int) -> int:
+    return sum(n * n for n in range(count))
+
+
+def test_profiling_middleware_pool_threads(tmp_path):
+    """[TEST] ProfilingMiddleware - calls run on the worker pool threads are profiled too
+    """
+    pool = WorkerPool(workers=1)
+
+    async def pool_app(scope, receive, send):   # pylint: disable=unused-argument
+        total = await pool.run(_pool_hot_spot, 1000)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(total).encode()})
+
+    try:
+        middleware = profiling.ProfilingMiddleware(pool_app, enabled=lambda: True, directory=str(tmp_path))
+        status, headers, body = _request(middleware, [(b"x-kapibara-profile", b"text")])
+        assert status == 200
+        assert b"plus 1 calls on other threads" in body
+        assert b"_pool_hot_spot" in body
+        # outside profiled requests calls are not profiled
+        assert profiling.profile_call(_pool_hot_spot, 3) == 5
+        assert profiling._thread_profiles is None     # pylint: disable=protected-access
+    finally:
+        pool.shutdown()
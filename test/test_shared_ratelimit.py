@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/ratelimit.py
+
+"""
+
+from multiprocessing import get_context
+from os import _exit as os_exit
+
+import pytest
+
+from app.kapibara.shared import ratelimit
+
+
+class _Clock:   # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limiter_token_bucket():
+    """[TEST] RateLimiter - bursts are allowed, then requests are limited to the rate
+    """
+    clock = _Clock()
+    limiter = ratelimit.RateLimiter(rate=2.0, burst=3, clock=clock)
+    assert [limiter.acquire("10.0.0.1") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("10.0.0.1") == pytest.approx(0.5)
+    assert limiter.acquire("10.0.0.2") == 0.0
+    clock.now += 0.5
+    assert limiter.acquire("10.0.0.1") == 0.0
+    assert limiter.acquire("10.0.0.1") == pytest.approx(0.5)
+    clock.now += 60
+    assert [limiter.acquire("10.0.0.1") for _ in range(4)][-1] > 0
+    assert limiter.stats == {"allowed": 8, "limited": 3, "evicted": 0, "bypassed": 0, "size": 65536}
+    assert ratelimit.RateLimiter().acquire("10.0.0.1") == 0.0
+    with pytest.raises(ValueError):
+        limiter.configure(rate=1.0, burst=0)
+
+
+def test_rate_limiter_bounded():
+    """[TEST] RateLimiter - memory is bounded, the least recently used buckets are reused
+    """
+    clock = _Clock()
+    limiter = ratelimit.RateLimiter(rate=1.0, burst=1, size=10, ways=2, clock=clock)
+    assert limiter.size == 10
+    for n in range(1000):
+        clock.now += 0.001
+        assert limiter.acquire(f"user-{n}") == 0.0
+    assert limiter.stats["evicted"] >= 990
+    assert limiter.acquire("user-999") > 0
+
+
+def _exhaust(limiter, key, results):
+    results.append(sum(1 for _ in range(10) if limiter.acquire(key) == 0.0))
+
+
+def test_rate_limiter_shared():
+    """[TEST] RateLimiter - buckets are shared with forked processes
+    """
+    limiter = ratelimit.RateLimiter(rate=0.001, burst=5)
+    context = get_context("fork")
+    child = context.Process(target=_exhaust, args=(limiter, "alice", []))
+    child.start()
+    child.join()
+    assert limiter.acquire("alice") > 0
+    assert limiter.acquire("bob") == 0.0
+
+
+def _die_holding_the_lock(limiter):
+    limiter.clock = lambda: os_exit(0)   # the clock is read holding the lock
+    limiter.acquire("alice")
+
+
+def test_rate_limiter_dead_lock_holder():
+    """[TEST] RateLimiter - requests go through when a worker died holding the lock
+    """
+    limiter = ratelimit.RateLimiter(rate=0.001, burst=1, lock_timeout=0.01)
+    context = get_context("fork")
+    child = context.Process(target=_die_holding_the_lock, args=(limiter,))
+    child.start()
+    child.join()
+    assert [limiter.acquire("alice") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.stats["bypassed"] == 3
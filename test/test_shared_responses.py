@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/responses.py
+
+"""
+
+from asyncio import run as asyncio_run
+
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from app.kapibara.shared import responses
+
+
+def test_error_key():
+    """[TEST] error_key
+    """
+    assert responses.error_key(404, "Not Found") == (404, "Not Found", None)
+    assert responses.error_key(401, "Nope", {"b": "2", "a": "1"}) == \
+        responses.error_key(401, "Nope", {"a": "1", "b": "2"})
+    assert responses.error_key(422, [{"msg": "field required"}]) is None
+
+
+def test_response_catalog():
+    """[TEST] ResponseCatalog - add & get
+    """
+    catalog = responses.ResponseCatalog()
+    original = JSONResponse(status_code=401, content={"msg": "Nope"}, headers={"WWW-Authenticate": "Bearer"})
+    catalog.add("nope", original)
+    catalog.add("text", PlainTextResponse("plain"))
+    assert len(catalog) == 2
+    assert "nope" in catalog
+    assert catalog.get("missing") is None
+    assert catalog.get(None) is None
+    first, second = catalog.get("nope"), catalog.get("nope")
+    assert first.status_code == 401
+    assert first.body is original.body
+    assert first.raw_headers == original.raw_headers
+    # headers are not shared between responses
+    first.headers["x-extra"] = "1"
+    assert "x-extra" not in second.headers
+    assert catalog.get("text").headers["content-type"].startswith("text/plain")
+
+
+def test_preencoded_response_send():
+    """[TEST] PreencodedResponse - sent as it is
+    """
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    response = responses.PreencodedResponse(200, b"{}", [(b"content-length", b"2")])
+    asyncio_run(response({"type": "http"}, None, send))
+    assert messages == [
+        {"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]},
+        {"type": "http.response.body", "body": b"{}"},
+    ]
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/supervisor.py
+
+"""
+
+from os import getppid, kill as os_kill
+from signal import SIGTERM
+from time import sleep
+
+import pytest
+
+from app.kapibara.shared import supervisor
+
+
+def test_available_cpus():
+    """[TEST] available_cpus
+    """
+    assert supervisor.available_cpus() >= 1
+
+
+def test_supervisor_errors():
+    """[TEST] Supervisor - invalid parameters
+    """
+    with pytest.raises(ValueError):
+        supervisor.Supervisor(print, workers=0)
+
+
+def test_supervisor_restarts_workers(tmp_path):
+    """[TEST] Supervisor - crashed workers are restarted until shutdown
+    """
+    runs = tmp_path / "runs"
+
+    def target(slot):
+        with open(runs, "a", encoding="utf-8") as file:
+            file.write(f"{slot}\n")
+        if len(runs.read_text(encoding="utf-8").split()) < 3:
+            raise RuntimeError("crash")
+        os_kill(getppid(), SIGTERM)
+        sleep(60)
+
+    exits = []
+    sup = supervisor.Supervisor(target, workers=1, graceful_timeout=5, max_backoff=0.1,
+                                on_exit=lambda slot, pid, code: exits.append((slot, code)))
+    sup.run(poll_interval=0.01)
+    assert runs.read_text(encoding="utf-8").split() == ["0", "0", "0"]
+    assert exits == [(0, 1), (0, 1), (0, -SIGTERM)]
+    assert not sup.pids
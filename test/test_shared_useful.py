@@ -19,3 +19,33 @@ def test_find_config_path():
     assert res == "/etc/"
     res = useful.find_config_path("this-file-is-unlikely-to-exist-and-will-not-be-found.txt")
     assert res == ""
+
+
+def test_find_config_path_cache(tmp_path, monkeypatch):
+    """[TEST] find_config_path - cached until invalidated
+    """
+    monkeypatch.chdir(tmp_path)
+    useful.invalidate_config_paths()
+    try:
+        assert useful.find_config_path("kapibara-test.yml") == ""
+        (tmp_path / "kapibara-test.yml").write_text("---\n", encoding="utf-8")
+        assert useful.find_config_path("kapibara-test.yml") == ""
+        useful.invalidate_config_paths()
+        assert useful.find_config_path("kapibara-test.yml") == str(tmp_path)
+        (tmp_path / "nested").mkdir()
+        (tmp_path / "nested" / "kapibara-test.yml").write_text("---\n", encoding="utf-8")
+        assert useful.find_config_path("nested/kapibara-test.yml") == str(tmp_path)
+    finally:
+        monkeypatch.undo()
+        useful.invalidate_config_paths()
+
+
+def test_merge_dicts():
+    """[TEST] merge_dicts
+    """
+    base = {"server": {"addr": "localhost", "port": 0}, "debug": False}
+    res = useful.merge_dicts(base, {"server": {"port": 8088}, "crypt": {"key": "k"}})
+    assert res == {"server": {"addr": "localhost", "port": 8088}, "crypt": {"key": "k"}, "debug": False}
+    assert base == {"server": {"addr": "localhost", "port": 0}, "debug": False}
+    assert useful.merge_dicts(base, None) == base
+    assert useful.merge_dicts(base, {"server": None})["server"] is None
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TEST shared/watcher.py
+
+"""
+
+from os import replace as os_replace
+from threading import Event
+
+import pytest
+
+from app.kapibara.shared import watcher
+
+
+@pytest.mark.parametrize("backend", watcher.WATCHER_BACKENDS)
+def test_file_watcher_atomic_replace(tmp_path, backend):
+    """[TEST] FileWatcher - files replaced atomically are noticed
+    """
+    conf, other = tmp_path / "kapibara.yml", tmp_path / "other.yml"
+    conf.write_text("debug: false\n")
+    changes, noticed = [], Event()
+
+    def callback(paths):
+        changes.append(paths)
+        noticed.set()
+
+    w = watcher.FileWatcher([str(conf)], callback, interval=0.05, backend=backend, settle=0.05)
+    w.start()
+    try:
+        assert w.running
+        assert w.backend == backend
+        other.write_text("ignored\n")
+        staged = tmp_path / "kapibara.yml.tmp"
+        staged.write_text("debug: true\n")
+        os_replace(staged, conf)
+        assert noticed.wait(5)
+        assert changes == [[str(conf)]]
+    finally:
+        w.stop()
+    assert not w.running
+
+
+def test_file_watcher_check(tmp_path):
+    """[TEST] FileWatcher - check reports created, modified and deleted files once
+    """
+    conf = tmp_path / ".env-kapibara"
+    changes = []
+    w = watcher.FileWatcher([str(conf)], changes.append, backend="polling")
+    w.start()
+    w.stop()
+    assert not w.check()
+    conf.write_text("DEBUG=1\n")
+    assert w.check() == [str(conf)]
+    assert not w.check()
+    conf.unlink()
+    assert w.check() == [str(conf)]
+    assert changes == [[str(conf)], [str(conf)]]
+    with pytest.raises(ValueError):
+        watcher.FileWatcher([str(conf)], changes.append, backend="fanotify")